@@ -0,0 +1,2 @@
+"""Benchmark suite (see benchmarks/suite.py)"""
+__all__ = ['corpus', 'suite']
@@ -0,0 +1,213 @@
+# benchmarks/corpus.py
+"""Seeded synthetic bibliographic corpus for the benchmark suite.
+
+`generate_corpus(n, seed)` returns n harvest-shaped `Record`s plus the
+ground-truth cluster of each one. A `duplicate_rate` share of the records
+are injected duplicates of an earlier record: another source's copy with
+a title variant (case, punctuation, stopwords, subtitle, accents), the
+authors in initials form, sometimes the year off by one and sometimes no
+DOI. Titles mix domain terms with a long tail of generated words so that
+token frequencies look like real titles, and abstracts contain the
+screening keywords at fixed rates so every decision path is exercised.
+The same (n, seed, rates) always gives the same corpus.
+"""
+import html
+import random
+import string
+from collections import namedtuple
+
+from utils.records import Record
+
+Corpus = namedtuple('Corpus', 'records clusters')
+
+DOMAIN_WORDS = [
+    'eeg', 'brain', 'computer', 'interface', 'bci', 'motor', 'imagery', 'deep', 'learning', 'convolutional',
+    'neural', 'network', 'recurrent', 'lstm', 'transformer', 'attention', 'classification', 'decoding', 'signal',
+    'signals', 'channel', 'spatial', 'temporal', 'spectral', 'feature', 'features', 'subject', 'cross', 'session',
+    'transfer', 'adaptation', 'domain', 'emotion', 'recognition', 'seizure', 'detection', 'sleep', 'staging',
+    'p300', 'ssvep', 'erp', 'speller', 'event', 'related', 'potentials', 'evoked', 'visual', 'auditory',
+    'mental', 'workload', 'fatigue', 'driver', 'graph', 'capsule', 'hybrid', 'ensemble', 'lightweight',
+    'efficient', 'robust', 'real', 'time', 'online', 'wearable', 'dry', 'electrode', 'multi', 'scale',
+    'frequency', 'band', 'filter', 'common', 'pattern', 'riemannian', 'geometry', 'augmentation', 'generative',
+    'adversarial', 'self', 'supervised', 'contrastive', 'representation', 'benchmark', 'dataset', 'rehabilitation',
+    'stroke', 'patients', 'healthy', 'children', 'epilepsy', 'alzheimer', 'depression', 'schizophrenia',
+]
+STOPWORDS = ['a', 'an', 'the', 'of', 'in', 'on', 'and', 'for', 'with', 'to', 'by']
+SOURCES = ['PubMed', 'IEEE Xplore', 'Crossref', 'Google Scholar']
+FIRST_NAMES = ['Wei', 'Maria', 'John', 'Anna', 'Ahmed', 'Yuki', 'Carlos', 'Olga', 'Priya', 'Lukas', 'Sara', 'Jun']
+ACCENTS = {'e': 'é', 'a': 'á', 'o': 'ö', 'u': 'ü', 'i': 'í'}
+LANGUAGES = ['German', 'Chinese', 'Spanish', 'French']
+
+# abstract sentences carrying the keywords the screeners look for
+EEG_SENTENCES = ['We recorded electroencephalography (EEG) from {n} participants.',
+                 'The brain-computer interface was evaluated on {n} subjects.']
+DL_SENTENCES = ['A convolutional neural network (CNN) was trained end to end.',
+                'We propose a transformer with an LSTM front end.',
+                'A deep network learns spatial filters directly from the raw signal.']
+CLASSIFICATION_SENTENCES = ['The classifier reached an accuracy of {pct}% and an F1 of 0.{n}.',
+                            'Sensitivity and specificity were {pct}% and {pct2}%.']
+REVIEW_SENTENCES = ['This systematic review summarises {n} studies.', 'We survey recent methods and open problems.']
+FILLER_SENTENCES = ['Results are reported for {n} sessions.', 'The proposed approach is compared with baselines.',
+                    'Preprocessing follows common practice.', 'Code and data are described in the supplement.',
+                    'Limitations and future work are discussed.', 'Participants gave informed consent.']
+METRIC_SENTENCES = ['Table {n} lists accuracy, precision and recall per subject.',
+                    'The ROC AUC was 0.{n} with a confusion matrix shown in Figure {n}.']
+METHOD_SENTENCES = ['The network uses {n} convolution layers followed by an LSTM.',
+                    'We train a transformer encoder with {n} heads.']
+
+
+def _pseudo_words(rng, count):
+    syllables = [c + v for c in 'bcdfghklmnprstvz' for v in 'aeiou']
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+class _Vocabulary:
+    def __init__(self, rng):
+        # domain terms are common, the generated tail is Zipf-like
+        self.tail = _pseudo_words(rng, 20000)
+        self.tail_weights = [1.0 / (i + 1) for i in range(len(self.tail))]
+        self.surnames = [w.capitalize() for w in _pseudo_words(rng, 5000)]
+
+    def title(self, rng):
+        words = rng.choices(DOMAIN_WORDS, k=rng.randint(4, 8))
+        words += rng.choices(self.tail, weights=self.tail_weights, k=rng.randint(2, 5))
+        rng.shuffle(words)
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(1, len(words)), rng.choice(STOPWORDS))
+        title = ' '.join(words)
+        if rng.random() < 0.3:
+            title += ': ' + ' '.join(rng.choices(DOMAIN_WORDS, k=rng.randint(2, 4)))
+        return title[0].upper() + title[1:]
+
+    def authors(self, rng):
+        return [f'{rng.choice(FIRST_NAMES)} {rng.choice(self.surnames)}' for _ in range(rng.randint(1, 8))]
+
+
+def _sentence(rng, choices):
+    n = rng.randint(2, 99)
+    return rng.choice(choices).format(n=n, pct=rng.randint(60, 99), pct2=rng.randint(60, 99))
+
+
+def synthetic_abstract(rng, eeg=0.7, dl=0.6, classification=0.6, review=0.1):
+    sentences = [_sentence(rng, FILLER_SENTENCES) for _ in range(rng.randint(4, 10))]
+    for rate, choices in ((eeg, EEG_SENTENCES), (dl, DL_SENTENCES), (classification, CLASSIFICATION_SENTENCES),
+                          (review, REVIEW_SENTENCES)):
+        if rng.random() < rate:
+            sentences.insert(rng.randrange(len(sentences) + 1), _sentence(rng, choices))
+    return ' '.join(sentences)
+
+
+def synthetic_full_text(rng, pages=12, page_chars=3000, methods=0.8, metrics=0.75):
+    """Plain text of `pages` pages; methods and metrics sentences appear at random pages with the given rates."""
+    out = []
+    for _ in range(pages):
+        page = []
+        while sum(len(s) + 1 for s in page) < page_chars:
+            page.append(_sentence(rng, FILLER_SENTENCES))
+        out.append(page)
+    for rate, choices in ((methods, METHOD_SENTENCES), (metrics, METRIC_SENTENCES)):
+        if rng.random() < rate:
+            page = rng.choice(out)
+            page.insert(rng.randrange(len(page) + 1), _sentence(rng, choices))
+    return '\f'.join(' '.join(page) for page in out)
+
+
+def _title_variant(rng, title):
+    kind = rng.randrange(6)
+    if kind == 0:
+        return title.upper() if rng.random() < 0.5 else title.lower()
+    if kind == 1:
+        return title.replace(' ', ' - ', 1).replace(':', '.') + '.'
+    if kind == 2:
+        words = [w for w in title.split() if w.lower() not in STOPWORDS]
+        return ' '.join(words)
+    if kind == 3:
+        return title.split(':')[0] if ':' in title else title + ': a study'
+    if kind == 4:
+        return ''.join(ACCENTS.get(c, c) if rng.random() < 0.1 else c for c in title)
+    # one typo
+    i = rng.randrange(len(title))
+    return title[:i] + rng.choice(string.ascii_lowercase) + title[i + 1:]
+
+
+def _initials(name):
+    first, _, last = name.partition(' ')
+    return f'{last}, {first[0]}.'
+
+
+def _record(i, source, title, authors, year, doi, abstract, language):
+    return Record({
+        'id': f'{source.lower().replace(" ", "")}:{i}',
+        'title': title,
+        'authors': authors,
+        'year': str(year),
+        'doi': doi,
+        'pmcid': f'PMC{7000000 + i}' if source == 'PubMed' and i % 3 == 0 else None,
+        'abstract': abstract,
+        'url': f'https://example.org/{source.lower().replace(" ", "-")}/{i}',
+        'source': source,
+        'language': language,
+    })
+
+
+def generate_corpus(n, seed=0, duplicate_rate=0.15, doi_rate=0.7, doi_drop_rate=0.3, year_jitter_rate=0.1,
+                    non_english_rate=0.03, year_range=(2012, 2025)):
+    """Return Corpus(records, clusters); clusters[i] is the index of record i's original."""
+    rng = random.Random(seed)
+    vocab = _Vocabulary(random.Random(seed + 1))
+    records, clusters = [], []
+    originals = []  # (index, title, authors, year, doi, abstract)
+    for i in range(n):
+        if originals and rng.random() < duplicate_rate:
+            idx, title, authors, year, doi, abstract = rng.choice(originals)
+            source = rng.choice(SOURCES)
+            if doi and rng.random() < doi_drop_rate:
+                doi = None
+            if rng.random() < year_jitter_rate:
+                year += rng.choice((-1, 1))
+            if rng.random() < 0.5:
+                authors = [_initials(a) for a in authors]
+            records.append(_record(i, source, _title_variant(rng, title), authors, year, doi, abstract, 'English'))
+            clusters.append(idx)
+            continue
+        title = vocab.title(rng)
+        authors = vocab.authors(rng)
+        year = rng.randint(*year_range)
+        doi = f'10.{1000 + i % 8000}/bench.{seed}.{i}' if rng.random() < doi_rate else None
+        abstract = synthetic_abstract(rng)
+        language = rng.choice(LANGUAGES) if rng.random() < non_english_rate else 'English'
+        records.append(_record(i, rng.choice(SOURCES), title, authors, year, doi, abstract, language))
+        clusters.append(i)
+        originals.append((i, title, authors, year, doi, abstract))
+    return Corpus(records, clusters)
+
+
+def attach_full_texts(records, seed=0, distinct=256, pages=12):
+    """Give every record a `full_text` from a pool of `distinct` synthetic texts (reused cyclically)."""
+    rng = random.Random(seed)
+    pool = [synthetic_full_text(rng, pages=pages) for _ in range(min(distinct, len(records)))]
+    for i, r in enumerate(records):
+        r['full_text'] = {'pdf_text': pool[i % len(pool)], 'pdf_url': r.get('url'), 'pdf_path': None}
+    return records
+
+
+def scholar_page(records, rng=None):
+    """A Google Scholar result page (HTML) listing `records`, in the markup the Scholar connector parses."""
+    rng = rng or random.Random(0)
+    items = []
+    for r in records:
+        title = html.escape(r.get('title') or '')
+        tag = '<span class="gs_ctg2">[PDF]</span> ' if rng.random() < 0.3 else ''
+        link = f'<a id="{rng.getrandbits(32):x}" href="{html.escape(r.get("url") or "")}">{title}</a>' if r.get('url') else title
+        byline = html.escape(f'{", ".join(r.get("authors") or [])} - Journal of Neural Engineering, {r.get("year")} - example.org')
+        items.append(
+            '<div class="gs_r gs_or gs_scl"><div class="gs_ggs gs_fl"></div><div class="gs_ri">'
+            f'<h3 class="gs_rt">{tag}{link}</h3><div class="gs_a">{byline}</div>'
+            f'<div class="gs_rs">{html.escape((r.get("abstract") or "")[:300])}</div>'
+            '<div class="gs_fl gs_flb"><a href="/scholar?cites=1">Cited by 12</a> <a href="#">Related articles</a></div>'
+            '</div></div>')
+    return ('<!doctype html><html><head><meta charset="utf-8"><title>Google Scholar</title></head><body>'
+            '<div id="gs_top"><div id="gs_res_ccl_mid">' + ''.join(items) + '</div></div></body></html>')
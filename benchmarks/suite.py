@@ -0,0 +1,290 @@
+# benchmarks/suite.py
+"""Benchmark suite: time and memory of dedupe, screening, parsing, extraction and the exporters.
+
+    python -m benchmarks.suite run --sizes 1000 10000 100000 [--only dedupe ta_batch] [--output results.json]
+    python -m benchmarks.suite compare old.json new.json [--threshold 0.15]
+    python -m benchmarks.suite generate --size 10000 --output corpus.jsonl
+
+Each benchmark runs on the seeded corpus of `benchmarks.corpus` at every
+size. Setup (corpus generation, copies, upstream stages) is not timed.
+Every benchmark is timed `--repeats` times and then run once more under
+tracemalloc for its peak Python heap growth (`peak_mb`; allocations made
+by native code that bypasses the Python allocator, e.g. inside rapidfuzz
+or Arrow, are not included). Results are written as JSON together with
+the git commit and environment, and `compare` reports the median-time
+ratio between two result files, exiting non-zero on regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import yaml
+
+from benchmarks.corpus import attach_full_texts, generate_corpus, scholar_page
+from connectors.scholar_connector import parse_results
+from exporters.bibtex_exporter import write_bibtex
+from exporters.csv_exporter import write_csv
+from exporters.json_exporter import write_prisma_json
+from exporters.parquet_exporter import write_parquet
+from screeners.full_text_screener import full_text_screen
+from screeners.title_abstract_screener import screening_decisions, title_abstract_screen, title_abstract_screen_batch
+from utils.dedupe import dedupe_records
+from utils.extraction import extract_many
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+class Context:
+    """Corpora and upstream stage outputs shared by the benchmarks of one run."""
+
+    def __init__(self, cfg, seed, workdir):
+        self.cfg = cfg
+        self.seed = seed
+        self.workdir = workdir
+        self._corpora = {}
+        self._screened = {}
+
+    def corpus(self, size):
+        if size not in self._corpora:
+            self._corpora = {size: generate_corpus(size, seed=self.seed)}
+            self._screened = {}
+        return self._corpora[size]
+
+    def fresh_records(self, size):
+        # dedupe and the screeners add keys to records, so each run gets copies
+        return [r.copy() for r in self.corpus(size).records]
+
+    def screened(self, size):
+        """(canonical records with both screening decisions, duplicate report), as export_stage gets them."""
+        if size not in self._screened:
+            canonical, report = dedupe_records(self.fresh_records(size), self.cfg['dedupe'])
+            for r, d in zip(canonical, screening_decisions(title_abstract_screen_batch(canonical, self.cfg))):
+                r['ta_decision'] = d
+            included = [r for r in canonical if r['ta_decision']['decision'] == 'Include']
+            attach_full_texts(included, seed=self.seed)
+            for r in included:
+                r['ft_decision'] = full_text_screen(r, self.cfg)
+            self._screened[size] = (canonical, report)
+        return self._screened[size]
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+
+def _pair_counts(sizes):
+    return sum(k * (k - 1) // 2 for k in sizes)
+
+
+def dedupe_quality(canonical_records, records, clusters):
+    """Pairwise precision/recall of the dedupe groups against the corpus ground truth."""
+    truth = {r['id']: c for r, c in zip(records, clusters)}
+    predicted = [r.get('member_ids') or [r['id']] for r in canonical_records]
+    true_pairs = _pair_counts(Counter(clusters).values())
+    found_pairs = _pair_counts(len(g) for g in predicted)
+    correct = sum(_pair_counts(Counter(truth[m] for m in g).values()) for g in predicted)
+    return {'precision': correct / found_pairs if found_pairs else 1.0,
+            'recall': correct / true_pairs if true_pairs else 1.0,
+            'groups': len(canonical_records)}
+
+
+# A benchmark takes (context, size) and returns (fn, check): fn is the
+# timed call, check(result) turns its output into the reported `info`.
+
+def bench_dedupe(ctx, size):
+    records = ctx.fresh_records(size)
+    corpus = ctx.corpus(size)
+    return (lambda: dedupe_records(records, ctx.cfg['dedupe']),
+            lambda result: dedupe_quality(result[0], corpus.records, corpus.clusters))
+
+
+def bench_dedupe_minhash(ctx, size):
+    records = ctx.fresh_records(size)
+    corpus = ctx.corpus(size)
+    cfg = dict(ctx.cfg['dedupe'], fuzzy_strategy='minhash')
+    return (lambda: dedupe_records(records, cfg),
+            lambda result: dedupe_quality(result[0], corpus.records, corpus.clusters))
+
+
+def bench_ta_screen(ctx, size):
+    records = ctx.fresh_records(size)
+    return (lambda: [title_abstract_screen(r, ctx.cfg) for r in records],
+            lambda result: dict(Counter(str(d['decision']) for d in result)))
+
+
+def bench_ta_batch(ctx, size):
+    records = ctx.fresh_records(size)
+    return (lambda: screening_decisions(title_abstract_screen_batch(records, ctx.cfg)),
+            lambda result: dict(Counter(str(d['decision']) for d in result)))
+
+
+def bench_ft_screen(ctx, size):
+    records = attach_full_texts(ctx.fresh_records(size), seed=ctx.seed)
+    return (lambda: [full_text_screen(r, ctx.cfg) for r in records],
+            lambda result: dict(Counter(str(d['decision']) for d in result)))
+
+
+def bench_extract(ctx, size):
+    texts = [r['full_text']['pdf_text'] for r in attach_full_texts(ctx.fresh_records(size), seed=ctx.seed)]
+    return (lambda: extract_many(texts, workers=1),
+            lambda result: dict(Counter(f for e in result for f, v in e.values.items() if v)))
+
+
+def bench_scholar_parse(ctx, size):
+    records = ctx.corpus(size).records
+    pages = [scholar_page(records[i:i + 10]) for i in range(0, len(records), 10)]
+    return (lambda: [r for page in pages for r in parse_results(page)],
+            lambda result: {'records': len(result), 'pages': len(pages)})
+
+
+def _export(write, name):
+    def bench(ctx, size):
+        records, report = ctx.screened(size)
+        path = ctx.path(name)
+        return (lambda: write(ctx, records, report, path),
+                lambda result: {'bytes': os.path.getsize(path)})
+    return bench
+
+
+def _prisma(ctx, records, report, path):
+    write_prisma_json({'duplicates': report, 'de_dup_count': len(records)}, path)
+
+
+BENCHMARKS = {
+    'dedupe': bench_dedupe,
+    'dedupe_minhash': bench_dedupe_minhash,
+    'ta_screen': bench_ta_screen,
+    'ta_batch': bench_ta_batch,
+    'ft_screen': bench_ft_screen,
+    'extract': bench_extract,
+    'scholar_parse': bench_scholar_parse,
+    'export_csv': _export(lambda ctx, records, report, path: write_csv(records, path), 'records.csv'),
+    'export_parquet': _export(lambda ctx, records, report, path: write_parquet(records, path), 'records.parquet'),
+    'export_json': _export(_prisma, 'prisma.json'),
+    'export_bibtex': _export(lambda ctx, records, report, path: write_bibtex(records, path), 'records.bib'),
+}
+
+
+def run_one(ctx, name, size, repeats):
+    setup = BENCHMARKS[name]
+    seconds = []
+    for _ in range(repeats):
+        fn, check = setup(ctx, size)
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    info = check(result)
+    del result
+    fn, _ = setup(ctx, size)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    median = statistics.median(seconds)
+    return {'benchmark': name, 'size': size, 'seconds': seconds, 'median_s': median, 'best_s': min(seconds),
+            'records_per_s': size / median if median else None, 'peak_mb': (peak - base) / 1e6, 'info': info}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'commit': commit or None, 'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def run(sizes, names, repeats=3, seed=0, config=None, output=None):
+    with open(config or os.path.join(ROOT, 'config.yaml'), encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        ctx = Context(cfg, seed, workdir)
+        for size in sizes:
+            for name in names:
+                try:
+                    res = run_one(ctx, name, size, repeats)
+                except Exception as e:
+                    res = {'benchmark': name, 'size': size, 'error': f'{type(e).__name__}: {e}'}
+                    print(f'{name:>15} {size:>9}  failed: {res["error"]}', file=sys.stderr)
+                else:
+                    print(f'{name:>15} {size:>9}  {res["median_s"]:9.3f}s  {res["peak_mb"]:9.1f} MB  {res["info"]}')
+                results.append(res)
+    data = {'environment': environment(), 'seed': seed, 'repeats': repeats, 'results': results}
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        print(f'Wrote {output}')
+    return data
+
+
+def compare(old_path, new_path, threshold=0.15):
+    """Print the median-time and peak-memory ratios of new vs old; returns the regressed (benchmark, size) keys."""
+    def load(path):
+        with open(path, encoding='utf-8') as f:
+            return {(r['benchmark'], r['size']): r for r in json.load(f)['results'] if 'error' not in r}
+    old, new = load(old_path), load(new_path)
+    regressions = []
+    print(f'{"benchmark":>15} {"size":>9} {"old s":>9} {"new s":>9} {"time":>7} {"memory":>7}')
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+        o, n = old[key], new[key]
+        ratio = n['median_s'] / o['median_s'] if o['median_s'] else float('inf')
+        mem = n['peak_mb'] / o['peak_mb'] if o['peak_mb'] > 0 else float('nan')
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f'{key[0]:>15} {key[1]:>9} {o["median_s"]:9.3f} {n["median_s"]:9.3f} {ratio:6.2f}x {mem:6.2f}x{flag}')
+    return regressions
+
+
+def _generate(size, seed, output):
+    corpus = generate_corpus(size, seed=seed)
+    with open(output, 'w', encoding='utf-8') as f:
+        for r, cluster in zip(corpus.records, corpus.clusters):
+            f.write(json.dumps({**r.to_dict(), 'cluster': corpus.records[cluster]['id']}) + '\n')
+    print(f'Wrote {size} records to {output}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run', help='run benchmarks and write JSON results')
+    p.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    p.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    p.add_argument('--repeats', type=int, default=3)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--config', help='pipeline config (default: config.yaml)')
+    p.add_argument('--output', help='results JSON (default: benchmarks/results/<commit>-<time>.json)')
+    p = sub.add_parser('compare', help='compare two results files')
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=0.15, help='slowdown ratio above 1 that counts as a regression')
+    p = sub.add_parser('generate', help='write a synthetic corpus as JSON lines (with its ground-truth cluster)')
+    p.add_argument('--size', type=int, required=True)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--output', required=True)
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        output = args.output or os.path.join(
+            ROOT, 'benchmarks', 'results', f'{(environment()["commit"] or "nogit")[:10]}-{time.strftime("%Y%m%d-%H%M%S")}.json')
+        run(args.sizes, args.only, args.repeats, args.seed, args.config, output)
+    elif args.command == 'compare':
+        return 1 if compare(args.old, args.new, args.threshold) else 0
+    else:
+        _generate(args.size, args.seed, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
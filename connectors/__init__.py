@@ -1,4 +1,5 @@
 """Connectors package init"""
 __all__ = [
-    'pubmed_connector', 'ieee_connector', 'crossref_connector', 'scholar_connector', 'repo_connector'
+    'pubmed_connector', 'ieee_connector', 'crossref_connector', 'scholar_connector', 'repo_connector',
+    'harvest', 'fulltext_connector'
 ]
@@ -1,27 +1,88 @@
 # connectors/crossref_connector.py
 import requests
+from utils import env, http
+from utils.cache import make_key
+from utils.logger import get_logger
+from utils.records import Record
 
 BASE = 'https://api.crossref.org/works'
+# only the fields mapped below; skips references, licenses, funders, ...
+SELECT = 'DOI,title,author,issued,abstract,URL'
 
+logger = get_logger('crossref')
 
-def search_crossref(cfg, query=None, rows=100):
-    params = {'rows': rows}
+
+def _to_record(it):
+    return Record({
+        'id': 'crossref:' + it.get('DOI', 'no-doi'),
+        'title': (it.get('title') or [None])[0],
+        'authors': [f"{a.get('given','')} {a.get('family','')}".strip() for a in it.get('author', [])],
+        'year': it.get('issued', {}).get('date-parts', [[None]])[0][0],
+        'doi': it.get('DOI'),
+        'abstract': it.get('abstract'),
+        'url': it.get('URL'),
+        'source': 'CrossRef'
+    })
+
+
+def _cursor_expired(resp):
+    # an expired (unknown) cursor is rejected as a bad request / not found; rate limits,
+    # auth and server errors are not
+    return resp is not None and resp.status_code in (400, 404)
+
+
+def search_crossref(cfg, query=None, rows=None):
+    """Yield CrossRef works for `query`, deep paging with `cursor=*`.
+
+    Pages of crossref.rows works (max 1000) are requested with a `select=`
+    projection and, when CROSSREF_EMAIL is set, `mailto` for the polite
+    pool. Paging stops after crossref.max_results works (100, the old single
+    page, when unset; null pages through everything).
+    """
+    ccfg = cfg.get('crossref', {})
+    rows = min(rows or ccfg.get('rows', 1000), 1000)
+    max_results = ccfg.get('max_results', 100)
+    if max_results:
+        rows = min(rows, max_results)
+    mailto = ccfg.get('mailto') or env.getenv('CROSSREF_EMAIL')
+    http.limit_host(BASE, ccfg.get('requests_per_second', 5))
+    user_agent = cfg.get('user_agent', 'rag-pipeline/1.0')
+    params = {'rows': rows, 'select': SELECT}
     if query:
         params['query.bibliographic'] = query
-    r = requests.get(BASE, params=params, headers={'User-Agent': cfg.get('user_agent', 'rag-pipeline/1.0')})
-    r.raise_for_status()
-    items = r.json()['message']['items']
-    records = []
-    for it in items:
-        rec = {
-            'id': 'crossref:' + it.get('DOI', 'no-doi'),
-            'title': it.get('title', [None])[0],
-            'authors': [f"{a.get('given','')} {a.get('family','')}".strip() for a in it.get('author', [])],
-            'year': it.get('issued', {}).get('date-parts', [[None]])[0][0],
-            'doi': it.get('DOI'),
-            'abstract': it.get('abstract'),
-            'url': it.get('URL'),
-            'source': 'CrossRef'
-        }
-        records.append(rec)
-    return records
+    if mailto:
+        params['mailto'] = mailto
+        user_agent = f'{user_agent} (mailto:{mailto})'
+
+    cursor, page, yielded, skip, refresh, result_set = '*', 0, 0, 0, False, None
+    while True:
+        try:
+            # cursors are only valid for a few minutes, so pages are cached by position within
+            # the result set the (always live) first page describes
+            r = http.get(BASE, params=dict(params, cursor=cursor), headers={'User-Agent': user_agent},
+                         source='crossref', cache_key=('crossref', query, rows, SELECT, result_set, page),
+                         refresh=refresh or not page)
+            r.raise_for_status()
+        except requests.HTTPError as e:
+            if page and not refresh and _cursor_expired(e.response):
+                # a cached page handed us an expired cursor; restart the walk live
+                logger.info(f'CrossRef cursor expired at page {page}; re-paging from the start')
+                cursor, page, skip, refresh, result_set = '*', 0, yielded, True, None
+                continue
+            raise
+        message = r.json()['message']
+        items = message.get('items', [])
+        if not page:
+            result_set = make_key(message.get('total-results'), [it.get('DOI') for it in items[:20]])
+        for it in items:
+            if skip:
+                skip -= 1
+                continue
+            yield _to_record(it)
+            yielded += 1
+            if max_results and yielded >= max_results:
+                return
+        cursor = message.get('next-cursor')
+        if len(items) < rows or not cursor:
+            return
+        page += 1
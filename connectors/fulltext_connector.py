@@ -0,0 +1,177 @@
+# connectors/fulltext_connector.py
+"""Full-text retrieval stage.
+
+For each record a PDF is looked for at its `pdf_url`, in PubMed Central
+(`pmcid`), behind its DOI and at its landing page; HTML pages are followed
+once through their `citation_pdf_url` meta tag. Downloads run in a thread
+pool over the shared transport (`utils.http.send`: pooled session, host
+budgets, retries with backoff, hooks, metrics), at most fulltext.per_host
+at a time per host, and are stored under fulltext.dir so reruns skip them. Each
+stored PDF is handed to a process pool running PyMuPDF as soon as it
+arrives. `file://` URLs and local paths are read only when
+fulltext.allow_local is set (to run the stage against local PDFs); otherwise
+only http(s) URLs are fetched.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urljoin, urlparse
+from urllib.request import url2pathname
+
+import requests
+
+from utils import http
+from utils.logger import get_logger
+
+logger = get_logger('fulltext')
+
+PMC_PDF_URL = 'https://europepmc.org/articles/{pmcid}?pdf=render'
+DOI_URL = 'https://doi.org/{doi}'
+
+
+class Downloader:
+    """HTTP (and, with fulltext.allow_local, file) fetcher with a concurrency cap per host."""
+
+    def __init__(self, cfg):
+        fcfg = cfg.get('fulltext', {})
+        self.timeout = (fcfg.get('connect_timeout', 10), fcfg.get('read_timeout', 60))
+        self.max_bytes = fcfg.get('max_bytes', 50 * 1024 * 1024)
+        self.per_host = fcfg.get('per_host', 2)
+        self.host_limits = fcfg.get('host_limits') or {}
+        self.allow_local = fcfg.get('allow_local', False)
+        self.headers = {'User-Agent': cfg.get('user_agent', 'rag-pipeline/1.0')}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _host_slot(self, host):
+        with self._lock:
+            sem = self._hosts.get(host)
+            if sem is None:
+                sem = self._hosts[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.per_host))
+        with sem:
+            yield
+
+    def fetch(self, url):
+        """Return (content, final url) for an http(s)/file URL or a local path."""
+        parsed = urlparse(url)
+        if parsed.scheme in ('http', 'https'):
+            # redirects (e.g. doi.org -> publisher) are followed under the first host's slot
+            with self._host_slot(parsed.netloc):
+                with http.send(url, source='fulltext', headers=self.headers, timeout=self.timeout,
+                               stream=True) as resp:
+                    resp.raise_for_status()
+                    chunks, size = [], 0
+                    for chunk in resp.iter_content(64 * 1024):
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise ValueError(f'{url} is larger than {self.max_bytes} bytes')
+                        chunks.append(chunk)
+                    return b''.join(chunks), resp.url
+        if not self.allow_local:
+            raise ValueError(f'{url} is not an http(s) URL and fulltext.allow_local is off')
+        path = url2pathname(parsed.path) if parsed.scheme == 'file' else url
+        with open(path, 'rb') as f:
+            return f.read(self.max_bytes + 1), url
+
+    def fetch_pdf(self, url, follow=True):
+        """Return (pdf bytes, url) or None if `url` does not lead to a PDF."""
+        data, final_url = self.fetch(url)
+        if len(data) > self.max_bytes:
+            raise ValueError(f'{url} is larger than {self.max_bytes} bytes')
+        # the header may follow a little junk, as readers tolerate
+        if b'%PDF-' in data[:1024]:
+            return data, final_url
+        if follow and b'<' in data[:1024]:
+            from bs4 import BeautifulSoup
+            meta = BeautifulSoup(data, 'lxml').find('meta', attrs={'name': 'citation_pdf_url'})
+            if meta and meta.get('content'):
+                target = urljoin(final_url, meta['content'])
+                # a page must not point the fetcher at a local file
+                if urlparse(target).scheme in ('http', 'https'):
+                    return self.fetch_pdf(target, follow=False)
+        return None
+
+
+def candidate_urls(rec, cfg):
+    """Places to look for the record's PDF, most direct first."""
+    pmc_url = cfg.get('fulltext', {}).get('pmc_pdf_url', PMC_PDF_URL)
+    urls = [rec.get('pdf_url')]
+    if rec.get('pmcid'):
+        urls.append(pmc_url.format(pmcid=rec['pmcid']))
+    if rec.get('doi'):
+        urls.append(DOI_URL.format(doi=rec['doi']))
+    urls.append(rec.get('url'))
+    return list(dict.fromkeys(u for u in urls if u))
+
+
+def pdf_path(rec, out_dir):
+    """Where the record's PDF is stored under out_dir."""
+    name = re.sub(r'[^A-Za-z0-9._-]+', '_', str(rec.get('id') or rec.get('doi')))
+    return os.path.join(out_dir, name + '.pdf')
+
+
+def _download(downloader, rec, cfg, out_dir):
+    """Store the record's PDF under out_dir; returns (path or None, pdf url or None)."""
+    path = pdf_path(rec, out_dir)
+    if os.path.exists(path) and os.path.getsize(path):
+        return path, None
+    for url in candidate_urls(rec, cfg):
+        try:
+            found = downloader.fetch_pdf(url)
+        except (requests.RequestException, OSError, ValueError) as e:
+            logger.debug(f'{rec.get("id")}: {url} failed ({type(e).__name__}: {e})')
+            continue
+        if found:
+            tmp = path + '.part'
+            with open(tmp, 'wb') as f:
+                f.write(found[0])
+            os.replace(tmp, path)
+            return path, found[1]
+    return None, None
+
+
+def fetch_fulltexts(records, cfg):
+    """Return a `full_text` dict (pdf_text, pdf_url, pdf_path) for each record, in order.
+
+    fulltext.download_workers threads download while fulltext.extract_workers
+    processes (default: one per CPU) extract text from finished downloads.
+    Records without a retrievable PDF get `pdf_text: None`. With
+    fulltext.extract_text false nothing is extracted here; the full-text
+    screener then streams pages from `pdf_path` and stops early.
+    """
+    fcfg = cfg.get('fulltext', {})
+    out_dir = fcfg.get('dir', '.cache/fulltext')
+    os.makedirs(out_dir, exist_ok=True)
+    results = [{'pdf_text': None, 'pdf_url': rec.get('pdf_url') or rec.get('url'), 'pdf_path': None} for rec in records]
+    if not records:
+        return results
+    from utils.pdf_extract import extract_text_from_pdf
+    downloader = Downloader(cfg)
+    extract = fcfg.get('extract_text', True)
+    with ProcessPoolExecutor(max_workers=fcfg.get('extract_workers')) as procs, \
+            ThreadPoolExecutor(max_workers=fcfg.get('download_workers', 8), thread_name_prefix='fulltext') as threads:
+        downloads = {threads.submit(_download, downloader, rec, cfg, out_dir): i for i, rec in enumerate(records)}
+        extractions = {}
+        for fut in as_completed(downloads):
+            i = downloads[fut]
+            path, url = fut.result()
+            if path:
+                results[i]['pdf_path'] = path
+                results[i]['pdf_url'] = url or results[i]['pdf_url']
+                if not extract:
+                    continue
+                extractions[procs.submit(extract_text_from_pdf, path)] = i
+        for fut in as_completed(extractions):
+            i = extractions[fut]
+            try:
+                results[i]['pdf_text'] = fut.result()
+            except Exception as e:
+                # '' rather than None, so the screener does not retry the PDF
+                results[i]['pdf_text'], results[i]['pdf_error'] = '', str(e)
+                logger.warning(f'{records[i].get("id")}: text extraction failed ({e})')
+    logger.info(f'Full text: {sum(1 for r in results if r["pdf_path"])}/{len(records)} PDFs retrieved, '
+                f'{sum(1 for r in results if r["pdf_text"])} with text')
+    return results
@@ -0,0 +1,134 @@
+# connectors/harvest.py
+"""Concurrent harvest stage.
+
+Every connector runs in its own worker thread and record batches are handed
+back to the caller as soon as they arrive, so dedupe preparation can start
+while slower sources are still being queried. Connectors that return a
+generator are streamed in `harvest.batch_size` chunks.
+
+A harvest job is one source's search with one query. `source_jobs` gives
+a config's jobs; `unit_key` identifies the query and config sections a
+job's results depend on, so reviews run together (run_pipeline.py batch)
+harvest each distinct query once.
+"""
+import queue
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from connectors import pubmed_connector, ieee_connector, crossref_connector, scholar_connector, repo_connector
+from utils import http
+from utils.records import Record
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger('harvest')
+
+# (PRISMA source name, request key used for concurrency limits and replay, search callable(cfg, query))
+SOURCES = [
+    ('PubMed', 'pubmed', lambda cfg, query: pubmed_connector.search(query, cfg)),
+    ('IEEE Xplore', 'ieee', lambda cfg, query: ieee_connector.search_ieee(query, cfg)),
+    ('CrossRef', 'crossref', lambda cfg, query: crossref_connector.search_crossref(cfg, query=query)),
+    ('Google Scholar', 'google_scholar', lambda cfg, query: scholar_connector.search_scholar(query, cfg)),
+    ('Repositories', 'github', lambda cfg, query: repo_connector.search_repos(cfg)),
+]
+SOURCE_NAMES = [name for name, _, _ in SOURCES]
+# request key -> (search.queries entry it runs, config sections its results depend on);
+# CrossRef reuses the IEEE query to catch DOIs and more, GitHub has a fixed query
+SOURCE_INPUTS = {
+    'pubmed': ('pubmed', ('pubmed',)),
+    'ieee': ('ieee', ('ieee',)),
+    'crossref': ('ieee', ('crossref', 'user_agent')),
+    'google_scholar': ('google_scholar', ('google_scholar', 'user_agent')),
+    'github': (None, ()),
+}
+
+# `search()` returns the records; `label` names the job's metrics stage
+HarvestJob = namedtuple('HarvestJob', 'name key label search')
+
+_DONE = object()
+
+
+def _batches(records, size):
+    if isinstance(records, list):
+        yield records
+        return
+    it = iter(records)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def source_query(cfg, key):
+    entry = SOURCE_INPUTS[key][0]
+    return cfg['search']['queries'].get(entry) if entry else None
+
+
+def unit_key(cfg, key):
+    """What the results of source `key` depend on: the query (whitespace-normalized) and its config sections."""
+    query = source_query(cfg, key)
+    return key, ' '.join(query.split()) if query else query, {s: cfg.get(s) for s in SOURCE_INPUTS[key][1]}
+
+
+def source_jobs(cfg):
+    return [HarvestJob(name, key, f'harvest:{key}', partial(search, cfg, source_query(cfg, key)))
+            for name, key, search in SOURCES]
+
+
+def _run_source(job, cfg, out, batch_size):
+    name = job.name
+    try:
+        with get_metrics().stage(job.label, thread=True) as stage:
+            _harvest_source(name, job.key, job.search, cfg, out, batch_size, stage)
+    except BaseException as e:
+        out.put((name, e))
+    finally:
+        out.put((name, _DONE))
+
+
+def _harvest_source(name, key, search, cfg, out, batch_size, stage):
+    replay = http.replay_records(key) if http.is_offline() or cfg.get('http_cache', {}).get('replay') else None
+    if replay is not None:
+        logger.info(f'Replaying {len(replay)} cached {name} records')
+        records = [Record(r) for r in replay]
+    else:
+        logger.info(f'Searching {name}...')
+        records = search()
+    count = 0
+    for batch in _batches(records, batch_size):
+        count += len(batch)
+        out.put((name, batch))
+    stage.records_out = count
+    logger.info(f'{name}: {count} records')
+
+
+def iter_harvest(cfg, jobs=None):
+    """Yield (source name, list of records) batches from all connectors as they arrive.
+
+    `jobs` (HarvestJobs, yielded under their name) replaces the searches of
+    `cfg`, which then only supplies the harvest and http_cache settings. A
+    connector exception is re-raised here once it reaches the caller.
+    """
+    jobs = source_jobs(cfg) if jobs is None else jobs
+    hcfg = cfg.get('harvest', {})
+    http.configure_limits(hcfg.get('concurrency'))
+    batch_size = hcfg.get('batch_size', 500)
+    out = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=hcfg.get('max_workers', len(SOURCES)), thread_name_prefix='harvest')
+    try:
+        for job in jobs:
+            pool.submit(_run_source, job, cfg, out, batch_size)
+        pending = len(jobs)
+        while pending:
+            name, item = out.get()
+            if item is _DONE:
+                pending -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield name, item
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,40 +1,172 @@
 # connectors/ieee_connector.py
+import json
 import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 import requests
-from dotenv import load_dotenv
-load_dotenv()
-API_KEY = os.getenv('IEEE_API_KEY')
+from utils import env, http
+from utils.logger import get_logger
+from utils.records import Record
 BASE = 'https://ieeexploreapi.ieee.org/api/v1/search/articles'
+# the API returns at most 200 records per call
+MAX_PAGE_SIZE = 200
 
+logger = get_logger('ieee')
 
-def search_ieee(query, cfg, max_records=500):
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class DailyQuota:
+    """Per-day API call counter persisted in a small JSON file."""
+
+    def __init__(self, limit, path):
+        self.limit = limit
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        return data if data.get('date') == date.today().isoformat() else {'date': date.today().isoformat(), 'used': 0}
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def take(self):
+        with self._lock:
+            data = self._load()
+            if self.limit and data['used'] >= self.limit:
+                raise QuotaExceeded(f"IEEE daily quota of {self.limit} calls used")
+            data['used'] += 1
+            self._save(data)
+
+    def refund(self):
+        with self._lock:
+            data = self._load()
+            data['used'] = max(0, data['used'] - 1)
+            self._save(data)
+
+
+def _to_record(a):
+    return Record({
+        'id': f"ieee:{a.get('article_number')}",
+        'title': a.get('title'),
+        'authors': [auth.get('name') for auth in a.get('authors', [])] if a.get('authors') else [],
+        'year': a.get('publication_year'),
+        'doi': a.get('doi'),
+        'abstract': a.get('abstract'),
+        'url': a.get('html_url') or a.get('pdf_url'),
+        'source': 'IEEE Xplore'
+    })
+
+
+def _describe(e):
+    # requests' messages include the URL, and with it the API key
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return f'HTTP {e.response.status_code}'
+    if isinstance(e, requests.RequestException):
+        return type(e).__name__
+    return str(e)
+
+
+def _fetch_page(query, start_record, page_size, quota, retries):
     params = {
         'format': 'json',
-        'max_records': max_records,
+        'max_records': page_size,
         'querytext': query,
-        'start_record': 1
+        'start_record': start_record
     }
-    if API_KEY:
-        params['apikey'] = API_KEY
+    api_key = env.getenv('IEEE_API_KEY')
+    if api_key:
+        params['apikey'] = api_key
+    # one quota call per page; the transport's retries of a failed call are not counted
+    quota.take()
     try:
-        r = requests.get(BASE, params=params)
-        r.raise_for_status()
-        data = r.json()
+        r = http.get(BASE, params=params, source='ieee', retries=retries)
     except requests.RequestException:
-        # If the IEEE API is unreachable or forbidden (no API key), return empty results
-        return []
-    articles = data.get('articles', [])
-    records = []
+        quota.refund()
+        raise
+    if getattr(r, 'from_cache', False):
+        quota.refund()
+    r.raise_for_status()
+    return r.json()
+
+
+def search_ieee(query, cfg, max_records=None):
+    """Yield IEEE Xplore records for every page of `query`.
+
+    The first page gives `total_records`; the remaining pages are fetched
+    concurrently (harvest.concurrency.ieee) under the ieee.requests_per_second
+    budget and the persisted ieee.daily_quota. A page that still fails after
+    ieee.page_retries is logged and skipped; a failed first page raises,
+    unless the daily quota is used up.
+    """
+    icfg = cfg.get('ieee', {})
+    if not env.getenv('IEEE_API_KEY'):
+        logger.warning('IEEE_API_KEY not set; skipping IEEE Xplore')
+        return
+    page_size = min(icfg.get('page_size', MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+    max_records = max_records or icfg.get('max_records')
+    retries = icfg.get('page_retries', 3)
+    http.limit_host(BASE, icfg.get('requests_per_second', 10))
+    quota = DailyQuota(icfg.get('daily_quota', 200), icfg.get('quota_file', '.cache/ieee_quota.json'))
+
+    try:
+        data = _fetch_page(query, 1, page_size, quota, retries)
+    except QuotaExceeded as e:
+        logger.warning(f'{e}; skipping IEEE Xplore')
+        return
+    except requests.RequestException as e:
+        # from None: requests' message includes the URL, and with it the API key
+        raise type(e)(f'IEEE Xplore search failed: {_describe(e)}', response=e.response) from None
+    total = int(data.get('total_records') or 0)
+    if max_records:
+        total = min(total, max_records)
+    first = data.get('articles', [])[:total]
+    for a in first:
+        yield _to_record(a)
+
+    starts = range(1 + page_size, total + 1, page_size)
+    failed = []
+    workers = http.source_limit('ieee', 2)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ieee') as pool:
+        pending = deque()
+        for n, start in enumerate(starts):
+            fut = pool.submit(_fetch_page, query, start, min(page_size, total - start + 1), quota, retries)
+            pending.append((fut, start))
+            # keep at most two pages per worker in flight
+            if len(pending) >= 2 * workers:
+                if not (yield from _drain(*pending.popleft(), retries, failed)):
+                    # quota used up: the pages never submitted are missing too
+                    failed.extend(starts[n + 1:])
+                    break
+        while pending:
+            yield from _drain(*pending.popleft(), retries, failed)
+    if failed:
+        logger.warning(f'IEEE Xplore: {len(failed)} pages missing (start_record {sorted(failed)})')
+
+
+def _drain(fut, start, retries, failed):
+    """Yield the records of one page; returns False once the daily quota is used up."""
+    try:
+        articles = fut.result().get('articles', [])
+    except QuotaExceeded as e:
+        logger.warning(f'{e}; no further pages from record {start}')
+        failed.append(start)
+        return False
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f'IEEE page at {start} failed after {retries} retries: {_describe(e)}')
+        failed.append(start)
+        return True
     for a in articles:
-        rec = {
-            'id': f"ieee:{a.get('article_number')}",
-            'title': a.get('title'),
-            'authors': [auth.get('name') for auth in a.get('authors', [])] if a.get('authors') else [],
-            'year': a.get('publication_year'),
-            'doi': a.get('doi'),
-            'abstract': a.get('abstract'),
-            'url': a.get('html_url') or a.get('pdf_url'),
-            'source': 'IEEE Xplore'
-        }
-        records.append(rec)
-    return records
+        yield _to_record(a)
+    return True
@@ -1,74 +1,118 @@
 # connectors/pubmed_connector.py
-import os
-import requests
-from urllib.parse import urlencode
-from dotenv import load_dotenv
-load_dotenv()
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from xml.etree import ElementTree as ET
+from utils import env, http
+from utils.cache import make_key
+from utils.records import Record
 
-API_KEY = os.getenv('PUBMED_API_KEY')
 BASE = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils'
+# ids returned by the search to identify its result set
+RESULT_SET_IDS = 20
 
 
-def search(query, cfg, retmax=1000):
-    '''Return a list of metadata dicts from PubMed (id, title, authors, year, doi, abstract, url)'''
-    params = {
-        'db': 'pubmed',
-        'term': query,
-        'retmax': retmax,
-    }
+def _get(endpoint, params, **kwargs):
     # only include API key if set (avoid passing 'None' which leads to HTTP 400)
-    if API_KEY:
-        params['api_key'] = API_KEY
-    resp = requests.get(f"{BASE}/esearch.fcgi?{urlencode(params)}")
+    api_key = env.getenv('PUBMED_API_KEY')
+    if api_key:
+        params = dict(params, api_key=api_key)
+    # NCBI allows 3 requests/second without an API key and 10 with one
+    http.limit_host(BASE, 10 if api_key else 3)
+    resp = http.get(f"{BASE}/{endpoint}", params=params, source='pubmed', **kwargs)
     resp.raise_for_status()
-    from xml.etree import ElementTree as ET
-    root = ET.fromstring(resp.text)
-    ids = [idn.text for idn in root.findall('.//Id')]
-    records = []
-    if not ids:
-        return records
-    fetch_params = {
+    return resp
+
+
+def _parse_article(article):
+    try:
+        title = article.find('.//ArticleTitle').text or ''
+    except Exception:
+        title = ''
+    abstract_elems = article.findall('.//AbstractText')
+    abstract = ' '.join([a.text or '' for a in abstract_elems])
+    year = None
+    try:
+        year = article.find('.//PubDate/Year').text
+    except Exception:
+        pass
+    doi = None
+    for idv in article.findall('.//ArticleId'):
+        if idv.attrib.get('IdType') == 'doi':
+            doi = idv.text
+    # the article's own ids, not those in its ReferenceList
+    pmcid = article.findtext('PubmedData/ArticleIdList/ArticleId[@IdType="pmc"]')
+    authors = []
+    for a in article.findall('.//Author'):
+        lname = a.find('LastName')
+        fname = a.find('ForeName')
+        if lname is not None and fname is not None:
+            authors.append(f"{fname.text} {lname.text}")
+    pmid = article.find('.//PMID').text
+    url = f'https://pubmed.ncbi.nlm.nih.gov/{pmid}/'
+    return Record({
+        'id': f'pubmed:{pmid}',
+        'title': title,
+        'authors': authors,
+        'year': year,
+        'doi': doi,
+        'pmcid': pmcid,
+        'abstract': abstract,
+        'url': url,
+        'source': 'PubMed'
+    })
+
+
+def parse_articles(stream):
+    """Yield records from an efetch XML stream, freeing each PubmedArticle once parsed."""
+    for _, elem in ET.iterparse(stream, events=('end',)):
+        if elem.tag == 'PubmedArticle':
+            yield _parse_article(elem)
+            elem.clear()
+
+
+def _fetch_batch(history, retstart, retmax):
+    resp = _get('efetch.fcgi', {
         'db': 'pubmed',
-        'id': ','.join(ids[:retmax]),
+        'query_key': history['query_key'],
+        'WebEnv': history['webenv'],
+        'retstart': retstart,
+        'retmax': retmax,
         'retmode': 'xml',
-    }
-    if API_KEY:
-        fetch_params['api_key'] = API_KEY
-    r2 = requests.get(f"{BASE}/efetch.fcgi?{urlencode(fetch_params)}")
-    r2.raise_for_status()
-    root2 = ET.fromstring(r2.text)
-    for article in root2.findall('.//PubmedArticle'):
-        try:
-            title = article.find('.//ArticleTitle').text or ''
-        except Exception:
-            title = ''
-        abstract_elems = article.findall('.//AbstractText')
-        abstract = ' '.join([a.text or '' for a in abstract_elems])
-        year = None
-        try:
-            year = article.find('.//PubDate/Year').text
-        except Exception:
-            pass
-        doi = None
-        for idv in article.findall('.//ArticleId'):
-            if idv.attrib.get('IdType') == 'doi':
-                doi = idv.text
-        authors = []
-        for a in article.findall('.//Author'):
-            lname = a.find('LastName')
-            fname = a.find('ForeName')
-            if lname is not None and fname is not None:
-                authors.append(f"{fname.text} {lname.text}")
-        pmid = article.find('.//PMID').text
-        url = f'https://pubmed.ncbi.nlm.nih.gov/{pmid}/'
-        records.append({
-            'id': f'pubmed:{pmid}',
-            'title': title,
-            'authors': authors,
-            'year': year,
-            'doi': doi,
-            'abstract': abstract,
-            'url': url,
-            'source': 'PubMed'
-        })
-    return records
+    }, cache_key=('pubmed-efetch', history['result_set'], retstart, retmax))
+    return list(parse_articles(BytesIO(resp.content)))
+
+
+def search(query, cfg, retmax=None):
+    '''Yield metadata dicts from PubMed (id, title, authors, year, doi, abstract, url).
+
+    The query is posted to the E-utilities history server once and the
+    results are fetched in `pubmed.batch_size` pages, several at a time
+    (harvest.concurrency.pubmed), so memory stays bounded by the pages in
+    flight rather than the size of the result set.
+    '''
+    pcfg = cfg.get('pubmed', {})
+    batch_size = pcfg.get('batch_size', 500)
+    retmax = retmax or pcfg.get('max_records')
+    # the history server session expires, so always refresh the search itself
+    resp = _get('esearch.fcgi', {'db': 'pubmed', 'term': query, 'usehistory': 'y', 'retmax': RESULT_SET_IDS},
+                refresh=True)
+    root = ET.fromstring(resp.content)
+    count = int(root.findtext('Count') or 0)
+    # cached pages belong to one result set (count and first ids): if the search returns
+    # something else, every page is fetched again rather than mixing old and new pages
+    result_set = make_key(query, count, [e.text for e in root.iterfind('IdList/Id')])
+    history = {'webenv': root.findtext('WebEnv'), 'query_key': root.findtext('QueryKey'), 'result_set': result_set}
+    total = min(count, retmax) if retmax else count
+    if not total:
+        return
+    workers = http.source_limit('pubmed', 3)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pubmed') as pool:
+        pending = deque()
+        for retstart in range(0, total, batch_size):
+            pending.append(pool.submit(_fetch_batch, history, retstart, min(batch_size, total - retstart)))
+            # keep at most two batches per worker in flight to bound memory
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -1,26 +1,27 @@
 # connectors/repo_connector.py
-import os
-import requests
-from dotenv import load_dotenv
-load_dotenv()
+from utils import env, http
+from utils.logger import get_logger
+from utils.records import Record
 
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+logger = get_logger('github')
 
 
 def search_repos(cfg):
     headers = {}
-    if GITHUB_TOKEN:
-        headers['Authorization'] = f'token {GITHUB_TOKEN}'
+    token = env.getenv('GITHUB_TOKEN')
+    if token:
+        headers['Authorization'] = f'token {token}'
     q = 'EEG deep learning OR CNN OR LSTM OR transformer'
     url = 'https://api.github.com/search/repositories'
     params = {'q': q, 'per_page': 50}
-    r = requests.get(url, params=params, headers=headers)
+    r = http.get(url, params=params, headers=headers, source='github')
     if r.status_code != 200:
+        logger.warning(f'GitHub search failed: HTTP {r.status_code}')
         return []
     items = r.json().get('items', [])
     recs = []
     for it in items:
-        recs.append({
+        recs.append(Record({
             'id': f"github:{it['id']}",
             'title': it['name'],
             'authors': [it['owner']['login']],
@@ -29,10 +30,11 @@ def search_repos(cfg):
             'abstract': it.get('description'),
             'url': it['html_url'],
             'source': 'GitHub'
-        })
+        }))
     return recs
 
 
-def fetch_fulltext(rec):
-    # Strategy: if rec has pdf_url, return it; otherwise return landing page.
-    return {'pdf_text': None, 'pdf_url': rec.get('pdf_url') or rec.get('url')}
+def fetch_fulltext(rec, cfg=None):
+    # single-record form of fulltext_connector.fetch_fulltexts
+    from connectors import fulltext_connector
+    return fulltext_connector.fetch_fulltexts([rec], cfg or {})[0]
@@ -1,26 +1,151 @@
 # connectors/scholar_connector.py
 # WARNING: scraping Google Scholar can lead to IP blocks. Use carefully.
+"""Google Scholar result pages, parsed with lxml.
+
+Pages are paced adaptively: the delay between live requests starts at
+google_scholar.min_delay and is multiplied by backoff_factor (or set from
+Retry-After) whenever Scholar answers 429/503 or serves a CAPTCHA, in
+which case the same page is retried; it decays back after successful
+pages. Cached pages are not delayed, and nothing waits after the last
+page. Record IDs are a hash of the result's title and byline, so they are
+the same in every run.
+
+`parse_results(html)` works on saved pages too:
+    python -m connectors.scholar_connector saved/*.html > records.json
+"""
+import hashlib
+import random
 import time
-import requests
-from bs4 import BeautifulSoup
 
+from lxml import html as lxml_html
+
+from utils import http
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+from utils.records import Record
+
+logger = get_logger('scholar')
+
+BASE = 'https://scholar.google.com/scholar'
+BLOCK_MARKERS = ('gs_captcha', 'recaptcha', 'unusual traffic', '/sorry/')
+
+
+def _class_xpath(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_RESULTS = f'//div[{_class_xpath("gs_ri")}]'
+_TITLE = f'.//*[{_class_xpath("gs_rt")}]'
+_SNIPPET = f'.//*[{_class_xpath("gs_rs")}]'
+_BYLINE = f'.//*[{_class_xpath("gs_a")}]'
+
+
+def record_id(title, meta):
+    return 'gs:' + hashlib.sha1(f'{title}\0{meta}'.encode('utf-8')).hexdigest()[:16]
+
+
+def _first(item, path):
+    found = item.xpath(path)
+    return found[0] if found else None
+
+
+def parse_results(page):
+    """Records of one Scholar result page (HTML text or bytes)."""
+    if not page or not page.strip():
+        return []
+    results = []
+    for item in lxml_html.fromstring(page).xpath(_RESULTS):
+        title_tag = _first(item, _TITLE)
+        title = title_tag.text_content() if title_tag is not None else ''
+        link = _first(title_tag, './/a[@href]') if title_tag is not None else None
+        snippet = _first(item, _SNIPPET)
+        byline = _first(item, _BYLINE)
+        abstract = snippet.text_content() if snippet is not None else ''
+        meta = byline.text_content() if byline is not None else ''
+        results.append(Record({'id': record_id(title, meta), 'title': title, 'abstract': abstract,
+                               'url': link.get('href') if link is not None else None, 'source': 'Google Scholar'}))
+    return results
+
+
+def is_blocked(resp):
+    """True for rate-limit responses and CAPTCHA / 'unusual traffic' pages."""
+    if resp.status_code in (429, 503):
+        return True
+    if '/sorry/' in (resp.url or ''):
+        return True
+    head = resp.text[:20000].lower() if resp.status_code == 200 else ''
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+
+class Politeness:
+    """Adaptive delay between live Scholar requests."""
+
+    def __init__(self, min_delay=5.0, max_delay=300.0, backoff_factor=2.0, jitter=0.3):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.delay = min_delay
+
+    def wait(self):
+        time.sleep(self.delay * (1 + random.uniform(-self.jitter, self.jitter)))
 
-def search_scholar(query, cfg, pages=3):
-    USER_AGENT = cfg.get('user_agent', 'rag-pipeline/1.0')
-    base = 'https://scholar.google.com/scholar'
+    def blocked(self, retry_after=None):
+        try:
+            wanted = float(retry_after) if retry_after else 0.0
+        except ValueError:
+            wanted = 0.0
+        self.delay = min(self.max_delay, max(self.delay * self.backoff_factor, wanted))
+
+    def succeeded(self):
+        self.delay = max(self.min_delay, self.delay / self.backoff_factor)
+
+
+def search_scholar(query, cfg, pages=None):
+    scfg = cfg.get('google_scholar', {})
+    pages = pages or scfg.get('pages', 3)
+    max_retries = scfg.get('max_retries', 4)
+    headers = {'User-Agent': cfg.get('user_agent', 'rag-pipeline/1.0')}
+    polite = Politeness(scfg.get('min_delay', 5.0), scfg.get('max_delay', 300.0), scfg.get('backoff_factor', 2.0))
     results = []
+    live = False  # whether the previous request went to Scholar rather than the cache
     for page in range(pages):
         params = {'q': query, 'start': page * 10}
-        r = requests.get(base, params=params, headers={'User-Agent': USER_AGENT})
-        if r.status_code != 200:
+        for attempt in range(max_retries + 1):
+            if live:
+                polite.wait()
+            # a retry must not be answered with the blocked page from the cache; 429/503 are
+            # handled here by Politeness rather than by the transport's retries
+            r = http.get(BASE, params=params, headers=headers, source='google_scholar', refresh=attempt > 0,
+                         retry_statuses=())
+            live = not getattr(r, 'from_cache', False)
+            if not is_blocked(r):
+                break
+            get_metrics().count('scholar_blocked', status=str(r.status_code))
+            if not live and http.is_offline():
+                break
+            polite.blocked(r.headers.get('Retry-After'))
+            reason = 'CAPTCHA' if r.status_code == 200 else f'HTTP {r.status_code}'
+            logger.warning(f'Scholar blocked page {page + 1} ({reason}); retrying in ~{polite.delay:.1f}s')
+        else:
+            logger.warning(f'Scholar still blocked after {max_retries} retries; stopping at page {page + 1}')
+            break
+        if r.status_code != 200 or is_blocked(r):
+            break
+        polite.succeeded()
+        found = parse_results(r.text)
+        results.extend(found)
+        if not found:
             break
-        soup = BeautifulSoup(r.text, 'html.parser')
-        for item in soup.select('.gs_ri'):
-            title_tag = item.select_one('.gs_rt')
-            title = title_tag.text if title_tag else ''
-            href = title_tag.a['href'] if title_tag and title_tag.a else None
-            abstract = item.select_one('.gs_rs').text if item.select_one('.gs_rs') else ''
-            meta = item.select_one('.gs_a').text if item.select_one('.gs_a') else ''
-            results.append({'id': f'gs:{hash(title+meta)}', 'title': title, 'abstract': abstract, 'url': href, 'source': 'Google Scholar'})
-        time.sleep(5)
     return results
+
+
+if __name__ == '__main__':
+    import json
+    import sys
+    records = []
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as f:
+            records.extend(parse_results(f.read()))
+    json.dump([r.to_dict() for r in records], sys.stdout, indent=2, ensure_ascii=False)
+    print()
@@ -1,2 +1,2 @@
 """Exporters package"""
-__all__ = ['csv_exporter', 'json_exporter', 'bibtex_exporter']
+__all__ = ['csv_exporter', 'json_exporter', 'bibtex_exporter', 'parquet_exporter']
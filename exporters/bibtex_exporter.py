@@ -1,7 +1,5 @@
-import bibtexparser
-
-
 def write_bibtex(records, path):
+    import bibtexparser
     entries = []
     for r in records:
         bib = {
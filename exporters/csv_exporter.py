@@ -1,33 +1,75 @@
-import pandas as pd
-
-
-def write_csv(records, path):
-    rows = []
-    for r in records:
-        row = {
-            'canonical_id': r.get('id'),
-            'source': r.get('source'),
-            'original_ids': ';'.join(r.get('member_ids', [r.get('id')])),
-            'title': r.get('title'),
-            'authors': ';'.join(r.get('authors') or []),
-            'year': r.get('year'),
-            'doi': r.get('doi'),
-            'abstract': r.get('abstract'),
-            'pdf_url': (r.get('full_text') or {}).get('pdf_url'),
-            'url': r.get('url'),
-            'language': r.get('language', 'English'),
-            'stage_title_abstract_decision': (r.get('ta_decision') or {}).get('decision'),
-            'stage_title_abstract_label': (r.get('ta_decision') or {}).get('exclusion_label'),
-            'stage_title_abstract_evidence': (r.get('ta_decision') or {}).get('evidence_snippet'),
-            'stage_full_text_decision': (r.get('ft_decision') or {}).get('decision') if r.get('ft_decision') else None,
-            'stage_full_text_label': (r.get('ft_decision') or {}).get('exclusion_label') if r.get('ft_decision') else None,
-            'stage_full_text_evidence': (r.get('ft_decision') or {}).get('evidence_snippet') if r.get('ft_decision') else None,
-            'task_category': r.get('task_category'),
-            'confidence': (r.get('ft_decision') or r.get('ta_decision') or {}).get('confidence'),
-            # bias fields (from title/abstract stage)
-            'bias_score': (r.get('ta_decision') or {}).get('bias', {}).get('bias_score'),
-            'bias_flags': ';'.join([k for k,v in ((r.get('ta_decision') or {}).get('bias', {}).get('flags') or {}).items() if v])
-        }
-        rows.append(row)
-    df = pd.DataFrame(rows)
-    df.to_csv(path, index=False)
+import csv
+
+COLUMNS = [
+    'canonical_id', 'source', 'original_ids', 'title', 'authors', 'year', 'doi', 'abstract', 'pdf_url', 'url',
+    'language', 'stage_title_abstract_decision', 'stage_title_abstract_label', 'stage_title_abstract_evidence',
+    'stage_full_text_decision', 'stage_full_text_label', 'stage_full_text_evidence', 'task_category',
+    'confidence', 'bias_score', 'bias_flags', 'priority',
+]
+
+
+def record_row(r):
+    """The export row (COLUMNS) for one canonical record."""
+    return {
+        'canonical_id': r.get('id'),
+        'source': r.get('source'),
+        'original_ids': ';'.join(r.get('member_ids', [r.get('id')])),
+        'title': r.get('title'),
+        'authors': ';'.join(r.get('authors') or []),
+        'year': r.get('year'),
+        'doi': r.get('doi'),
+        'abstract': r.get('abstract'),
+        'pdf_url': (r.get('full_text') or {}).get('pdf_url'),
+        'url': r.get('url'),
+        'language': r.get('language', 'English'),
+        'stage_title_abstract_decision': (r.get('ta_decision') or {}).get('decision'),
+        'stage_title_abstract_label': (r.get('ta_decision') or {}).get('exclusion_label'),
+        'stage_title_abstract_evidence': (r.get('ta_decision') or {}).get('evidence_snippet'),
+        'stage_full_text_decision': (r.get('ft_decision') or {}).get('decision') if r.get('ft_decision') else None,
+        'stage_full_text_label': (r.get('ft_decision') or {}).get('exclusion_label') if r.get('ft_decision') else None,
+        'stage_full_text_evidence': (r.get('ft_decision') or {}).get('evidence_snippet') if r.get('ft_decision') else None,
+        'task_category': r.get('task_category'),
+        'confidence': (r.get('ft_decision') or r.get('ta_decision') or {}).get('confidence'),
+        # bias fields (from title/abstract stage)
+        'bias_score': (r.get('ta_decision') or {}).get('bias', {}).get('bias_score'),
+        'bias_flags': ';'.join([k for k,v in ((r.get('ta_decision') or {}).get('bias', {}).get('flags') or {}).items() if v]),
+        # predicted full-text inclusion probability (prioritize.enabled)
+        'priority': r.get('priority'),
+    }
+
+
+class CsvWriter:
+    """Write export rows to `path` in chunks as records become available."""
+
+    def __init__(self, path, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self._f = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._f, fieldnames=COLUMNS)
+        self._writer.writeheader()
+        self._rows = []
+
+    def write(self, records):
+        for r in records:
+            self._rows.append(record_row(r))
+            if len(self._rows) >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        self._writer.writerows(self._rows)
+        self._rows = []
+        self._f.flush()
+
+    def close(self):
+        self.flush()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_csv(records, path, chunk_size=5000):
+    with CsvWriter(path, chunk_size) as writer:
+        writer.write(records)
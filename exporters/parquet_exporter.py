@@ -0,0 +1,49 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from exporters.csv_exporter import COLUMNS, record_row
+
+# the CSV export's columns; year stays text since sources report it as text or numbers
+FLOAT_COLUMNS = {'confidence', 'bias_score', 'priority'}
+SCHEMA = pa.schema([(c, pa.float64() if c in FLOAT_COLUMNS else pa.string()) for c in COLUMNS])
+
+
+def _batch(rows):
+    return pa.RecordBatch.from_pydict({
+        c: [row[c] if c in FLOAT_COLUMNS or row[c] is None else str(row[c]) for row in rows] for c in COLUMNS
+    }, schema=SCHEMA)
+
+
+class ParquetWriter:
+    """Write export rows to a Parquet file, one row group per chunk."""
+
+    def __init__(self, path, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self._writer = pq.ParquetWriter(path, SCHEMA, compression='zstd')
+        self._rows = []
+
+    def write(self, records):
+        for r in records:
+            self._rows.append(record_row(r))
+            if len(self._rows) >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        if self._rows:
+            self._writer.write_batch(_batch(self._rows))
+            self._rows = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_parquet(records, path, chunk_size=5000):
+    with ParquetWriter(path, chunk_size) as writer:
+        writer.write(records)
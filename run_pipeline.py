@@ -1,16 +1,29 @@
 #!/usr/bin/env python
-"""Main orchestrator for the RAG EEG-BCI pipeline."""
+"""Main orchestrator for the RAG EEG-BCI pipeline.
+
+    python run_pipeline.py run --config config.yaml [--dry-run]
+    python run_pipeline.py harvest|dedupe|screen|fetch|export --config config.yaml
+    python run_pipeline.py batch --config review_a.yaml --config review_b.yaml [--dry-run]
+
+`run` (the default when no subcommand is given) runs every stage; the
+other subcommands run one stage on the checkpointed output of the stages
+before it. `batch` runs several reviews, harvesting each distinct
+source query once (see `batch_main`). Each stage imports its connectors, screeners and exporters
+(and with them pandas, PyMuPDF, rapidfuzz, ...) only when it runs.
+"""
 import argparse
-import yaml
+import hashlib
 import os
-from connectors import pubmed_connector, ieee_connector, crossref_connector, scholar_connector, repo_connector
-from utils.dedupe import dedupe_records
-from screeners.title_abstract_screener import title_abstract_screen
-from screeners.full_text_screener import full_text_screen
-from exporters.csv_exporter import write_csv
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+import yaml
+
 from exporters.json_exporter import write_prisma_json
-from exporters.bibtex_exporter import write_bibtex
+from utils.checkpoint import Checkpoints
 from utils.logger import get_logger
+from utils.metrics import get_metrics
 
 logger = get_logger('run_pipeline')
 
@@ -20,106 +33,495 @@ def load_config(path):
         return yaml.safe_load(f)
 
 
-def main(config_path, dry_run=False):
-    cfg = load_config(config_path)
-    artifacts_dir = cfg['output']['artifacts_dir']
-    os.makedirs(artifacts_dir, exist_ok=True)
-
-    # 1. Search / harvest from connectors (respect order)
-    records_by_source = {}
-    total_identified = 0
-
-    # PUBMED
-    logger.info('Searching PubMed...')
-    pubmed_q = cfg['search']['queries']['pubmed']
-    pubmed_records = pubmed_connector.search(pubmed_q, cfg)
-    records_by_source['PubMed'] = pubmed_records
-    total_identified += len(pubmed_records)
-
-    # IEEE
-    logger.info('Searching IEEE Xplore...')
-    ieee_q = cfg['search']['queries']['ieee']
-    ieee_records = ieee_connector.search_ieee(ieee_q, cfg)
-    records_by_source['IEEE Xplore'] = ieee_records
-    total_identified += len(ieee_records)
-
-    # CrossRef (to catch DOIs and more)
-    logger.info('Searching CrossRef...')
-    crossref_records = crossref_connector.search_crossref(cfg, query=cfg['search']['queries'].get('ieee'))
-    records_by_source['CrossRef'] = crossref_records
-    total_identified += len(crossref_records)
-
-    # Google Scholar fallback (optional)
-    logger.info('Searching Google Scholar (fallback)...')
-    gs_records = scholar_connector.search_scholar(cfg['search']['queries']['google_scholar'], cfg)
-    records_by_source['Google Scholar'] = gs_records
-    total_identified += len(gs_records)
-
-    # Repositories (GitHub, Zenodo)
-    logger.info('Searching Repositories...')
-    repo_records = repo_connector.search_repos(cfg)
-    records_by_source['Repositories'] = repo_records
-    total_identified += len(repo_records)
-
-    # Summary counts
-    logger.info(f'Total records identified (raw): {total_identified}')
-
-    # Merge into flat list
-    flat_records = []
-    for src, recs in records_by_source.items():
-        for r in recs:
+def harvest_stage(cfg):
+    # Search / harvest from all connectors concurrently. Batches are
+    # prepared for dedupe as they arrive; the flat list keeps the fixed
+    # source order so dedupe output does not depend on arrival order.
+    from connectors import harvest
+    from utils.dedupe import prepare_record
+    records_by_source = {name: [] for name in harvest.SOURCE_NAMES}
+    for src, batch in harvest.iter_harvest(cfg):
+        for r in batch:
             r['source'] = src
-            flat_records.append(r)
+            prepare_record(r)
+        records_by_source[src].extend(batch)
+    return records_by_source
 
-    # 2. Deduplicate
+
+def dedupe_stage(cfg, records_by_source):
     logger.info('Deduplicating records...')
-    canonical_records, duplicate_report = dedupe_records(flat_records, cfg['dedupe'])
+    flat_records = [r for recs in records_by_source.values() for r in recs]
+    icfg = cfg['dedupe'].get('index') or {}
+    if icfg.get('enabled'):
+        # living review: merge into the persistent index; the report lists only changes
+        from utils.dedupe_index import DedupeIndex
+        index = DedupeIndex(icfg.get('path', '.cache/dedupe_index.sqlite'))
+        try:
+            return index.merge(flat_records, cfg['dedupe'])
+        finally:
+            index.close()
+    from utils.dedupe import dedupe_records
+    return dedupe_records(flat_records, cfg['dedupe'])
 
-    # Save intermediate artifacts
-    write_prisma_json({'records_identified': {k: len(v) for k, v in records_by_source.items()}, 'total_identified': total_identified}, cfg['output']['prisma_json'])
 
-    # 3. Title/abstract screening
+def title_abstract_stage(cfg, deduped):
     logger.info('Title/Abstract screening...')
-    screened = []
-    for rec in canonical_records:
-        decision = title_abstract_screen(rec, cfg)
+    from screeners.title_abstract_screener import screening_decisions, title_abstract_screen_batch
+    canonical_records, _ = deduped
+    decisions = title_abstract_screen_batch(canonical_records, cfg)
+    for rec, decision in zip(canonical_records, screening_decisions(decisions)):
         rec.update({'ta_decision': decision})
-        screened.append(rec)
+    return canonical_records
+
+
+def _full_text_batch(cfg, records):
+    # PDFs via direct url, PMC or DOI, downloaded and parsed concurrently
+    from connectors import fulltext_connector
+    from screeners.full_text_screener import full_text_screen
+    full_texts = fulltext_connector.fetch_fulltexts(records, cfg)
+    for rec, full_text in zip(records, full_texts):
+        rec['full_text'] = full_text
+        ft_decision = full_text_screen(rec, cfg)
+        rec.update({'ft_decision': ft_decision})
+
 
-    # 4. Determine which to fetch full text
+def full_text_stage(cfg, screened):
     to_fulltext = [r for r in screened if r['ta_decision']['decision'] == 'Include']
+    logger.info('Fetching full-texts and running full-text screen...')
+    if cfg.get('prioritize', {}).get('enabled'):
+        # likely includes first; the rest is left unscreened once the recall target is estimated reached
+        from screeners.prioritizer import run_prioritized
+        from utils.records import Decision, ScreeningDecision
+        deferred = run_prioritized(to_fulltext, cfg, lambda batch: _full_text_batch(cfg, batch))
+        for rec in deferred:
+            rec['ft_decision'] = ScreeningDecision(decision=Decision.DEFERRED, stage='full_text',
+                                                   evidence_snippet='Not screened: estimated recall target reached')
+    else:
+        _full_text_batch(cfg, to_fulltext)
+    return screened
+
+
+def export_stage(cfg, records_by_source, deduped, assessed):
+    logger.info('Exporting artifacts...')
+    from exporters.bibtex_exporter import write_bibtex
+    from exporters.csv_exporter import CsvWriter
+    canonical_records, duplicate_report = deduped
+    final_included = [r for r in assessed if (r.get('ft_decision') or {}).get('decision') == 'Include']
+    chunk_size = cfg['output'].get('chunk_size', 5000)
+    # one pass over the records, each chunk written to every table export before the next
+    with ExitStack() as stack:
+        writers = [stack.enter_context(CsvWriter(cfg['output']['csv'], chunk_size))]
+        if cfg['output'].get('parquet'):
+            from exporters.parquet_exporter import ParquetWriter
+            writers.append(stack.enter_context(ParquetWriter(cfg['output']['parquet'], chunk_size)))
+        for start in range(0, len(assessed), chunk_size):
+            for writer in writers:
+                writer.write(assessed[start:start + chunk_size])
+    write_prisma_json({
+        'records_by_source': {k: len(v) for k, v in records_by_source.items()},
+        'duplicates': duplicate_report,
+        'total_identified': sum(len(v) for v in records_by_source.values()),
+        'de_dup_count': len(canonical_records),
+        'full_text_deferred': _deferred(assessed),
+    }, cfg['output']['prisma_json'])
+    write_bibtex(final_included, cfg['output']['bib'])
+    if cfg.get('search_index', {}).get('enabled'):
+        # BM25 index over the screened records and their full texts (python -m utils.search_index query ...)
+        from utils.search_index import index_from_config
+        with index_from_config(cfg) as index:
+            index.add(assessed)
+
+
+# config each stage's output depends on; a change reruns the stage (and
+# whatever downstream its new output changes)
+STAGE_CONFIG = {
+    'harvest': lambda cfg: {k: cfg.get(k) for k in ('search', 'harvest', 'pubmed', 'ieee', 'crossref')},
+    'dedupe': lambda cfg: cfg.get('dedupe'),
+    'title_abstract': lambda cfg: cfg.get('search'),
+    'full_text': lambda cfg: _full_text_config(cfg),
+}
+# bump a stage's version whenever its code changes what it outputs for the same
+# config and input, so its old checkpoints are not reused
+STAGE_VERSIONS = {'harvest': 2, 'dedupe': 2, 'title_abstract': 2, 'full_text': 2}
+STAGES = list(STAGE_CONFIG) + ['export']
+# subcommand -> the stage it runs ('run': every stage up to this one)
+COMMANDS = {'run': 'export', 'harvest': 'harvest', 'dedupe': 'dedupe', 'screen': 'title_abstract',
+            'fetch': 'full_text', 'export': 'export'}
+
+
+def _full_text_config(cfg):
+    config = {k: v for k, v in (cfg.get('fulltext') or {}).items() if not k.endswith('workers')}
+    pcfg = cfg.get('prioritize') or {}
+    if pcfg.get('enabled'):
+        # the ranking also depends on the labelled export it is trained on
+        labels, digest = pcfg.get('labels'), None
+        exports = {os.path.abspath(p) for p in (cfg['output'].get('csv'), cfg['output'].get('parquet')) if p}
+        if labels and os.path.abspath(labels) in exports:
+            logger.warning(f'prioritize.labels is the export {labels}; each export invalidates the full_text '
+                           f'checkpoint, so point it at a copy')
+        if labels and os.path.exists(labels):
+            with open(labels, 'rb') as f:
+                digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        config['prioritize'] = dict(pcfg, labels_digest=digest)
+    return config
+
+
+def harvest_max_age(cfg, key=None):
+    """Seconds a harvest checkpoint (of source `key`, or of all sources) is reused for, or None.
+
+    checkpoints.harvest_ttl, capped by the sources' http_cache TTLs so the
+    checkpoint does not outlive the responses it was built from.
+    """
+    hcfg = cfg.get('http_cache') or {}
+    if hcfg.get('offline'):
+        return None
+    ages = [(cfg.get('checkpoints') or {}).get('harvest_ttl')]
+    if hcfg.get('enabled', True):
+        ttl = hcfg.get('ttl') or {}
+        ages += [ttl.get(key, hcfg.get('ttl_seconds'))] if key else [hcfg.get('ttl_seconds'), *ttl.values()]
+    ages = [a for a in ages if a]
+    return min(ages) if ages else None
+
+
+def _included(records, key):
+    return sum(1 for r in records if (r.get(key) or {}).get('decision') == 'Include')
+
+
+def _deferred(records):
+    return sum(1 for r in records if (r.get('ft_decision') or {}).get('decision') == 'Deferred')
+
+
+def write_metrics(cfg, metrics):
+    ocfg = cfg['output']
+    path = ocfg.get('metrics_json', os.path.join(os.path.dirname(ocfg['prisma_json']), 'metrics.json'))
+    if path:
+        metrics.write_json(path)
+    if ocfg.get('openmetrics'):
+        metrics.write_openmetrics(ocfg['openmetrics'])
+
+
+def _pipeline(cfg, run, last, todo, prefix=''):
+    """Run (or load) the stages up to `last`; returns {stage: StageResult} of those reached."""
+    results = {}
+    # 1. Harvest
+    harvested = results['harvest'] = run('harvest', harvest_stage,
+                                         count=lambda v: sum(len(recs) for recs in v.values()))
+    records_by_source = harvested.value
+    total_identified = sum(len(v) for v in records_by_source.values())
+    logger.info(f'Total records identified (raw): {total_identified}')
+    if last == 'harvest':
+        return results
+
+    # 2. Deduplicate
+    deduped = results['dedupe'] = run('dedupe', dedupe_stage, harvested, records_in=total_identified,
+                                      count=lambda v: len(v[0]))
+    if 'dedupe' in todo:
+        # Save intermediate artifacts
+        write_prisma_json({'records_identified': {k: len(v) for k, v in records_by_source.items()}, 'total_identified': total_identified}, cfg['output']['prisma_json'])
+    if last == 'dedupe':
+        return results
+
+    # 3. Title/abstract screening
+    screened = results['title_abstract'] = run('title_abstract', title_abstract_stage, deduped,
+                                               records_in=len(deduped.value[0]),
+                                               count=lambda v: _included(v, 'ta_decision'))
+    to_fulltext = [r for r in screened.value if r['ta_decision']['decision'] == 'Include']
     logger.info(f'Full-text to assess: {len(to_fulltext)}')
+    if last == 'title_abstract':
+        return results
+
+    # 4. Fetch full text + run full text screen
+    assessed = results['full_text'] = run('full_text', full_text_stage, screened, records_in=len(to_fulltext),
+                                          count=lambda v: _included(v, 'ft_decision'))
+    if last == 'full_text':
+        return results
+
+    # 5. Export results (always rerun; it only writes files)
+    with get_metrics().stage(f'{prefix}export', records_in=len(assessed.value)) as stage:
+        export_stage(cfg, records_by_source, deduped.value, assessed.value)
+        stage.records_out = len(assessed.value)
+    return results
+
+
+def _stage_runner(cfg, stages, todo, prefix='', preloaded=None):
+    """`run(name, fn, *inputs)` for `_pipeline`: stages in `todo` run (or reuse their checkpoint), others load."""
+    metrics = get_metrics()
 
-    if not dry_run:
-        # 5. Fetch full text + run full text screen
-        logger.info('Fetching full-texts and running full-text screen...')
-        final_included = []
-        for rec in to_fulltext:
-            # try PDF retrieval via CrossRef/PMC/IEEE or direct url
-            rec['full_text'] = repo_connector.fetch_fulltext(rec)
-            ft_decision = full_text_screen(rec, cfg)
-            rec.update({'ft_decision': ft_decision})
-            if ft_decision['decision'] == 'Include':
-                final_included.append(rec)
-
-        # 6. Export results
-        logger.info('Exporting artifacts...')
-        write_csv(canonical_records, cfg['output']['csv'])
-        write_prisma_json({
-            'records_by_source': {k: len(v) for k, v in records_by_source.items()},
-            'duplicates': duplicate_report,
-            'total_identified': total_identified,
-            'de_dup_count': len(canonical_records),
-        }, cfg['output']['prisma_json'])
-        write_bibtex(final_included, cfg['output']['bib'])
-        logger.info('Pipeline finished.')
+    def run(name, fn, *inputs, records_in=None, count=len):
+        if preloaded and name in preloaded:
+            return preloaded[name]
+        config, version = STAGE_CONFIG[name](cfg), STAGE_VERSIONS[name]
+        if name not in todo:
+            # an upstream stage of a single-stage subcommand: its checkpoint (of any age) or nothing
+            result = stages.load(name, *inputs, config=config, version=version)
+            if result is None:
+                upstream = next(c for c, stage in COMMANDS.items() if stage == name)
+                raise SystemExit(f'{name}: no checkpoint for this config and input; run `{upstream}` first')
+            return result
+        with metrics.stage(f'{prefix}{name}', records_in) as stage:
+            result = stages.run(name, lambda *values: fn(cfg, *values), *inputs, config=config, version=version,
+                                max_age=harvest_max_age(cfg) if name == 'harvest' else None)
+            stage.records_out = count(result.value)
+        return result
+    return run
+
+
+def _checkpoints(cfg, refresh, enabled):
+    ccfg = cfg.get('checkpoints', {})
+    return Checkpoints(ccfg.get('dir', '.cache/checkpoints'), enabled=enabled and ccfg.get('enabled', True),
+                       refresh=refresh)
+
+
+def main(config_path, dry_run=False, offline=False, refresh=(), checkpoints=True, command='run'):
+    cfg = load_config(config_path)
+    if offline:
+        cfg.setdefault('http_cache', {})['offline'] = True
+    artifacts_dir = cfg['output']['artifacts_dir']
+    os.makedirs(artifacts_dir, exist_ok=True)
+    last = COMMANDS[command]
+    if command == 'run':
+        if dry_run:
+            last = 'title_abstract'
+        todo = STAGES[:STAGES.index(last) + 1]
     else:
-        logger.info('Dry run finished. No full-text fetched.')
+        todo = [last]
+    if 'harvest' in todo or 'full_text' in todo:
+        from utils import http
+        http.configure_transport(cfg)
+        http.configure_cache(cfg)
+    stages = _checkpoints(cfg, refresh, checkpoints)
+    metrics = get_metrics()
+    metrics.reset()
+    metrics.info.update({'config': config_path, 'command': command, 'dry_run': dry_run, 'offline': offline,
+                         'status': 'running'})
+    try:
+        _pipeline(cfg, _stage_runner(cfg, stages, todo), last, todo)
+        if command != 'run':
+            logger.info(f'{command} finished.')
+        elif dry_run:
+            logger.info('Dry run finished. No full-text fetched.')
+        else:
+            logger.info('Pipeline finished.')
+        metrics.info['status'] = 'finished'
+    except BaseException as e:
+        metrics.info['status'] = f'failed: {type(e).__name__}'
+        raise
+    finally:
+        write_metrics(cfg, metrics)
+
+
+def review_names(config_paths):
+    """A unique name per config: its file name without extension."""
+    names = []
+    for path in config_paths:
+        base = name = os.path.splitext(os.path.basename(path))[0]
+        n = 2
+        while name in names:
+            name, n = f'{base}-{n}', n + 1
+        names.append(name)
+    return names
+
+
+def batch_harvest(reviews, stages, refresh=()):
+    """Harvest each distinct source query of `reviews` once.
+
+    A source query is identified by `harvest.unit_key` (source, normalized
+    query, the source's config sections); its prepared records are
+    checkpointed as a `harvest_unit`, reused up to `harvest_max_age` for
+    its source (the first config's). Returns {review: [(source name,
+    shared records)]} in source order; callers copy the records before a
+    stage mutates them.
+    """
+    from connectors import harvest
+    from utils.cache import make_key
+    from utils.dedupe import prepare_record
+    units, plan = {}, {}
+    for review, cfg in reviews:
+        plan[review] = []
+        for name, key, _ in harvest.SOURCES:
+            unit = harvest.unit_key(cfg, key)
+            uid = make_key(unit)
+            units.setdefault(uid, (name, key, unit, cfg))
+            plan[review].append((name, uid))
+    records, jobs, searched = {}, {}, Counter()
+    version, shared = STAGE_VERSIONS['harvest'], reviews[0][1]
+    for uid, (name, key, unit, cfg) in units.items():
+        cached = None if 'harvest' in refresh else stages.load('harvest_unit', config=unit, version=version,
+                                                                 max_age=harvest_max_age(shared, key))
+        if cached is not None:
+            records[uid] = cached.value
+            continue
+        searched[key] += 1
+        job = next(j for j in harvest.source_jobs(cfg) if j.key == key)
+        jobs[f'{name} #{searched[key]}'] = (uid, job._replace(name=f'{name} #{searched[key]}',
+                                                               label=f'harvest:{key}:{searched[key]}'))
+    logger.info(f'Batch harvest: {len(reviews)} reviews, {sum(len(p) for p in plan.values())} source queries, '
+                f'{len(units)} distinct, {len(jobs)} to search')
+    if jobs:
+        collected = {uid: [] for uid, _ in jobs.values()}
+        for tag, batch in harvest.iter_harvest(reviews[0][1], [job for _, job in jobs.values()]):
+            uid = jobs[tag][0]
+            for r in batch:
+                r['source'] = units[uid][0]
+                prepare_record(r)
+            collected[uid].extend(batch)
+        for uid, batch in collected.items():
+            records[uid] = stages.save('harvest_unit', batch, config=units[uid][2], version=version).value
+    get_metrics().info['harvest_units'] = {'source_queries': sum(len(p) for p in plan.values()),
+                                           'distinct': len(units), 'searched': len(jobs)}
+    return {review: [(name, records[uid]) for name, uid in plan[review]] for review in plan}
+
+
+def canonical_pool(reviewed):
+    """Link the canonical records of several reviews into one pool.
+
+    `reviewed` is [(review, canonical records)]. Records sharing a member
+    id or a DOI are the same pool entry, so a paper found by several
+    reviews appears once with every review it is in and its decision there.
+    """
+    parent = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = x = parent[parent[x]]
+        return x
+
+    keyed = []
+    for review, records in reviewed:
+        for r in records:
+            keys = [f'id:{i}' for i in r.get('member_ids') or [r['id']]]
+            if r.get('doi'):
+                keys.append(f'doi:{str(r["doi"]).lower()}')
+            root = find(keys[0])
+            for k in keys[1:]:
+                parent[find(k)] = root
+            keyed.append((review, r, keys[0]))
+    pool = {}
+    for review, r, key in keyed:
+        decision = (r.get('ft_decision') or r.get('ta_decision') or {}).get('decision')
+        entry = pool.setdefault(find(key), {'pool_id': r['id'], 'title': r.get('title'), 'year': r.get('year'),
+                                           'doi': r.get('doi'), 'reviews': {}})
+        entry['reviews'][review] = str(decision) if decision else ''
+    return list(pool.values())
+
+
+def write_pool_csv(pool, path):
+    import csv
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['pool_id', 'title', 'year', 'doi', 'reviews', 'included_in'])
+        for e in pool:
+            included = [review for review, decision in e['reviews'].items() if decision == 'Include']
+            writer.writerow([e['pool_id'], e['title'], e['year'], e['doi'], ';'.join(e['reviews']), ';'.join(included)])
+
+
+def prisma_counts(results):
+    """Per-review counts, as in that review's prisma_counts.json plus the screening includes."""
+    records_by_source = results['harvest'].value
+    counts = {'records_by_source': {k: len(v) for k, v in records_by_source.items()},
+              'total_identified': sum(len(v) for v in records_by_source.values())}
+    if 'dedupe' in results:
+        canonical_records, report = results['dedupe'].value
+        counts.update(de_dup_count=len(canonical_records),
+                      duplicates={k: len(v) for k, v in report.items() if isinstance(v, list)})
+    if 'title_abstract' in results:
+        counts['title_abstract_included'] = _included(results['title_abstract'].value, 'ta_decision')
+    if 'full_text' in results:
+        counts['full_text_included'] = _included(results['full_text'].value, 'ft_decision')
+        counts['full_text_deferred'] = _deferred(results['full_text'].value)
+    return counts
+
+
+def batch_main(config_paths, dry_run=False, offline=False, refresh=(), checkpoints=True, output=None):
+    """Run several reviews together: each distinct source query is harvested once, then every
+    review runs its own dedupe, screening and exporters on its share of the harvest.
+
+    The first config supplies the shared settings (http, http_cache, harvest, checkpoints).
+    Reviews whose harvest and stage config are identical share the dedupe and screening work
+    through the stage checkpoints. Writes batch_summary.json (per-review PRISMA counts),
+    pool.csv (the canonical pool across reviews) and metrics.json to `output`.
+    """
+    from utils import http
+    from utils.records import Record
+    reviews = [(name, load_config(path)) for name, path in zip(review_names(config_paths), config_paths)]
+    base = reviews[0][1]
+    for _, cfg in reviews:
+        if offline:
+            cfg.setdefault('http_cache', {})['offline'] = True
+        os.makedirs(cfg['output']['artifacts_dir'], exist_ok=True)
+    output = output or os.path.join(base['output']['artifacts_dir'], 'batch')
+    os.makedirs(output, exist_ok=True)
+    http.configure_transport(base)
+    http.configure_cache(base)
+    stages = _checkpoints(base, refresh, checkpoints)
+    last = 'title_abstract' if dry_run else 'export'
+    todo = STAGES[:STAGES.index(last) + 1]
+    metrics = get_metrics()
+    metrics.reset()
+    metrics.info.update({'command': 'batch', 'configs': list(config_paths), 'dry_run': dry_run, 'offline': offline,
+                         'status': 'running'})
+    try:
+        with metrics.stage('harvest') as stage:
+            shared = batch_harvest(reviews, stages, refresh)
+            stage.records_out = sum(len(recs) for plan in shared.values() for _, recs in plan)
+        summary, reviewed = {}, []
+        for review, cfg in reviews:
+            logger.info(f'Review {review}')
+            # the review's own copies: dedupe and screening annotate the records in place
+            records_by_source = {name: [Record(r) for r in recs] for name, recs in shared.pop(review)}
+            harvested = stages.save('harvest', records_by_source, config=STAGE_CONFIG['harvest'](cfg),
+                                    version=STAGE_VERSIONS['harvest'])
+            run = _stage_runner(cfg, stages, todo, prefix=f'{review}/', preloaded={'harvest': harvested})
+            results = _pipeline(cfg, run, last, todo, prefix=f'{review}/')
+            summary[review] = prisma_counts(results)
+            reviewed.append((review, results['full_text' if 'full_text' in results else 'title_abstract'].value))
+        pool = canonical_pool(reviewed)
+        write_pool_csv(pool, os.path.join(output, 'pool.csv'))
+        write_prisma_json({'reviews': summary, 'harvest_units': metrics.info['harvest_units'],
+                           'pool': {'records': len(pool),
+                                    'in_several_reviews': sum(1 for e in pool if len(e['reviews']) > 1)}},
+                          os.path.join(output, 'batch_summary.json'))
+        logger.info(f'Batch finished: {len(reviews)} reviews, {len(pool)} records in the canonical pool')
+        metrics.info['status'] = 'finished'
+    except BaseException as e:
+        metrics.info['status'] = f'failed: {type(e).__name__}'
+        raise
+    finally:
+        metrics.write_json(os.path.join(output, 'metrics.json'))
+
+
+def parse_args(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ('batch', '-h', '--help'):
+        # `run_pipeline.py --config config.yaml` runs the whole pipeline, as before subcommands
+        argv.insert(0, 'run')
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--offline', action='store_true', help='serve connector requests from the response cache only')
+    options.add_argument('--refresh', action='append', default=[], choices=list(STAGE_CONFIG),
+                         help='rerun a stage even if its checkpoint matches (repeatable)')
+    options.add_argument('--no-checkpoints', action='store_true', help='neither read nor write stage checkpoints')
+    common = argparse.ArgumentParser(add_help=False, parents=[options])
+    common.add_argument('--config', required=True)
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('run', parents=[common], help='every stage (the default)')
+    p.add_argument('--dry-run', action='store_true', help='stop before fetching full texts')
+    commands.add_parser('harvest', parents=[common], help='search all sources')
+    commands.add_parser('dedupe', parents=[common], help='deduplicate the checkpointed harvest')
+    commands.add_parser('screen', parents=[common], help='title/abstract screening of the checkpointed dedupe')
+    commands.add_parser('fetch', parents=[common], help='fetch and screen full texts of the screened includes')
+    commands.add_parser('export', parents=[common], help='write the artifacts from the checkpointed stages')
+    p = commands.add_parser('batch', parents=[options], help='several reviews sharing one harvest')
+    p.add_argument('--config', action='append', required=True, help='a review config (repeat for each review)')
+    p.add_argument('--dry-run', action='store_true', help='stop before fetching full texts')
+    p.add_argument('--output', help='batch summary, pool and metrics directory (default: <artifacts_dir>/batch)')
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--config', required=True)
-    parser.add_argument('--dry-run', action='store_true')
-    args = parser.parse_args()
-    main(args.config, args.dry_run)
+    args = parse_args()
+    if args.command == 'batch':
+        batch_main(args.config, args.dry_run, args.offline, args.refresh, not args.no_checkpoints, args.output)
+    else:
+        main(args.config, getattr(args, 'dry_run', False), args.offline, args.refresh, not args.no_checkpoints,
+             args.command)
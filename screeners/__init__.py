@@ -1,2 +1,2 @@
 """Screeners package"""
-__all__ = ['title_abstract_screener', 'full_text_screener']
+__all__ = ['title_abstract_screener', 'full_text_screener', 'prioritizer']
@@ -1,9 +1,14 @@
 # screeners/full_text_screener.py
 import re
+from utils.keywords import get_matcher
+from utils.logger import get_logger
+from utils.records import Decision, ExclusionLabel, ScreeningDecision
 
 DL_KEYWORDS = ['cnn','convolution','rnn','lstm','transformer','deep neural','deep network','neural network']
 METRIC_KEYWORDS = ['accuracy','f1','roc','auc','sensitivity','specificity','precision','recall','confusion matrix']
 
+logger = get_logger('full_text_screener')
+
 
 def find_snippet(text, keywords, window=200):
     if not text:
@@ -18,17 +23,85 @@ def find_snippet(text, keywords, window=200):
     return None
 
 
-def full_text_screen(record, cfg):
-    full = record.get('full_text', {})
-    text = full.get('pdf_text') or ''
+class _ExtractionFailed(Exception):
+    pass
+
+
+def _pdf_pages(path):
+    from utils.pdf_extract import iter_pages
+    try:
+        yield from iter_pages(path)
+    except Exception as e:
+        raise _ExtractionFailed(str(e)) from e
+
+
+def screen_pages(record, pages, window=200):
+    """Full-text decision from an iterable of page texts, read only as far as the decision needs.
+
+    As in `find_snippet` (and `Hits.first`), the evidence is the window
+    around the first occurrence of the earliest-listed keyword present in
+    the whole text, so each page is lowercased once and searched for the
+    keywords not found yet. Pages stop being consumed only once the first
+    DL keyword and some metric keyword are found and the DL window is
+    complete; otherwise the whole document is read. The result is the
+    decision for all the pages joined with newlines.
+    """
     if record.get('member_ids') and len(record.get('member_ids')) > 1:
-        return {'decision':'Exclude','stage':'full_text','exclusion_label':'Duplicate study','evidence_snippet':'Duplicate group','confidence':0.99}
+        return ScreeningDecision(decision=Decision.EXCLUDE, stage='full_text', exclusion_label=ExclusionLabel.DUPLICATE, evidence_snippet='Duplicate group', confidence=0.99)
 
-    dl_snip = find_snippet(text, DL_KEYWORDS)
+    matcher = get_matcher()
+    categories = ('ft_dl', 'metric')
+    patterns = {c: re.compile(matcher.pattern(c)) for c in categories}
+    # category -> {keyword: offset of its first occurrence in the lowercased joined text}
+    first = {c: {} for c in categories}
+    top = matcher.keywords['ft_dl'][0]
+    read, offset = [], 0  # offset: of the next page in the lowercased joined text
+    for page in pages:
+        page = page or ''
+        if read:
+            offset += 1
+        read.append(page)
+        lowered = page.lower()
+        for category, pattern in patterns.items():
+            found = first[category]
+            if len(found) == len(matcher.keywords[category]) or not pattern.search(lowered):
+                continue
+            for k in matcher.keywords[category]:
+                if k not in found:
+                    idx = lowered.find(k)
+                    if idx != -1:
+                        found[k] = offset + idx
+        offset += len(lowered)
+        # no later page can change the evidence once the top DL keyword's window is read
+        if top in first['ft_dl'] and first['metric'] and offset >= first['ft_dl'][top] + window:
+            break
+    text = '\n'.join(read)
+
+    def snippet(category):
+        for k in matcher.keywords[category]:
+            idx = first[category].get(k)
+            if idx is not None:
+                return text[max(0, idx - window):idx + window]
+        return None
+
+    dl_snip = snippet('ft_dl')
     if not dl_snip:
-        if not any(k in (record.get('abstract') or '').lower() for k in DL_KEYWORDS):
-            return {'decision':'Exclude','stage':'full_text','exclusion_label':'Insufficient methodological detail','evidence_snippet':'No DL architecture mention in full text or abstract','confidence':0.8}
-    metric_snip = find_snippet(text, METRIC_KEYWORDS)
+        if not matcher.scan(record.get('abstract') or '').has('ft_dl'):
+            return ScreeningDecision(decision=Decision.EXCLUDE, stage='full_text', exclusion_label=ExclusionLabel.INSUFFICIENT_METHODS, evidence_snippet='No DL architecture mention in full text or abstract', confidence=0.8)
+    metric_snip = snippet('metric')
     if not metric_snip:
-        return {'decision':'Exclude','stage':'full_text','exclusion_label':'No performance metrics reported','evidence_snippet':'No metrics found in full text','confidence':0.9}
-    return {'decision':'Include','stage':'full_text','exclusion_label':None,'evidence_snippet':(dl_snip or metric_snip)[:400],'confidence':0.95}
+        return ScreeningDecision(decision=Decision.EXCLUDE, stage='full_text', exclusion_label=ExclusionLabel.NO_METRICS, evidence_snippet='No metrics found in full text', confidence=0.9)
+    return ScreeningDecision(decision=Decision.INCLUDE, stage='full_text', exclusion_label=None, evidence_snippet=(dl_snip or metric_snip)[:400], confidence=0.95)
+
+
+def full_text_screen(record, cfg):
+    full = record.get('full_text') or {}
+    if full.get('pdf_text') is None and full.get('pdf_path'):
+        # not extracted up front (fulltext.extract_text: false): stream pages from the stored PDF
+        try:
+            return screen_pages(record, _pdf_pages(full['pdf_path']))
+        except _ExtractionFailed as e:
+            # failed part-way: like a failed up-front extraction, and not decided on the pages read so far
+            logger.warning(f'{record.get("id")}: text extraction failed ({e})')
+            full['pdf_text'], full['pdf_error'] = '', str(e)
+    return screen_pages(record, [full.get('pdf_text') or ''])
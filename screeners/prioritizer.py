@@ -0,0 +1,178 @@
+# screeners/prioritizer.py
+"""Screening prioritization (`prioritize` config section).
+
+An online logistic-regression model over hashed word unigram/bigram
+features of title and abstract ranks the records that passed
+title/abstract screening by how likely they are to be included at full
+text. It is trained by SGD on the labels of a previous export
+(prioritize.labels, a copy of an earlier run's records_deduped.csv kept
+apart from the export, which each run rewrites): full-text Include is
+positive, any exclusion negative. It keeps learning from each batch
+screened in this run.
+
+`run_prioritized` fetches and screens full texts in batches, highest
+priority first, re-ranking after every batch. Once at least min_records
+have been screened and min_positives included, it stops when the
+estimated recall passes recall_target. The estimate is includes found /
+(includes found + sum of predicted probabilities of the rest). Records
+that were never reached are returned (the stage marks them Deferred).
+Every record gets its `priority`, the model's probability when it was
+scheduled (or deferred), which is exported.
+"""
+import math
+import os
+import re
+import zlib
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger('prioritizer')
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def features(title, abstract, n_features):
+    """Signed hashed features (indices, values) of a record's title and abstract, L2-normalized."""
+    grams = []
+    for prefix, text in (('t', title), ('a', abstract)):
+        tokens = TOKEN_RE.findall((text or '').lower())
+        grams += [f'{prefix}:{t}' for t in tokens]
+        grams += [f'{prefix}:{a} {b}' for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    hashes = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.int64, count=len(grams))
+    # the top bit of the hash gives the sign, so colliding features tend to cancel out
+    signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+    idx, inverse = np.unique(hashes % n_features, return_inverse=True)
+    values = np.bincount(inverse, weights=signs)
+    values = np.sign(values) * np.log1p(np.abs(values))
+    norm = np.sqrt((values ** 2).sum())
+    return idx, values / norm if norm else values
+
+
+def record_features(r, n_features):
+    return features(r.get('title'), r.get('abstract'), n_features)
+
+
+class Prioritizer:
+    """Logistic regression trained by SGD on sparse hashed features; positives are reweighted online."""
+
+    def __init__(self, n_features=1 << 18, alpha=1e-5, learning_rate=0.5, epochs=5, seed=0):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.seed = seed
+        self.weights = np.zeros(n_features)
+        self.bias = 0.0
+        self.steps = 0
+        self.seen = [0, 0]  # negatives, positives
+
+    @property
+    def trained(self):
+        return self.seen[0] > 0 and self.seen[1] > 0
+
+    def partial_fit(self, feats, labels, epochs=1):
+        labels = [int(bool(y)) for y in labels]
+        for y in labels:
+            self.seen[y] += 1
+        pos_weight = min(50.0, self.seen[0] / self.seen[1]) if self.seen[1] else 1.0
+        rng = np.random.default_rng(self.seed + self.steps)
+        for _ in range(epochs):
+            for k in rng.permutation(len(labels)).tolist():
+                idx, val = feats[k]
+                y = labels[k]
+                z = float(self.weights[idx] @ val) + self.bias
+                p = 1.0 / (1.0 + math.exp(-max(-35.0, min(35.0, z))))
+                g = (p - y) * (pos_weight if y else 1.0)
+                eta = self.learning_rate / (1.0 + self.learning_rate * self.alpha * self.steps)
+                # L2 decay only on the touched weights keeps a step proportional to the record's features
+                self.weights[idx] -= eta * (g * val + self.alpha * self.weights[idx])
+                self.bias -= eta * g
+                self.steps += 1
+        return self
+
+    def fit_initial(self, feats, labels):
+        return self.partial_fit(feats, labels, epochs=self.epochs)
+
+    def predict_proba(self, feats):
+        z = np.array([float(self.weights[idx] @ val) for idx, val in feats]) + self.bias
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -35.0, 35.0)))
+
+
+def labels_from_export(path):
+    """(title, abstract, included) for the full-text-labelled or excluded rows of a CSV/Parquet export."""
+    if path.endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        rows = pq.read_table(path, columns=['title', 'abstract', 'stage_title_abstract_decision',
+                                            'stage_full_text_decision']).to_pylist()
+    else:
+        import csv
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    labelled = []
+    for row in rows:
+        ta, ft = row.get('stage_title_abstract_decision') or '', row.get('stage_full_text_decision') or ''
+        if ft in ('Include', 'Exclude'):
+            labelled.append((row.get('title'), row.get('abstract'), ft == 'Include'))
+        elif ta == 'Exclude':
+            labelled.append((row.get('title'), row.get('abstract'), False))
+    return labelled
+
+
+def model_from_config(cfg):
+    pcfg = cfg.get('prioritize', {})
+    model = Prioritizer(n_features=1 << pcfg.get('hash_bits', 18), alpha=pcfg.get('alpha', 1e-5),
+                        learning_rate=pcfg.get('learning_rate', 0.5), epochs=pcfg.get('epochs', 5))
+    path = pcfg.get('labels')
+    if path and os.path.exists(path):
+        labelled = labels_from_export(path)
+        model.fit_initial([features(t, a, model.n_features) for t, a, _ in labelled], [y for _, _, y in labelled])
+        logger.info(f'Prioritizer trained on {len(labelled)} labelled records from {path} '
+                    f'({model.seen[1]} includes)')
+    else:
+        logger.info('Prioritizer: no labelled export yet; learning from this run only')
+    return model
+
+
+def _included(r):
+    return (r.get('ft_decision') or {}).get('decision') == 'Include'
+
+
+def run_prioritized(records, cfg, process):
+    """Call `process(batch)` on `records` in priority order until the recall target is estimated reached.
+
+    `process` must set each record's `ft_decision`. Returns the records that were never processed.
+    """
+    pcfg = cfg.get('prioritize', {})
+    batch_size = pcfg.get('batch_size', 50)
+    target = pcfg.get('recall_target', 0.95)
+    min_records = pcfg.get('min_records', 100)
+    min_positives = pcfg.get('min_positives', 10)
+    model = model_from_config(cfg)
+    feats = [record_features(r, model.n_features) for r in records]
+    remaining = list(range(len(records)))
+    screened = found = 0
+    while remaining:
+        probs = model.predict_proba([feats[i] for i in remaining])
+        if model.trained:
+            order = np.argsort(-probs, kind='stable')
+            remaining, probs = [remaining[k] for k in order.tolist()], probs[order]
+        for i, p in zip(remaining, probs.tolist()):
+            records[i]['priority'] = round(p, 6)
+        if model.trained and screened >= min_records and found >= min_positives:
+            expected = float(probs.sum())
+            recall = found / (found + expected)
+            if recall >= target:
+                logger.info(f'Prioritized full text: estimated recall {recall:.3f} after {screened} records '
+                            f'({found} includes); {len(remaining)} records deferred')
+                break
+        batch, remaining = remaining[:batch_size], remaining[batch_size:]
+        process([records[i] for i in batch])
+        labels = [_included(records[i]) for i in batch]
+        screened += len(batch)
+        found += sum(labels)
+        model.partial_fit([feats[i] for i in batch], labels)
+    return [records[i] for i in remaining]
@@ -1,6 +1,15 @@
 # screeners/title_abstract_screener.py
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from utils.bias import assess_bias
+from itertools import repeat
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from utils.bias import BIAS_ASSESSMENTS, FLAG_NAMES, assess_bias
+from utils.keywords import get_matcher
+from utils.records import Decision, ExclusionLabel, ScreeningDecision
 
 # Focus keywords for EEG classification studies
 DL_KEYWORDS = ['deep learning','neural network','cnn','conv','rnn','lstm','transformer','deep network']
@@ -9,13 +18,6 @@ CLASSIFICATION_KEYWORDS = ['classif', 'classifier', 'accuracy', 'f1', 'roc', 'au
 REVIEW_KEYWORDS = ['review','survey','systematic review','meta-analysis']
 
 
-def contains_any(text, keywords):
-    if not text:
-        return False
-    t = text.lower()
-    return any(k in t for k in keywords)
-
-
 def title_abstract_screen(record, cfg):
     """Screen on title/abstract with an added bias assessment.
 
@@ -26,38 +28,199 @@ def title_abstract_screen(record, cfg):
     abstract = record.get('abstract','') or ''
     year = record.get('year')
     text = (title or '') + ' ' + (abstract or '')
+    # one lowercased scan answers every keyword check below and the bias flags
+    hits = get_matcher().scan(text)
 
     # date filtering
     try:
         if year:
             y = int(str(year)[:4])
             if y < int(cfg['search']['date_from'][:4]) or y > int(cfg['search']['date_to'][:4]):
-                bias_info = assess_bias(record)
-                return {'decision':'Exclude','stage':'title_abstract','exclusion_label':'Outside date range','evidence_snippet':title or abstract,'confidence':0.95,'bias':bias_info}
+                bias_info = assess_bias(record, hits)
+                return ScreeningDecision(decision=Decision.EXCLUDE, stage='title_abstract', exclusion_label=ExclusionLabel.OUTSIDE_DATE_RANGE, evidence_snippet=title or abstract, confidence=0.95, bias=bias_info)
     except Exception:
         pass
 
     # exclude reviews
-    if contains_any(text, REVIEW_KEYWORDS):
-        bias_info = assess_bias(record)
-        return {'decision':'Exclude','stage':'title_abstract','exclusion_label':'Review/survey papers','evidence_snippet':title or abstract,'confidence':0.95,'bias':bias_info}
+    if hits.has('review'):
+        bias_info = assess_bias(record, hits)
+        return ScreeningDecision(decision=Decision.EXCLUDE, stage='title_abstract', exclusion_label=ExclusionLabel.REVIEW, evidence_snippet=title or abstract, confidence=0.95, bias=bias_info)
 
     # ensure EEG focus
-    if not contains_any(text, EEG_KEYWORDS):
-        bias_info = assess_bias(record)
-        return {'decision':'Exclude','stage':'title_abstract','exclusion_label':'Not EEG-BCI focused','evidence_snippet':title or abstract,'confidence':0.9,'bias':bias_info}
+    if not hits.has('eeg'):
+        bias_info = assess_bias(record, hits)
+        return ScreeningDecision(decision=Decision.EXCLUDE, stage='title_abstract', exclusion_label=ExclusionLabel.NOT_EEG, evidence_snippet=title or abstract, confidence=0.9, bias=bias_info)
 
     # require classification-related term to focus the search
-    if not contains_any(text, CLASSIFICATION_KEYWORDS):
-        bias_info = assess_bias(record)
-        return {'decision':'Exclude','stage':'title_abstract','exclusion_label':'Not classification-focused','evidence_snippet':title or abstract,'confidence':0.85,'bias':bias_info}
+    if not hits.has('classification'):
+        bias_info = assess_bias(record, hits)
+        return ScreeningDecision(decision=Decision.EXCLUDE, stage='title_abstract', exclusion_label=ExclusionLabel.NOT_CLASSIFICATION, evidence_snippet=title or abstract, confidence=0.85, bias=bias_info)
 
     # language check: assume metadata gives language; if not, assume English
     lang = record.get('language','English')
     if lang and lang.lower() != 'english':
-        bias_info = assess_bias(record)
-        return {'decision':'Exclude','stage':'title_abstract','exclusion_label':'Non-English','evidence_snippet':'language:'+str(lang),'confidence':0.98,'bias':bias_info}
+        bias_info = assess_bias(record, hits)
+        return ScreeningDecision(decision=Decision.EXCLUDE, stage='title_abstract', exclusion_label=ExclusionLabel.NON_ENGLISH, evidence_snippet='language:'+str(lang), confidence=0.98, bias=bias_info)
 
     # Passed initial filters; include with bias assessment provided for human review
-    bias_info = assess_bias(record)
-    return {'decision':'Include','stage':'title_abstract','exclusion_label':None,'evidence_snippet':(title or abstract)[:400],'confidence':0.95,'bias':bias_info}
+    bias_info = assess_bias(record, hits)
+    return ScreeningDecision(decision=Decision.INCLUDE, stage='title_abstract', exclusion_label=None, evidence_snippet=(title or abstract)[:400], confidence=0.95, bias=bias_info)
+
+
+# keyword categories the batch screener evaluates, in the scalar screener's order
+BATCH_CATEGORIES = ['review', 'eeg', 'classification'] + ['bias:' + name for name in FLAG_NAMES]
+# decision frame columns, in the order screening_decisions rebuilds the decisions
+DECISION_COLUMNS = ['decision', 'stage', 'exclusion_label', 'evidence_snippet', 'confidence', 'bias_score'] + list(FLAG_NAMES.values())
+# bias_score for every combination of the four flags (cv, external, small, overfit as bits 3..0)
+_BIAS_TABLE = np.array([a['bias_score'] for a in BIAS_ASSESSMENTS])
+
+# regex classes whose meaning differs between Python (Unicode) and RE2 (ASCII)
+_UNICODE_CLASSES = re.compile(r'\\[bBdDwWsS]')
+# the only non-ASCII characters whose str.lower() contains ASCII: U+0130, U+212A
+_LOWERS_TO_ASCII = '[\u0130\u212a]'
+
+
+def _date_bounds(cfg):
+    try:
+        return int(cfg['search']['date_from'][:4]), int(cfg['search']['date_to'][:4])
+    except Exception:
+        return None
+
+
+def _year(year):
+    # int(str(year)[:4]) as in title_abstract_screen; None when unset or unparseable
+    try:
+        return int(str(year)[:4]) if year else None
+    except Exception:
+        return None
+
+
+def _non_english(lang):
+    try:
+        return bool(lang) and lang.lower() != 'english'
+    except Exception:
+        return False
+
+
+def _per_value(values, fn):
+    # apply fn once per distinct value (years and languages repeat a lot)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return np.asarray([fn(v) for v in uniques], dtype=object)[codes]
+
+
+def _keyword_flags(text):
+    """{category: bool array} for the combined title/abstract strings.
+
+    Categories are matched with Arrow's vectorized regex kernels (RE2) on
+    ASCII-lowercased text. That agrees with the scalar KeywordMatcher except
+    for regex classes such as \\b and \\d, which RE2 treats as ASCII-only,
+    and for the two characters Python lowercases to ASCII letters; those
+    rows and categories are re-checked with the KeywordMatcher.
+    """
+    matcher = get_matcher()
+    arr = pa.array(text, type=pa.large_string())
+    lower = pc.ascii_lower(arr)
+    flags = {c: pc.match_substring_regex(lower, matcher.pattern(c)).to_numpy(zero_copy_only=False)
+             for c in BATCH_CATEGORIES}
+    non_ascii = ~pc.string_is_ascii(arr).to_numpy(zero_copy_only=False)
+    if not non_ascii.any():
+        return flags
+    full = pc.match_substring_regex(arr, _LOWERS_TO_ASCII).to_numpy(zero_copy_only=False)
+    sensitive = [c for c in BATCH_CATEGORIES if _UNICODE_CLASSES.search(matcher.pattern(c))]
+    for i in np.flatnonzero(non_ascii):
+        hits = matcher.scan(text[i])
+        for c in (BATCH_CATEGORIES if full[i] else sensitive):
+            flags[c][i] = hits.has(c)
+    return flags
+
+
+def _column(frame, name, default=None):
+    if name in frame:
+        return frame[name].to_numpy(dtype=object)
+    return np.full(len(frame), default, dtype=object)
+
+
+def _screen_frame(frame, cfg):
+    n = len(frame)
+    title = np.array([t if isinstance(t, str) else '' for t in _column(frame, 'title', '')], dtype=object)
+    abstract = np.array([a if isinstance(a, str) else '' for a in _column(frame, 'abstract', '')], dtype=object)
+    text = title + ' ' + abstract
+    flags = _keyword_flags(text)
+
+    bounds = _date_bounds(cfg)
+    if bounds is None:
+        outside = np.zeros(n, dtype=bool)
+    else:
+        years = _per_value(_column(frame, 'year'), _year)
+        known = pd.notna(years)
+        outside = np.zeros(n, dtype=bool)
+        y = years[known].astype(np.int64)
+        outside[known] = (y < bounds[0]) | (y > bounds[1])
+    lang = _column(frame, 'language', 'English')
+    non_english = _per_value(lang, _non_english).astype(bool)
+
+    # the scalar screener's checks, first match wins
+    conditions = [outside, flags['review'], ~flags['eeg'], ~flags['classification'], non_english]
+    labels = [ExclusionLabel.OUTSIDE_DATE_RANGE, ExclusionLabel.REVIEW, ExclusionLabel.NOT_EEG,
+              ExclusionLabel.NOT_CLASSIFICATION, ExclusionLabel.NON_ENGLISH]
+    confidences = [0.95, 0.95, 0.9, 0.85, 0.98]
+    reason = np.select(conditions, range(len(conditions)), default=len(conditions))
+
+    evidence = np.where(title != '', title, abstract)
+    include = reason == len(conditions)
+    evidence[include] = [e[:400] for e in evidence[include]]
+    lang_rows = np.flatnonzero(reason == 4)
+    evidence[lang_rows] = ['language:' + str(v) for v in lang[lang_rows]]
+
+    bias_flags = [flags['bias:' + name] for name in FLAG_NAMES]
+    bias_index = (bias_flags[0].astype(int) << 3) | (bias_flags[1] << 2) | (bias_flags[2] << 1) | bias_flags[3]
+    out = pd.DataFrame({
+        'decision': pd.Series(np.where(include, Decision.INCLUDE, Decision.EXCLUDE), index=frame.index, dtype=object),
+        'stage': 'title_abstract',
+        'exclusion_label': pd.Series(np.array(labels + [None], dtype=object)[reason], index=frame.index, dtype=object),
+        'evidence_snippet': evidence,
+        'confidence': np.array(confidences + [0.95])[reason],
+        'bias_score': _BIAS_TABLE[bias_index],
+    }, index=frame.index)
+    for flag, values in zip(FLAG_NAMES.values(), bias_flags):
+        out[flag] = values
+    return out
+
+
+def title_abstract_screen_batch(records, cfg, workers=None):
+    """Vectorized title_abstract_screen over a DataFrame (or list of dicts).
+
+    Returns a frame aligned with `records` holding DECISION_COLUMNS; use
+    `screening_decisions` for the per-record decisions title_abstract_screen returns.
+    Batches larger than screening.chunk_size are split across
+    screening.workers processes.
+    """
+    frame = records
+    if not isinstance(frame, pd.DataFrame):
+        frame = pd.DataFrame({
+            'title': [r.get('title') for r in records],
+            'abstract': [r.get('abstract') for r in records],
+            'year': [r.get('year') for r in records],
+            'language': [r.get('language', 'English') for r in records],
+        })
+    scfg = cfg.get('screening', {})
+    workers = workers or scfg.get('workers', 1)
+    chunk_size = scfg.get('chunk_size', 250000)
+    if workers <= 1 or len(frame) <= chunk_size:
+        return _screen_frame(frame, cfg)
+    chunks = [frame.iloc[i:i + chunk_size] for i in range(0, len(frame), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return pd.concat(pool.map(_screen_frame, chunks, repeat(cfg)))
+
+
+def screening_decisions(decisions):
+    """The decision frame as `ScreeningDecision`s (as title_abstract_screen returns them), in row order."""
+    cols = [decisions[c].tolist() for c in ('decision', 'exclusion_label', 'evidence_snippet', 'confidence')]
+    masks = np.zeros(len(decisions), dtype=np.int64)
+    for flag in FLAG_NAMES.values():
+        masks = masks << 1 | decisions[flag].to_numpy(dtype=bool)
+    return [
+        ScreeningDecision(decision=Decision(d), stage='title_abstract', exclusion_label=lab and ExclusionLabel(lab),
+                          evidence_snippet=ev, confidence=conf, bias=BIAS_ASSESSMENTS[mask])
+        for d, lab, ev, conf, mask in zip(*cols, masks.tolist())
+    ]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Check the pipeline's import-time budget.
+
+    python scripts/check_startup.py [--repeats 5] [--scale 1.0]
+
+Each entry point below is imported in a fresh interpreter `--repeats`
+times and its best import time compared with its budget (milliseconds,
+multiplied by `--scale` for slower machines). `run_pipeline` itself must
+also not pull in any of the heavy dependencies, which only the stages
+import. Prints one line per check and exits non-zero if any fails, so it
+can run in CI or ahead of the cron jobs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, modules imported, budget in ms); a subcommand's entry also imports run_pipeline
+BUDGETS = [
+    ('run_pipeline', [], 75),
+    ('harvest', ['connectors.harvest', 'utils.dedupe'], 300),
+    ('dedupe', ['utils.dedupe', 'utils.dedupe_index'], 200),
+    ('screen', ['screeners.title_abstract_screener'], 600),
+    ('fetch', ['connectors.fulltext_connector', 'screeners.full_text_screener', 'screeners.prioritizer'], 300),
+    ('export', ['exporters.csv_exporter', 'exporters.bibtex_exporter', 'exporters.parquet_exporter',
+                'utils.search_index'], 300),
+]
+HEAVY = ['pandas', 'pyarrow', 'numpy', 'fitz', 'pymupdf', 'bs4', 'lxml', 'bibtexparser', 'rapidfuzz', 'requests',
+         'dotenv']
+
+CHILD = '''
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({'ms': elapsed * 1000, 'heavy': sorted(m for m in %r if m in sys.modules)}))
+''' % (HEAVY,)
+
+
+def measure(modules, repeats):
+    """Best import time (ms) of `modules` in fresh interpreters, and the heavy modules they loaded."""
+    best = None
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', CHILD, 'run_pipeline', *modules], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        if best is None or result['ms'] < best['ms']:
+            best = result
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget by this factor')
+    args = parser.parse_args(argv)
+    failed = 0
+    for name, modules, budget in BUDGETS:
+        result = measure(modules, args.repeats)
+        limit = budget * args.scale
+        ok = result['ms'] <= limit
+        line = f'{name:<14} {result["ms"]:7.1f} ms  (budget {limit:.0f} ms)'
+        if name == 'run_pipeline' and result['heavy']:
+            ok = False
+            line += f'  imports {", ".join(result["heavy"])}'
+        print(f'{"ok  " if ok else "FAIL"} {line}')
+        failed += not ok
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
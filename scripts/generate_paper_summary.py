@@ -1,22 +1,78 @@
 #!/usr/bin/env python3
+import argparse
 import csv
+import json
+import sys
 from pathlib import Path
 
-input_csv = Path('artifacts/records_deduped.csv')
-output_csv = Path('paper-summary/49-papers-complete-table.csv')
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from connectors.fulltext_connector import pdf_path  # noqa: E402
+from utils.extraction import extract_many  # noqa: E402
+from utils.search_index import index_from_config  # noqa: E402
 
 fieldnames = [
     'Paper_ID','Ref_ID','Authors','Title','Year','Venue','BCI_Task','Architecture',
     'Dataset','Subjects','Trials','Accuracy','F1_Score','Kappa','Code_Available',
     'GitHub_URL','GPU_Type','Training_Time','Reproducibility_Score','DOI','Notes'
 ]
+# table column -> utils.extraction field
+EXTRACTED = {'Architecture': 'architecture', 'Dataset': 'dataset', 'Subjects': 'subjects', 'Accuracy': 'accuracy',
+             'F1_Score': 'f1', 'Kappa': 'kappa'}
+
+
+def read_rows(path):
+    """Export rows as dicts of strings ('' for missing), from CSV or Parquet."""
+    if path.suffix in ('.parquet', '.pq'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches():
+            for row in batch.to_pylist():
+                yield {k: '' if v is None else str(v) for k, v in row.items()}
+        return
+    with path.open('r', encoding='utf-8') as inf:
+        # read using csv with liberal quoting
+        yield from csv.DictReader(inf)
+
+
+def document(row, texts, pdf_dir):
+    """The text to extract from: the search index's copy if it holds the full text, else the stored PDF."""
+    ref = row.get('canonical_id', '')
+    title, abstract = row.get('title', '') or '', row.get('abstract', '') or ''
+    text = texts.get(ref)
+    # the index stores title, abstract and any extracted full text, newline-separated
+    if text and len(text) > len(title) + len(abstract) + 2:
+        return text
+    pdf = Path(pdf_path({'id': ref}, pdf_dir))
+    if pdf.exists():
+        return pdf
+    return text or f'{title}\n{abstract}'
+
 
-rows_out = []
-with input_csv.open('r', encoding='utf-8') as inf:
-    # read using csv with liberal quoting
-    reader = csv.DictReader(inf)
+def read_existing(path):
+    """{Ref_ID: row} of a previously written table, so values filled in by hand are kept."""
+    if not path.exists():
+        return {}
+    with path.open('r', encoding='utf-8') as inf:
+        return {r.get('Ref_ID', ''): r for r in csv.DictReader(inf)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the paper summary table from the pipeline export')
+    parser.add_argument('--input', default='artifacts/records_deduped.csv', help='records CSV or Parquet export')
+    parser.add_argument('--output', default='paper-summary/49-papers-complete-table.csv')
+    parser.add_argument('--config', default='config.yaml', help='for search_index.dir and fulltext.dir')
+    parser.add_argument('--workers', type=int, default=None, help='extraction processes (default: one per CPU)')
+    parser.add_argument('--evidence', help='write the evidence (offsets and matched text) of each extracted value as JSON lines')
+    parser.add_argument('--overwrite', action='store_true', help='replace values already filled in in the output table')
+    args = parser.parse_args(argv)
+    input_path = Path(args.input)
+    output_csv = Path(args.output)
+
+    rows_out = []
+    sources = []
     pid = 1
-    for row in reader:
+    for row in read_rows(input_path):
         ta = row.get('stage_title_abstract_decision','').strip()
         ft = row.get('stage_full_text_decision','').strip()
         # select records that passed title/abstract screening
@@ -58,14 +114,44 @@ with input_csv.open('r', encoding='utf-8') as inf:
                 'DOI': doi,
                 'Notes': notes,
             })
+            sources.append(row)
             pid += 1
 
-# write output
-output_csv.parent.mkdir(parents=True, exist_ok=True)
-with output_csv.open('w', encoding='utf-8', newline='') as outf:
-    writer = csv.DictWriter(outf, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL)
-    writer.writeheader()
-    for r in rows_out:
-        writer.writerow(r)
+    # fill the methods and results columns from the full texts
+    with open(args.config, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    index_dir = Path(cfg.get('search_index', {}).get('dir', 'artifacts/search_index'))
+    texts = {}
+    if (index_dir / 'index.sqlite').exists():
+        with index_from_config(cfg) as index:
+            texts = index.texts(r.get('canonical_id', '') for r in sources)
+    pdf_dir = cfg.get('fulltext', {}).get('dir', '.cache/fulltext')
+    extractions = extract_many([document(r, texts, pdf_dir) for r in sources], workers=args.workers)
+    existing = {} if args.overwrite else read_existing(output_csv)
+    filled = 0
+    for out, extraction in zip(rows_out, extractions):
+        kept = existing.get(out['Ref_ID'], {})
+        for column, field in EXTRACTED.items():
+            out[column] = kept.get(column) or extraction.values[field]
+        filled += any(extraction.values.values())
+    if args.evidence:
+        Path(args.evidence).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.evidence, 'w', encoding='utf-8') as ef:
+            for out, extraction in zip(rows_out, extractions):
+                evidence = {column: dict(zip(('start', 'end', 'text'), extraction.evidence[field]))
+                            for column, field in EXTRACTED.items() if field in extraction.evidence}
+                ef.write(json.dumps({'Ref_ID': out['Ref_ID'], 'evidence': evidence}, ensure_ascii=False) + '\n')
+
+    # write output
+    output_csv.parent.mkdir(parents=True, exist_ok=True)
+    with output_csv.open('w', encoding='utf-8', newline='') as outf:
+        writer = csv.DictWriter(outf, fieldnames=fieldnames, quoting=csv.QUOTE_MINIMAL)
+        writer.writeheader()
+        for r in rows_out:
+            writer.writerow(r)
+
+    print(f'Wrote {len(rows_out)} candidate rows to {output_csv} ({filled} with extracted values)')
+
 
-print(f'Wrote {len(rows_out)} candidate rows to {output_csv}')
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,2 @@
 """Utilities package"""
-__all__ = ['dedupe', 'pdf_extract', 'text_utils', 'logger']
+__all__ = ['dedupe', 'pdf_extract', 'text_utils', 'logger', 'http', 'cache', 'ratelimit', 'keywords', 'checkpoint', 'dedupe_index', 'records', 'metrics', 'minhash', 'search_index', 'extraction', 'env']
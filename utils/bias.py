@@ -7,7 +7,8 @@ These are heuristic and intended to surface records for manual review, not
 to automatically exclude high-quality studies.
 """
 from typing import Dict
-import re
+from utils.keywords import get_matcher
+from utils.records import BiasAssessment
 
 
 BIAS_INDICATORS = {
@@ -17,29 +18,37 @@ BIAS_INDICATORS = {
     'overfit_warnings': [r'overfit', r'over-?fitting', r'data leakage', r'leakage']
 }
 
+# BIAS_INDICATORS key -> flag reported by assess_bias
+FLAG_NAMES = {
+    'cv_mentions': 'cv_reported',
+    'external_test': 'external_test_reported',
+    'small_sample': 'small_sample_mentioned',
+    'overfit_warnings': 'overfit_terms_found',
+}
+
 
-def assess_bias(record: Dict) -> Dict:
-    """Return a small dict with bias score (0-1) and flags.
+def assess_bias(record: Dict, hits=None) -> BiasAssessment:
+    """Return a small mapping with bias score (0-1) and flags.
 
     The function inspects title and abstract (and year if present) and
-    returns a bias summary for human review.
+    returns a bias summary for human review. `hits` is an optional
+    `utils.keywords.Hits` scan of the same title/abstract text, so a
+    screener that already scanned it does not scan it again. The result is
+    one of the shared, read-only `BIAS_ASSESSMENTS`.
     """
-    text = ' '.join([str(record.get('title') or ''), str(record.get('abstract') or '')]).lower()
-    flags = {}
-    score = 0.0
+    if hits is None:
+        hits = get_matcher().scan(' '.join([str(record.get('title') or ''), str(record.get('abstract') or '')]))
 
-    # check for cross-validation / good practices
-    cv_found = any(re.search(p, text) for p in BIAS_INDICATORS['cv_mentions'])
-    external_found = any(re.search(p, text) for p in BIAS_INDICATORS['external_test'])
-    small_sample = any(re.search(p, text) for p in BIAS_INDICATORS['small_sample'])
-    overfit = any(re.search(p, text) for p in BIAS_INDICATORS['overfit_warnings'])
+    # check for cross-validation / good practices, small samples and leakage
+    mask = 0
+    for name in FLAG_NAMES:
+        mask = mask << 1 | hits.has('bias:' + name)
+    return BIAS_ASSESSMENTS[mask]
 
-    flags['cv_reported'] = bool(cv_found)
-    flags['external_test_reported'] = bool(external_found)
-    flags['small_sample_mentioned'] = bool(small_sample)
-    flags['overfit_terms_found'] = bool(overfit)
 
-    # crude scoring: fewer good-practice mentions -> higher caution score
+def bias_score(cv_found, external_found, small_sample, overfit):
+    """Crude caution score: fewer good-practice mentions -> higher score."""
+    score = 0.0
     # baseline 0 (low concern). Add weight for missing CV/external test, small sample warnings add to concern.
     if not cv_found:
         score += 0.35
@@ -52,4 +61,14 @@ def assess_bias(record: Dict) -> Dict:
 
     # clamp to [0,1]
     score = min(1.0, score)
-    return {'bias_score': round(score, 2), 'flags': flags}
+    return round(score, 2)
+
+
+def _assessment(mask):
+    # flags in FLAG_NAMES order, the first flag as the highest bit
+    flags = {flag: bool(mask >> (len(FLAG_NAMES) - 1 - k) & 1) for k, flag in enumerate(FLAG_NAMES.values())}
+    return BiasAssessment(bias_score(*flags.values()), flags)
+
+
+# every possible assessment, indexed by the flag bitmask
+BIAS_ASSESSMENTS = tuple(_assessment(mask) for mask in range(1 << len(FLAG_NAMES)))
@@ -0,0 +1,135 @@
+# utils/cache.py
+"""Content-addressed on-disk cache with TTLs and size-bounded LRU eviction.
+
+Values are stored as blobs named by the sha256 of their content (identical
+bodies are stored once) and indexed in a small SQLite table keyed by the
+caller's cache key. Used by `utils.http` for API responses.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    blob TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    meta TEXT,
+    created REAL NOT NULL,
+    expires REAL,
+    last_access REAL NOT NULL
+)
+'''
+
+
+def make_key(*parts):
+    """Stable sha256 key over JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, directory, max_bytes=1 << 30, default_ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        os.makedirs(os.path.join(directory, 'blobs'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False, timeout=30)
+        self._db.execute(SCHEMA)
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)')
+        self._db.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.directory, 'blobs', digest[:2], digest)
+
+    def get(self, key, allow_stale=False):
+        """Return (value bytes, meta dict) or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT blob, meta, expires FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            digest, meta, expires = row
+            if expires is not None and expires < now and not allow_stale:
+                return None
+            try:
+                with open(self._blob_path(digest), 'rb') as f:
+                    value = f.read()
+            except FileNotFoundError:
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._db.commit()
+                return None
+            self._db.execute('UPDATE entries SET last_access = ? WHERE key = ?', (now, key))
+            self._db.commit()
+        return value, json.loads(meta) if meta else {}
+
+    def set(self, key, value, meta=None, ttl=None):
+        """Store `value` (bytes); ttl None uses the default, 0 never expires."""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        digest = hashlib.sha256(value).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(value)
+                os.replace(tmp, path)
+            old = self._db.execute('SELECT blob FROM entries WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, blob, size, meta, created, expires, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, digest, len(value), json.dumps(meta or {}), now, now + ttl if ttl else None, now))
+            if old and old[0] != digest:
+                self._drop_blob(old[0])
+            self._evict()
+            self._db.commit()
+
+    def touch(self, key, ttl=None):
+        """Extend the expiry of an existing entry (e.g. after revalidation)."""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            self._db.execute('UPDATE entries SET expires = ?, last_access = ? WHERE key = ?',
+                             (now + ttl if ttl else None, now, key))
+            self._db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT blob FROM entries WHERE key = ?', (key,)).fetchone()
+            if row:
+                self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._drop_blob(row[0])
+                self._db.commit()
+
+    def _drop_blob(self, digest):
+        if self._db.execute('SELECT 1 FROM entries WHERE blob = ? LIMIT 1', (digest,)).fetchone():
+            return
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, digest, size in self._db.execute('SELECT key, blob, size FROM entries ORDER BY last_access').fetchall():
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._drop_blob(digest)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,76 @@
+# utils/checkpoint.py
+"""Content-hashed stage checkpoints for run_pipeline.
+
+A stage's checkpoint key hashes its name, version, the config it depends
+on and the content digests of its input stages. Its output is pickled
+under that key, and the sha256 of the pickle is its content digest. A
+config change therefore reruns that stage and, only if its output
+actually changed, the stages downstream of it. The version is bumped
+when a stage's code changes its output; a stage whose output also
+depends on the outside world (the harvest) can be given a max age.
+"""
+import hashlib
+import os
+import pickle
+import time
+from collections import namedtuple
+
+from utils.cache import make_key
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+
+logger = get_logger('checkpoint')
+
+StageResult = namedtuple('StageResult', 'name value digest')
+
+
+class Checkpoints:
+    def __init__(self, directory, enabled=True, refresh=()):
+        self.directory = directory
+        self.enabled = enabled
+        self.refresh = set(refresh)
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, name, key):
+        return os.path.join(self.directory, f'{name}-{key[:20]}.pkl')
+
+    def load(self, name, *inputs, config=None, version=1, max_age=None):
+        """Return the StageResult checkpointed for these inputs and config, or None.
+
+        With `max_age` (seconds), a checkpoint written longer ago is ignored.
+        """
+        path = self.path(name, make_key(name, version, config, [i.digest for i in inputs]))
+        if not self.enabled or not os.path.exists(path):
+            return None
+        if max_age and time.time() - os.path.getmtime(path) > max_age:
+            logger.info(f'{name}: checkpoint {os.path.basename(path)} is older than {max_age}s; rerunning')
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        logger.info(f'{name}: reusing checkpoint {os.path.basename(path)}')
+        get_metrics().count('checkpoints_reused', stage=name)
+        return StageResult(name, pickle.loads(data), hashlib.sha256(data).hexdigest())
+
+    def run(self, name, fn, *inputs, config=None, version=1, max_age=None):
+        """Return the StageResult of `fn(*input values)`, reusing a checkpoint when one matches."""
+        if name not in self.refresh:
+            result = self.load(name, *inputs, config=config, version=version, max_age=max_age)
+            if result is not None:
+                return result
+        start = time.time()
+        value = fn(*[i.value for i in inputs])
+        result = self.save(name, value, *inputs, config=config, version=version)
+        logger.info(f'{name}: done in {time.time() - start:.1f}s')
+        return result
+
+    def save(self, name, value, *inputs, config=None, version=1):
+        """Checkpoint `value` as the output of stage `name` for these inputs and config."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.enabled:
+            path = self.path(name, make_key(name, version, config, [i.digest for i in inputs]))
+            tmp = path + '.part'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return StageResult(name, value, hashlib.sha256(data).hexdigest())
@@ -1,8 +1,9 @@
 # utils/dedupe.py
 import re
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
 from unidecode import unidecode
-from collections import defaultdict
+from collections import Counter, defaultdict
 import logging
 
 logger = logging.getLogger('dedupe')
@@ -27,21 +28,33 @@ def extract_doi(text: str):
     return m.group(0) if m else None
 
 
+def prepare_record(r):
+    """Normalize the title and DOI of one record ahead of dedupe_records.
+
+    The harvest stage calls this as batches arrive; dedupe_records only
+    prepares records that were not seen here.
+    """
+    doi = r.get('doi') or extract_doi(r.get('url', '') or r.get('abstract', '') or '')
+    r['_norm_title'] = normalize_title(r.get('title', ''))
+    if doi:
+        r['doi'] = doi.lower()
+    return r
+
+
 def dedupe_records(records, cfg):
     # records: list of dicts with keys including: id,title,authors,year,doi,source
-    doi_map = {}
-    canonical = []
+    if cfg.get('fuzzy_strategy') == 'minhash':
+        from utils.minhash import minhash_dedupe
+        return minhash_dedupe(records, cfg)
     doi_groups = defaultdict(list)
     no_doi = []
 
     # 1. DOI exact grouping
     for r in records:
-        doi = r.get('doi') or extract_doi(r.get('url', '') or r.get('abstract', '') or '')
-        r['_norm_title'] = normalize_title(r.get('title', ''))
-        if doi:
-            doi = doi.lower()
-            r['doi'] = doi
-            doi_groups[doi].append(r)
+        if '_norm_title' not in r:
+            prepare_record(r)
+        if r.get('doi'):
+            doi_groups[r['doi']].append(r)
         else:
             no_doi.append(r)
 
@@ -57,37 +70,201 @@ def dedupe_records(records, cfg):
         duplicate_report['same_doi'].append({'canonical': canon['id'], 'members': canon['member_ids']})
 
     # 2. fuzzy match on no_doi
+    strategy = cfg.get('fuzzy_strategy', 'blocked')
+    if strategy == 'exhaustive':
+        scores = exhaustive_pair_scores(no_doi, cfg)
+    else:
+        scores = blocked_pair_scores(no_doi, cfg)
+        if strategy == 'compare':
+            # report blocking recall but keep the exhaustive result
+            reference = exhaustive_pair_scores(no_doi, cfg)
+            duplicate_report['blocking_recall'] = blocking_recall(scores, reference)
+            logger.info('Blocking recall: %s', duplicate_report['blocking_recall'])
+            scores = reference
+    _group_fuzzy(no_doi, scores, cfg, canonical_records, duplicate_report)
+    return canonical_records, duplicate_report
+
+
+def _score_cutoff(cfg):
+    # pairs scoring below both thresholds never reach the report
+    return min(cfg.get('fuzzy_threshold_exact', 0.92), cfg.get('fuzzy_threshold_candidate', 0.85))
+
+
+def exhaustive_pair_scores(no_doi, cfg):
+    """Score every pair (i < j) of DOI-less records; returns {(i, j): score}."""
+    cutoff = _score_cutoff(cfg)
+    scores = {}
+    for i, r in enumerate(no_doi):
+        for j in range(i + 1, len(no_doi)):
+            score = fuzz.token_set_ratio(r['_norm_title'], no_doi[j]['_norm_title']) / 100.0
+            if score >= cutoff:
+                scores[(i, j)] = score
+    return scores
+
+
+def _first_author_surname(r):
+    authors = r.get('authors')
+    if not authors or not authors[0]:
+        return None
+    return authors[0].split()[-1].lower()
+
+
+def _year(r):
+    try:
+        return int(str(r.get('year'))[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def _edge_grams(tok):
+    if len(tok) < 4:
+        return ()
+    return ('q:' + tok[:4], 'q:' + tok[-4:])
+
+
+def blocking_keys(r, doc_freq, cfg):
+    """Return (probe_keys, index_keys) for one record.
+
+    token_set_ratio scores a pair highly when most of one title is shared
+    with the other, so a record probes with its rarest title tokens (prefix
+    filtering on document frequency) and is indexed under all of them. The
+    leading and trailing 4-grams of the probe tokens let a typo in a rare
+    token still collide, and first-author surname plus year (and the next year) pairs records at
+    most one year apart.
+    """
+    tokens = sorted(set(r['_norm_title'].split()), key=lambda t: (doc_freq[t], t))
+    probes, index = set(), set()
+    # ratio(shared, shared + rest) >= t needs the shared tokens to hold at
+    # least t / (2 - t) of the title's characters, so probe with rare tokens
+    # until the unprobed remainder is lighter than that
+    low = cfg.get('human_review_threshold_low', 0.80)
+    remaining = sum(len(tok) for tok in tokens)
+    required = remaining * low / (2 - low)
+    for tok in tokens:
+        probes.add('t:' + tok)
+        probes.update(_edge_grams(tok))
+        remaining -= len(tok)
+        if remaining < required:
+            break
+    index.update(probes)
+    index.update('t:' + tok for tok in tokens)
+    surname = _first_author_surname(r)
+    year = _year(r)
+    if surname and year is not None:
+        author_keys = {f'a:{surname}:{year}', f'a:{surname}:{year + 1}'}
+        probes |= author_keys
+        index |= author_keys
+    return probes, index
+
+
+def build_blocks(no_doi, cfg):
+    """Return {key: (probe positions, indexed positions)} for the blocking index."""
+    doc_freq = Counter()
+    for r in no_doi:
+        doc_freq.update(set(r['_norm_title'].split()))
+    probes, index = defaultdict(list), defaultdict(list)
+    for i, r in enumerate(no_doi):
+        probe_keys, index_keys = blocking_keys(r, doc_freq, cfg)
+        for key in probe_keys:
+            probes[key].append(i)
+        for key in index_keys:
+            index[key].append(i)
+    return {key: (members, index[key]) for key, members in probes.items()}
+
+
+def blocked_pair_scores(no_doi, cfg):
+    """Score only pairs that share a blocking key; returns {(i, j): score}.
+
+    Each block is scored with one ``process.cdist`` call (probes x indexed
+    records). Blocks with more than ``block_max_pairs`` cells are skipped;
+    use ``fuzzy_strategy: compare`` to see what that costs in recall.
+    """
+    cutoff = _score_cutoff(cfg)
+    max_pairs = cfg.get('block_max_pairs', 5_000_000)
+    workers = cfg.get('fuzzy_workers', 1)
+    titles = [r['_norm_title'] for r in no_doi]
+    scores = {}
+    skipped = 0
+    for key, (probes, index) in build_blocks(no_doi, cfg).items():
+        if len(index) < 2:
+            continue
+        if len(probes) * len(index) > max_pairs:
+            skipped += 1
+            logger.warning('Skipping oversized dedupe block %s (%d x %d records)', key, len(probes), len(index))
+            continue
+        # cdist zeroes scores under the cutoff; the exact comparison is redone below
+        matrix = process.cdist([titles[i] for i in probes], [titles[j] for j in index],
+                               scorer=fuzz.token_set_ratio, processor=None,
+                               score_cutoff=cutoff * 100 - 1e-6, dtype=np.float64, workers=workers)
+        rows, cols = np.nonzero(matrix)
+        for a, b in zip(rows.tolist(), cols.tolist()):
+            i, j = probes[a], index[b]
+            if i == j:
+                continue
+            pair = (i, j) if i < j else (j, i)
+            if pair in scores:
+                continue
+            score = float(matrix[a, b]) / 100.0
+            if score >= cutoff:
+                scores[pair] = score
+    if skipped:
+        logger.warning('Skipped %d oversized dedupe blocks', skipped)
+    return scores
+
+
+def blocking_recall(blocked, exhaustive):
+    """Compare blocked candidate scores against the exhaustive reference."""
+    found = sum(1 for pair in exhaustive if pair in blocked)
+    return {
+        'reference_pairs': len(exhaustive),
+        'blocked_pairs': len(blocked),
+        'found_pairs': found,
+        'recall': round(found / len(exhaustive), 4) if exhaustive else 1.0,
+    }
+
+
+def pair_decision(r, s, score, cfg):
+    """'merge', 'review' (human review band) or None for a scored pair of records."""
+    if score >= cfg.get('fuzzy_threshold_exact', 0.92):
+        return 'merge'
+    if score >= cfg.get('fuzzy_threshold_candidate', 0.85):
+        fa_r = r.get('authors', [None])[0] if r.get('authors') else None
+        fa_s = s.get('authors', [None])[0] if s.get('authors') else None
+        yr_r = r.get('year')
+        yr_s = s.get('year')
+        same_author = False
+        if fa_r and fa_s:
+            same_author = fa_r.split()[-1].lower() == fa_s.split()[-1].lower()
+        year_close = False
+        try:
+            if yr_r and yr_s and abs(int(yr_r) - int(yr_s)) <= 1:
+                year_close = True
+        except Exception:
+            pass
+        if same_author and year_close:
+            return 'merge'
+        if score >= cfg.get('human_review_threshold_low', 0.80):
+            return 'review'
+    return None
+
+
+def _group_fuzzy(no_doi, scores, cfg, canonical_records, duplicate_report):
+    candidates = defaultdict(list)
+    for i, j in scores:
+        candidates[i].append(j)
     used = set([r['id'] for r in canonical_records])
     for i, r in enumerate(no_doi):
         if r['id'] in used:
             continue
         group = [r]
-        for j in range(i + 1, len(no_doi)):
+        for j in sorted(candidates.get(i, ())):
             s = no_doi[j]
-            score = fuzz.token_set_ratio(r['_norm_title'], s['_norm_title']) / 100.0
-            if score >= cfg.get('fuzzy_threshold_exact', 0.92):
+            score = scores[(i, j)]
+            decision = pair_decision(r, s, score, cfg)
+            if decision == 'merge':
                 group.append(s)
-            elif score >= cfg.get('fuzzy_threshold_candidate', 0.85):
-                fa_r = r.get('authors', [None])[0] if r.get('authors') else None
-                fa_s = s.get('authors', [None])[0] if s.get('authors') else None
-                yr_r = r.get('year')
-                yr_s = s.get('year')
-                same_author = False
-                if fa_r and fa_s:
-                    same_author = fa_r.split()[-1].lower() == fa_s.split()[-1].lower()
-                year_close = False
-                try:
-                    if yr_r and yr_s and abs(int(yr_r) - int(yr_s)) <= 1:
-                        year_close = True
-                except Exception:
-                    pass
-                if same_author and year_close:
-                    group.append(s)
-                else:
-                    if score >= cfg.get('human_review_threshold_low', 0.80):
-                        duplicate_report['human_review'].append({'pair': (r['id'], s['id']), 'score': score, 'titles': (r.get('title'), s.get('title'))})
-            else:
-                continue
+            elif decision == 'review':
+                duplicate_report['human_review'].append({'pair': (r['id'], s['id']), 'score': score, 'titles': (r.get('title'), s.get('title'))})
         if len(group) > 1:
             canon = group[0]
             canon['member_ids'] = [m['id'] for m in group]
@@ -95,4 +272,3 @@ def dedupe_records(records, cfg):
             duplicate_report['fuzzy_groups'].append({'canonical': canon['id'], 'members': canon['member_ids']})
         else:
             canonical_records.append(r)
-    return canonical_records, duplicate_report
@@ -0,0 +1,214 @@
+# utils/dedupe_index.py
+"""Persistent canonical index for incremental (living review) dedupe.
+
+The index is a SQLite file holding every canonical record with its
+`member_ids`, a DOI map, a member -> canonical map and the title blocking
+keys of `utils.dedupe.blocking_keys` with their token frequencies. `merge`
+only processes records it has not seen: a record joins the canonical of
+its DOI, or the best fuzzy match among the canonicals that share a
+blocking key with it (using the same thresholds and author/year rule as
+`dedupe_records`), or becomes a new canonical. Canonical IDs never change
+once assigned, and every record belongs to exactly one canonical.
+"""
+import json
+import os
+import sqlite3
+from collections import Counter, defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from utils.dedupe import _score_cutoff, blocked_pair_scores, blocking_keys, pair_decision, prepare_record
+from utils.logger import get_logger
+from utils.records import Record
+
+logger = get_logger('dedupe_index')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS canonical (
+    id TEXT PRIMARY KEY,
+    doi TEXT,
+    norm_title TEXT NOT NULL,
+    record TEXT NOT NULL,
+    member_ids TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (member_id TEXT PRIMARY KEY, canonical_id TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS dois (doi TEXT PRIMARY KEY, canonical_id TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS block_keys (key TEXT NOT NULL, canonical_id TEXT NOT NULL, probe INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS block_keys_key ON block_keys (key);
+CREATE TABLE IF NOT EXISTS token_freq (token TEXT PRIMARY KEY, df INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+'''
+# settings that decide groupings; existing groupings keep the settings they were made with
+DECISION_KEYS = ('fuzzy_threshold_exact', 'fuzzy_threshold_candidate', 'human_review_threshold_low')
+# SQLite's default limit on host parameters per statement
+_CHUNK = 900
+
+
+def _chunks(items):
+    items = list(items)
+    for i in range(0, len(items), _CHUNK):
+        yield items[i:i + _CHUNK]
+
+
+class DedupeIndex:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM canonical').fetchone()[0]
+
+    def _lookup(self, table, column, values):
+        found = {}
+        for chunk in _chunks(values):
+            marks = ','.join('?' * len(chunk))
+            found.update(self._db.execute(f'SELECT {column}, canonical_id FROM {table} WHERE {column} IN ({marks})', chunk))
+        return found
+
+    def _canonicals(self, ids):
+        found = {}
+        for chunk in _chunks(ids):
+            marks = ','.join('?' * len(chunk))
+            for cid, doi, norm_title, record, member_ids in self._db.execute(
+                    f'SELECT id, doi, norm_title, record, member_ids FROM canonical WHERE id IN ({marks})', chunk):
+                found[cid] = {'doi': doi, 'norm_title': norm_title, 'record': json.loads(record),
+                              'member_ids': json.loads(member_ids)}
+        return found
+
+    def _check_settings(self, cfg):
+        settings = json.dumps({k: cfg.get(k) for k in DECISION_KEYS}, sort_keys=True)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+        if row and row[0] != settings:
+            logger.warning(f'dedupe thresholds changed since the index was built ({row[0]}); '
+                           'existing groups are kept, only new records use the new thresholds')
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('settings', ?)", (settings,))
+
+    def _block_candidates(self, probes, index):
+        # a stored canonical is a candidate if one of its keys meets one of
+        # the record's probes, or one of its probes meets the record's keys
+        found = set()
+        for chunk in _chunks(probes):
+            marks = ','.join('?' * len(chunk))
+            found.update(c for (c,) in self._db.execute(f'SELECT canonical_id FROM block_keys WHERE key IN ({marks})', chunk))
+        for chunk in _chunks(index - probes):
+            marks = ','.join('?' * len(chunk))
+            found.update(c for (c,) in self._db.execute(
+                f'SELECT canonical_id FROM block_keys WHERE probe = 1 AND key IN ({marks})', chunk))
+        return found
+
+    def merge(self, records, cfg):
+        """Merge `records` into the index.
+
+        Returns (canonical_records, change_report): the canonical records of
+        every input record (stored ones included), in first-seen order, and a
+        report of only what this merge changed.
+        """
+        self._check_settings(cfg)
+        for r in records:
+            if '_norm_title' not in r:
+                prepare_record(r)
+        by_id = {}
+        for r in records:
+            by_id.setdefault(r['id'], r)
+        owner = self._lookup('members', 'member_id', list(by_id))
+        new = [r for rid, r in by_id.items() if rid not in owner]
+        report = {'records_seen': len(by_id) - len(new), 'records_new': len(new), 'new_canonical': [],
+                  'same_doi': [], 'fuzzy_groups': [], 'human_review': []}
+        added = defaultdict(list)  # canonical id -> member ids added by this merge
+        created = {}  # canonical id -> record, for canonicals created by this merge
+
+        # 1. DOI map; new DOIs prefer a journal record as canonical, as dedupe_records does
+        doi_new = defaultdict(list)
+        no_doi = []
+        for r in new:
+            (doi_new[r['doi']] if r.get('doi') else no_doi).append(r)
+        doi_owner = self._lookup('dois', 'doi', list(doi_new))
+        for doi, members in doi_new.items():
+            cid = doi_owner.get(doi)
+            if cid is None:
+                canon = sorted(members, key=lambda x: 0 if 'journal' in (x.get('source') or '').lower() else 1)[0]
+                cid = canon['id']
+                created[cid] = canon
+                self._db.execute('INSERT INTO dois VALUES (?, ?)', (doi, cid))
+            for m in members:
+                owner[m['id']] = cid
+                added[cid].append(m['id'])
+
+        # 2. fuzzy: stored canonicals via their blocking keys, new records via blocked_pair_scores
+        doc_freq = Counter()
+        tokens = {t for r in no_doi for t in r['_norm_title'].split()}
+        for chunk in _chunks(tokens):
+            marks = ','.join('?' * len(chunk))
+            doc_freq.update(dict(self._db.execute(f'SELECT token, df FROM token_freq WHERE token IN ({marks})', chunk)))
+        for r in no_doi:
+            doc_freq.update(set(r['_norm_title'].split()))
+        within = defaultdict(dict)
+        for (i, j), score in blocked_pair_scores(no_doi, cfg).items():
+            within[j][i] = score
+        cutoff = _score_cutoff(cfg) * 100 - 1e-6
+        heads = {}  # position in no_doi -> canonical id, for records that became canonicals
+        new_keys = []
+        for pos, r in enumerate(no_doi):
+            probes, index = blocking_keys(r, doc_freq, cfg)
+            stored = self._canonicals(self._block_candidates(probes, index))
+            options = []
+            if stored:
+                ids = list(stored)
+                row = process.cdist([r['_norm_title']], [stored[c]['norm_title'] for c in ids], scorer=fuzz.token_set_ratio,
+                                    processor=None, score_cutoff=cutoff, dtype=np.float64)[0]
+                options += [(float(row[k]) / 100.0, stored[c]['record'], c) for k in np.flatnonzero(row).tolist() for c in [ids[k]]]
+            options += [(score, no_doi[i], heads[i]) for i, score in within[pos].items() if i in heads]
+            best = None
+            for score, other, cid in sorted(options, key=lambda o: -o[0]):
+                decision = pair_decision(other, r, score, cfg)
+                if decision == 'merge' and best is None:
+                    best = cid
+                elif decision == 'review':
+                    report['human_review'].append({'pair': (cid, r['id']), 'score': score, 'titles': (other.get('title'), r.get('title'))})
+            if best is None:
+                best = r['id']
+                heads[pos] = best
+                created[best] = r
+                new_keys += [(k, best, int(k in probes)) for k in index]
+            owner[r['id']] = best
+            added[best].append(r['id'])
+
+        # 3. write back and report
+        stored = self._canonicals([c for c in added if c not in created])
+        for cid, member_ids in added.items():
+            if cid in created:
+                canon = created[cid]
+                members = member_ids
+                record = {k: v for k, v in canon.items() if k not in ('member_ids', 'full_text')}
+                self._db.execute('INSERT INTO canonical VALUES (?, ?, ?, ?, ?)',
+                                 (cid, canon.get('doi'), canon['_norm_title'], json.dumps(record, default=str), json.dumps(members)))
+                report['new_canonical'].append(cid)
+            else:
+                members = stored[cid]['member_ids'] + member_ids
+                self._db.execute('UPDATE canonical SET member_ids = ? WHERE id = ?', (json.dumps(members), cid))
+            self._db.executemany('INSERT INTO members VALUES (?, ?)', [(m, cid) for m in member_ids])
+            if len(members) > 1:
+                doi = created[cid].get('doi') if cid in created else stored[cid]['doi']
+                report['same_doi' if doi else 'fuzzy_groups'].append({'canonical': cid, 'members': members, 'added': member_ids})
+        self._db.executemany('INSERT INTO block_keys VALUES (?, ?, ?)', new_keys)
+        self._db.executemany('INSERT INTO token_freq VALUES (?, 1) ON CONFLICT(token) DO UPDATE SET df = df + 1',
+                             [(t,) for r in no_doi for t in set(r['_norm_title'].split())])
+        self._db.commit()
+
+        # canonical records for every input record, first-seen order
+        canon_ids = list(dict.fromkeys(owner[rid] for rid in by_id))
+        stored = self._canonicals(canon_ids)
+        canonical_records = []
+        for cid in canon_ids:
+            canon = by_id.get(cid) or Record(stored[cid]['record'])
+            canon['member_ids'] = stored[cid]['member_ids']
+            canonical_records.append(canon)
+        logger.info(f"Dedupe index: {report['records_new']} new records, {len(report['new_canonical'])} new canonicals, "
+                    f'{len(self)} canonicals in total')
+        return canonical_records, report
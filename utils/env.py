@@ -0,0 +1,19 @@
+# utils/env.py
+"""Environment variables (API keys, contact emails), with `.env` loaded on first use.
+
+Connectors read their keys when a search runs rather than at import, so
+importing them neither touches the filesystem nor imports python-dotenv.
+"""
+import os
+from functools import cache
+
+
+@cache
+def _load_dotenv():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def getenv(name, default=None):
+    _load_dotenv()
+    return os.getenv(name, default)
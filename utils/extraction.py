@@ -0,0 +1,253 @@
+# utils/extraction.py
+"""Methods and results extraction for the paper-summary table.
+
+Compiled patterns find architecture names, datasets, subject counts and
+reported accuracy / F1 / Cohen's kappa in a paper's text. `extract(text)`
+returns an `Extraction`: the table values (architectures and datasets
+most-mentioned first, the most frequent subject count, the highest value
+reported for each metric) and, per field, the evidence: (start, end,
+matched text) in the document. `extract_many` runs it over many documents
+in a process pool; a document is a text or the `pathlib.Path` of a PDF,
+which is extracted in the worker.
+
+The text is lowercased once. Every pattern starts with a literal, which
+lets `re` skip ahead instead of trying each position, and a name's
+pattern only runs if some word of the text starts like it (a set lookup
+against the words' first three characters). Subject counts and metric values are matched in short
+windows around their keyword, so numbers are never scanned for on their
+own.
+"""
+import re
+import string
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+Extraction = namedtuple('Extraction', 'values evidence')
+
+FIELDS = ('architecture', 'dataset', 'subjects', 'accuracy', 'f1', 'kappa')
+
+# (table name, alternatives); each alternative starts with a literal and is matched
+# in the lowercased text, or case-sensitively in the original if it has capitals
+ARCHITECTURES = [
+    ('EEGNet', [r'eeg-?net']),
+    ('ShallowConvNet', [r'shallow\s?conv-?net']),
+    ('DeepConvNet', [r'deep\s?conv-?net']),
+    ('EEG-TCNet', [r'eeg-?tcnet']),
+    ('EEG Conformer', [r'eeg[- ]conformer', r'conformer']),
+    ('FBCNet', [r'fbcnet']),
+    ('TCN', [r'tcn', r'temporal convolutional networks?']),
+    ('Transformer', [r'transformers?', r'vision transformers?']),
+    ('BiLSTM', [r'bilstm', r'bi-lstm', r'bidirectional lstm']),
+    ('LSTM', [r'lstm', r'long short-term memory']),
+    ('GRU', [r'gru', r'gated recurrent units?']),
+    ('GNN', [r'gcn', r'gnn', r'graph (?:convolutional|neural) networks?']),
+    ('Capsule network', [r'capsnet', r'capsule (?:neural )?networks?']),
+    ('ResNet', [r'resnet(?:-?\d+)?']),
+    ('Autoencoder', [r'auto-?encoders?']),
+    ('DBN', [r'dbn', r'deep belief networks?']),
+    ('RNN', [r'rnn', r'recurrent neural networks?']),
+    ('CNN', [r'cnn', r'convolutional neural networks?', r'convnet']),
+    ('MLP', [r'mlp', r'multi-?layer perceptrons?']),
+]
+_BCI = r'(?:c| competition)?[- ]?'
+DATASETS = [
+    ('BCI IV-2a', [rf'bci{_BCI}(?:iv|4)[- ]?(?:dataset[- ])?2a', r'dataset[- ]?2a']),
+    ('BCI IV-2b', [rf'bci{_BCI}(?:iv|4)[- ]?(?:dataset[- ])?2b', r'dataset[- ]?2b']),
+    ('BCI III-IVa', [rf'bci{_BCI}iii[- ]?(?:dataset[- ])?iva']),
+    ('BCI III', [rf'bci{_BCI}iii(?![- ]?(?:dataset[- ])?iva)']),
+    ('SEED-IV', [r'SEED[- ]?IV']),
+    ('SEED', [r'SEED(?![- ]?IV)']),
+    ('DEAP', [r'DEAP']),
+    ('DREAMER', [r'DREAMER']),
+    ('AMIGOS', [r'AMIGOS']),
+    ('PhysioNet MI', [r'eegmmidb', r'eeg motor movement/imagery', r'physionet(?: eeg)? motor imagery']),
+    ('CHB-MIT', [r'chb-?mit']),
+    ('TUH EEG', [r'tuh(?: eeg)?(?: corpus)?', r'temple university hospital']),
+    ('Sleep-EDF', [r'sleep-?edfx?']),
+    ('OpenBMI', [r'openbmi']),
+    ('High-Gamma', [r'high[- ]gamma dataset', r'hgd']),
+    ('Bonn', [r'bonn (?:university )?(?:eeg )?(?:dataset|database)']),
+    ('Tsinghua SSVEP benchmark', [r'tsinghua (?:ssvep )?benchmark', r'benchmark ssvep dataset']),
+]
+NUMBER_WORDS = {w: i for i, w in enumerate(
+    'zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen '
+    'seventeen eighteen nineteen twenty'.split())}
+NUMBER_WORDS.update({'thirty': 30, 'forty': 40, 'fifty': 50})
+
+SUBJECT_NOUN_RE = re.compile(r'(?:subjects|participants|volunteers|patients|users)\b')
+# the count and up to three adjectives right before the noun
+SUBJECT_COUNT_RE = re.compile(
+    r'(?<![\w.])(\d{1,4}|' + '|'.join(NUMBER_WORDS) + r')\s+(?:(?:healthy|able-bodied|right-handed|adult|young|'
+    r'male|female|stroke|naive|na[iï]ve|human|different|epileptic)\s+){0,3}$')
+
+_MODIFIERS = (r'(?:mean|average|avg|overall|classification|decoding|recognition|detection|test|validation|balanced|'
+              r'cross-subject|subject-independent|subject-dependent|within-subject)')
+# "accuracy of 85.3%" / "accuracy: 0.853" after the name, "85.3% (mean) accuracy" before it;
+# a whole number needs its percent sign ("accuracy for 4-class MI" reports no accuracy).
+# A colon or equals sign may only follow the name itself; '.' and ';' end the search
+VALUE_AFTER_RE = re.compile(r'(?:\s*[:=])?[^.;:%\d\n]{0,40}?(?<![\w.])(\d{1,3}\.\d+|\.\d+|\d{1,3}(?=\s*(?:%|percent)))(?![\w])'
+                            r'\s*(%|percent)?')
+VALUE_BEFORE_RE = re.compile(rf'(?<![\w.])(\d{{1,3}}(?:\.\d+)?)\s*(%)\s+(?:{_MODIFIERS}\s+){{0,2}}$')
+METRICS = {
+    'accuracy': re.compile(r'acc(?:urac(?:y|ies))?(?!\w)'),
+    'f1': re.compile(r'f(?:1(?:[- ]?scores?)?|-?measure|-?scores?)(?!\w)'),
+    'kappa': re.compile(r'(?:kappa|κ)(?:\s+(?:value|score|coefficient))?(?!\w)'),
+}
+WINDOW = 60
+# punctuation to spaces, so that the words of a text are its split()
+_SEPARATORS = str.maketrans({c: ' ' for c in string.punctuation + '“”‘’«»–—…•·×'})
+
+
+def _anchor(pattern):
+    # the first three characters of the word every match of `pattern` starts with
+    prefix = re.match(r'[\w /-]*', pattern).group()
+    if prefix and pattern[len(prefix):len(prefix) + 1] in ('?', '*', '{'):
+        prefix = prefix[:-1]
+    word = re.match(r'[^\W_]*', prefix).group()
+    # a shorter anchor is only a word's prefix if the word ends there ("bi-lstm", not "bi-?lstm")
+    if len(word) < 3 and len(word) == len(prefix):
+        raise ValueError(f'pattern must start with three literal characters or a whole word: {pattern!r}')
+    return word[:3].lower()
+
+
+def word_prefixes(lowered):
+    """The first three characters of every word of `lowered`."""
+    return {w[:3] for w in set(lowered.translate(_SEPARATORS).split())}
+
+
+class _Names:
+    """Counts mentions of named entities, each given as alternatives starting with a literal.
+
+    A name's pattern only runs if a word of the text starts like one of its alternatives.
+    """
+
+    def __init__(self, named):
+        self.entries = []
+        for name, alternatives in named:
+            for case_sensitive in (False, True):
+                alts = [a for a in alternatives if (a != a.lower()) == case_sensitive]
+                if alts:
+                    anchors = tuple({_anchor(a) for a in alts})
+                    self.entries.append((name, case_sensitive, anchors, re.compile('|'.join(alts))))
+
+    def ranked(self, text, lowered, prefixes):
+        found = []
+        for name, case_sensitive, anchors, regex in self.entries:
+            if not any(a in prefixes for a in anchors):
+                continue
+            haystack = text if case_sensitive else lowered
+            for m in regex.finditer(haystack):
+                start, end = m.span()
+                # whole words only ("1d-cnn" counts, "cnnx" does not)
+                if not (start and haystack[start - 1].isalnum()) and not (end < len(haystack) and haystack[end].isalnum()):
+                    found.append((start, -end, name))
+        # leftmost-longest: "bi-lstm" is a BiLSTM and not also an LSTM
+        counts, first, covered = Counter(), {}, 0
+        for start, end, name in sorted(found):
+            if start < covered:
+                continue
+            covered = -end
+            counts[name] += 1
+            first.setdefault(name, (start, -end))
+        return sorted(counts, key=lambda n: (-counts[n], first[n][0])), first
+
+
+ARCHITECTURE_NAMES = _Names(ARCHITECTURES)
+DATASET_NAMES = _Names(DATASETS)
+
+
+def _subjects(lowered):
+    counts, first = Counter(), {}
+    for noun in SUBJECT_NOUN_RE.finditer(lowered):
+        m = SUBJECT_COUNT_RE.search(lowered, max(0, noun.start() - WINDOW), noun.start())
+        if not m:
+            continue
+        word = m.group(1)
+        n = NUMBER_WORDS[word] if word in NUMBER_WORDS else int(word)
+        if 0 < n <= 10000:
+            counts[n] += 1
+            first.setdefault(n, (m.start(), noun.end()))
+    if not counts:
+        return None, None
+    n = min(counts, key=lambda k: (-counts[k], first[k][0]))
+    return n, first[n]
+
+
+def _metric(lowered, field):
+    percent = field == 'accuracy'
+    best = None
+    for name in METRICS[field].finditer(lowered):
+        start, end = name.span()
+        if start and lowered[start - 1].isalnum():
+            continue
+        for m in (VALUE_AFTER_RE.match(lowered, end, end + WINDOW),
+                  VALUE_BEFORE_RE.search(lowered, max(0, start - WINDOW), start)):
+            if not m:
+                continue
+            value = float(m.group(1))
+            is_percent = bool(m.group(2)) or value > 1
+            if is_percent and value > 100:
+                continue
+            # accuracy in percent, F1 and kappa as fractions
+            if percent and not is_percent:
+                value *= 100
+            elif not percent and is_percent:
+                value /= 100
+            if best is None or value > best[0]:
+                best = (value, (min(start, m.start()), max(end, m.end())))
+    return best
+
+
+def _number(value):
+    return f'{round(value, 4):g}'
+
+
+def _lower(text):
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # a few characters lowercase to two; keep offsets aligned with the original
+        lowered = ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+    return lowered
+
+
+def extract(text, max_names=3):
+    """The summary-table values found in `text` and the (start, end, matched text) of their evidence."""
+    values, evidence = dict.fromkeys(FIELDS, ''), {}
+    if not text:
+        return Extraction(values, evidence)
+    lowered = _lower(text)
+    prefixes = word_prefixes(lowered)
+    for field, names in (('architecture', ARCHITECTURE_NAMES), ('dataset', DATASET_NAMES)):
+        ranked, first = names.ranked(text, lowered, prefixes)
+        if ranked:
+            values[field] = ';'.join(ranked[:max_names])
+            evidence[field] = first[ranked[0]]
+    n, span = _subjects(lowered)
+    if n:
+        values['subjects'], evidence['subjects'] = str(n), span
+    for field in METRICS:
+        found = _metric(lowered, field)
+        if found:
+            values[field], evidence[field] = _number(found[0]), found[1]
+    evidence = {field: (start, end, text[start:end]) for field, (start, end) in evidence.items()}
+    return Extraction(values, evidence)
+
+
+def extract_document(doc):
+    if isinstance(doc, Path):
+        from utils.pdf_extract import extract_text_from_pdf
+        try:
+            doc = extract_text_from_pdf(str(doc))
+        except Exception:
+            doc = ''
+    return extract(doc)
+
+
+def extract_many(docs, workers=None, chunksize=16):
+    """`extract` over texts / PDF paths in a process pool (workers=1: in this process), in order."""
+    docs = list(docs)
+    if workers == 1 or len(docs) <= chunksize:
+        return [extract_document(d) for d in docs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(extract_document, docs, chunksize=chunksize))
@@ -0,0 +1,360 @@
+# utils/http.py
+"""HTTP transport shared by the connectors.
+
+Every connector request goes through `get`, which sends it on one pooled
+keep-alive `requests.Session` (gzip/deflate bodies are decoded by
+requests) with the `http` config section's timeouts. Connection errors,
+timeouts and `retry_statuses` responses are retried with jittered
+exponential backoff, honouring Retry-After. Hosts registered with
+`limit_host` (or listed in http.host_rates) get a requests-per-second
+budget that is spent only on live requests, retries included. Functions
+registered with `add_hook` get one event per request (source, URL
+without query, status, elapsed seconds, attempt, from_cache,
+revalidated, bytes).
+
+Requests are tagged with the source they belong to ('pubmed', 'ieee', ...)
+so the harvest stage can cap how many requests each source has in flight.
+Successful GET responses are kept in an on-disk `DiskCache` (see the
+`http_cache` config section); an expired entry that carries an ETag or
+Last-Modified is revalidated with a conditional request, and a 304 renews
+it without downloading the body again. In offline mode only the cache is
+consulted and a miss raises `CacheMiss`.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from utils.cache import DiskCache, make_key
+from utils.logger import get_logger
+from utils.metrics import get_metrics
+from utils.ratelimit import RateLimiter
+
+logger = get_logger('http')
+
+_limits = {}
+_slots = {}
+_lock = threading.Lock()
+
+# query parameters that carry credentials and must not change the cache key
+SECRET_PARAMS = {'api_key', 'apikey', 'key', 'token'}
+# raw dump 'source' values -> request source keys
+DUMP_SOURCES = {'pubmed': 'pubmed', 'ieee_xplore': 'ieee', 'ieee': 'ieee', 'crossref': 'crossref',
+                'google_scholar': 'google_scholar', 'github': 'github', 'repositories': 'github'}
+
+_cache = None
+_cache_cfg = {}
+
+_transport_cfg = {}
+_session = None
+_host_limiters = {}
+_hooks = []
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CacheMiss(requests.RequestException):
+    """Raised in offline mode when a request is not in the cache."""
+
+
+def configure_limits(concurrency):
+    """Set the maximum number of in-flight requests per source key."""
+    with _lock:
+        _limits.clear()
+        _slots.clear()
+        for source, n in (concurrency or {}).items():
+            _limits[source] = max(1, int(n))
+            _slots[source] = threading.BoundedSemaphore(_limits[source])
+
+
+def source_limit(source, default=1):
+    """Return the configured concurrency for `source`."""
+    return _limits.get(source, default)
+
+
+@contextmanager
+def source_slot(source):
+    sem = _slots.get(source)
+    if sem is None:
+        yield
+        return
+    with sem:
+        yield
+
+
+def configure_transport(cfg):
+    """Apply the `http` config section; the pooled session is rebuilt on next use."""
+    global _transport_cfg, _session
+    tcfg = dict(cfg.get('http') or {})
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session, _transport_cfg = None, tcfg
+        _host_limiters.clear()
+        for host, rate in (tcfg.get('host_rates') or {}).items():
+            _host_limiters[host] = RateLimiter(rate)
+
+
+def session():
+    """The shared keep-alive session."""
+    global _session
+    with _lock:
+        if _session is None:
+            size = _transport_cfg.get('pool_maxsize', 10)
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=size)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def _host(url):
+    return urlparse(url).netloc if '//' in url else url
+
+
+def limit_host(url, rate):
+    """Allow at most `rate` live requests per second to the host of `url` (http.host_rates wins)."""
+    host = _host(url)
+    with _lock:
+        if host in (_transport_cfg.get('host_rates') or {}):
+            return
+        limiter = _host_limiters.get(host)
+        if limiter is None or limiter.rate != float(rate):
+            _host_limiters[host] = RateLimiter(rate)
+
+
+def add_hook(fn):
+    """Call `fn(event)` after every request; see the module docstring for the event keys."""
+    _hooks.append(fn)
+
+
+def remove_hook(fn):
+    _hooks.remove(fn)
+
+
+def _emit(**event):
+    for fn in list(_hooks):
+        try:
+            fn(event)
+        except Exception as e:
+            logger.warning(f'HTTP hook {getattr(fn, "__name__", fn)} failed: {e}')
+
+
+def _retry_after(resp):
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _backoff(attempt):
+    base = _transport_cfg.get('backoff', 1.0) * 2 ** attempt
+    # equal jitter: at least half the exponential step, so concurrent retries spread out
+    return min(_transport_cfg.get('max_backoff', 60.0), base / 2 + random.uniform(0, base / 2))
+
+
+def _send(url, source, params, headers, retries, retry_statuses, **kwargs):
+    tcfg = _transport_cfg
+    retries = tcfg.get('retries', 3) if retries is None else retries
+    retry_statuses = tuple(tcfg.get('retry_statuses', RETRY_STATUSES)) if retry_statuses is None else retry_statuses
+    kwargs.setdefault('timeout', (tcfg.get('connect_timeout', 10), tcfg.get('read_timeout', 60)))
+    host = _host(url)
+    where = f'{host}{urlparse(url).path}'  # never the query, which may carry an API key
+    limiter = _host_limiters.get(host)
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        with source_slot(source):
+            start = time.perf_counter()
+            try:
+                resp = session().get(url, params=params, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                elapsed = time.perf_counter() - start
+                get_metrics().observe_http(source, elapsed, 'error')
+                _emit(source=source, url=where, status=None, elapsed=elapsed, attempt=attempt, from_cache=False,
+                      revalidated=False, bytes=0)
+                if attempt == retries:
+                    raise
+                reason, wait = type(e).__name__, _backoff(attempt)
+            else:
+                elapsed = time.perf_counter() - start
+                get_metrics().observe_http(source, elapsed, resp.status_code)
+                # a streamed body is left to the caller; count what the server announced
+                size = int(resp.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(resp.content)
+                _emit(source=source, url=where, status=resp.status_code, elapsed=elapsed, attempt=attempt,
+                      from_cache=False, revalidated=False, bytes=size)
+                if resp.status_code not in retry_statuses or attempt == retries:
+                    return resp
+                reason = f'HTTP {resp.status_code}'
+                wait = min(max(_backoff(attempt), _retry_after(resp)), tcfg.get('max_backoff', 60.0))
+                resp.close()
+        get_metrics().count('http_retries', source=source or 'other')
+        logger.warning(f'{where}: {reason}; retry {attempt + 1}/{retries} in {wait:.1f}s')
+        time.sleep(wait)
+
+
+def send(url, source=None, params=None, headers=None, retries=None, retry_statuses=None, **kwargs):
+    """GET through the shared transport like `get`, but never from or into the response cache.
+
+    For downloads stored elsewhere (full-text PDFs); with `stream=True` the
+    caller reads the body and closes the response.
+    """
+    if is_offline():
+        raise CacheMiss(f'offline mode: {url} is not stored')
+    return _send(url, source, params, headers, retries, retry_statuses, **kwargs)
+
+
+def configure_cache(cfg):
+    """Open the response cache described by the `http_cache` config section."""
+    global _cache, _cache_cfg
+    ccfg = dict(cfg.get('http_cache') or {})
+    if os.getenv('RAG_OFFLINE'):
+        ccfg['offline'] = True
+    with _lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
+        if ccfg.get('enabled', True) or ccfg.get('offline'):
+            _cache = DiskCache(ccfg.get('dir', '.cache/http'), max_bytes=ccfg.get('max_bytes', 1 << 30),
+                               default_ttl=ccfg.get('ttl_seconds'))
+        _cache_cfg = ccfg
+    return _cache
+
+
+def is_offline():
+    return bool(_cache_cfg.get('offline'))
+
+
+def _ttl(source):
+    return (_cache_cfg.get('ttl') or {}).get(source, _cache_cfg.get('ttl_seconds'))
+
+
+def request_key(url, params=None, headers=None):
+    params = {k: v for k, v in sorted((params or {}).items()) if k.lower() not in SECRET_PARAMS}
+    accept = (headers or {}).get('Accept')
+    return make_key('GET', url, params, accept)
+
+
+def _response_from_cache(value, meta, url):
+    resp = requests.Response()
+    resp.status_code = meta.get('status', 200)
+    resp._content = value
+    resp.headers = CaseInsensitiveDict(meta.get('headers') or {})
+    resp.encoding = meta.get('encoding')
+    resp.url = meta.get('url', url)
+    resp.from_cache = True
+    resp.revalidated = False
+    return resp
+
+
+def get(url, source=None, params=None, headers=None, cache_key=None, refresh=False, retries=None,
+        retry_statuses=None, **kwargs):
+    """GET through the shared transport, served from the response cache when possible.
+
+    `cache_key` replaces the URL/params in the cache key for requests whose
+    parameters change between runs (e.g. E-utilities WebEnv sessions);
+    `refresh` skips the cache lookup (and revalidation) but still stores the
+    response, except in offline mode. `retries` and `retry_statuses`
+    override the `http` config for this request.
+    """
+    key = make_key('key', cache_key) if cache_key is not None else request_key(url, params, headers)
+    stale = None
+    if _cache is not None and (not refresh or is_offline()):
+        hit = _cache.get(key, allow_stale=is_offline())
+        if hit is not None:
+            get_metrics().count('http_cache_hits', source=source or 'other')
+            _emit(source=source, url=_host(url) + urlparse(url).path, status=hit[1].get('status', 200), elapsed=0.0,
+                  attempt=0, from_cache=True, revalidated=False, bytes=len(hit[0]))
+            return _response_from_cache(hit[0], hit[1], url)
+        if _transport_cfg.get('revalidate', True):
+            stale = _cache.get(key, allow_stale=True)
+    if is_offline():
+        raise CacheMiss(f'offline mode: {url} is not cached')
+    if stale is not None:
+        validators = CaseInsensitiveDict(stale[1].get('headers') or {})
+        conditional = {k: v for k, v in (('If-None-Match', validators.get('etag')),
+                                         ('If-Modified-Since', validators.get('last-modified'))) if v}
+        if conditional:
+            headers = dict(headers or {}, **conditional)
+        else:
+            stale = None
+    resp = _send(url, source, params, headers, retries, retry_statuses, **kwargs)
+    resp.from_cache = resp.revalidated = False
+    if stale is not None and resp.status_code == 304:
+        _cache.touch(key, ttl=_ttl(source))
+        get_metrics().count('http_revalidated', source=source or 'other')
+        cached = _response_from_cache(stale[0], stale[1], url)
+        cached.revalidated = True
+        return cached
+    if _cache is not None and resp.status_code == 200:
+        meta = {'status': resp.status_code, 'url': resp.url, 'encoding': resp.encoding,
+                'headers': {k: v for k, v in resp.headers.items() if k.lower() in ('content-type', 'etag', 'last-modified')}}
+        _cache.set(key, resp.content, meta, ttl=_ttl(source))
+    return resp
+
+
+def replay_records(source):
+    """Return records seeded from a raw dump for `source`, or None."""
+    if _cache is None:
+        return None
+    hit = _cache.get(make_key('records', source), allow_stale=True)
+    return json.loads(hit[0]) if hit else None
+
+
+def seed_from_dumps(paths):
+    """Store the records of raw search dumps (artifacts/search_results/*.json) for replay.
+
+    Dumps without records are skipped. Returns {source key: record count}.
+    """
+    if _cache is None:
+        raise RuntimeError('response cache is not configured')
+    seeded = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            dump = json.load(f)
+        source = DUMP_SOURCES.get(str(dump.get('source', '')).lower())
+        records = dump.get('records') or []
+        if source is None:
+            logger.warning(f'{path}: unknown source {dump.get("source")!r}, skipped')
+            continue
+        if not records:
+            logger.warning(f'{path}: no records (expected {dump.get("expected_count")}), skipped')
+            continue
+        _cache.set(make_key('records', source), json.dumps(records).encode('utf-8'),
+                   {'dump': os.path.basename(path)}, ttl=0)
+        seeded[source] = len(records)
+    return seeded
+
+
+if __name__ == '__main__':
+    import yaml
+    parser = argparse.ArgumentParser(description='Manage the HTTP response cache')
+    parser.add_argument('--config', default='config.yaml')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    seed = sub.add_parser('seed', help='seed record replay from raw search dumps')
+    seed.add_argument('paths', nargs='*', default=['artifacts/search_results/*.json'])
+    sub.add_parser('stats')
+    args = parser.parse_args()
+    with open(args.config, 'r', encoding='utf-8') as f:
+        configure_cache(yaml.safe_load(f))
+    if args.cmd == 'seed':
+        files = sorted(p for pattern in args.paths for p in glob.glob(pattern))
+        print(json.dumps(seed_from_dumps(files), indent=2))
+    else:
+        print(json.dumps(_cache.stats(), indent=2))
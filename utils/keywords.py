@@ -0,0 +1,83 @@
+# utils/keywords.py
+"""Compiled keyword matcher shared by the screeners and bias checks.
+
+One `KeywordMatcher` is built from every keyword list (substring semantics,
+as in `k in text.lower()`) and regex indicator list. `scan` lowercases a
+text once and returns a `Hits` object that answers category questions from
+precompiled per-category alternations, evaluating each category at most
+once, so the title/abstract screener and `utils.bias` share one lowercased
+copy and one set of compiled patterns instead of re-lowering and
+re-scanning per keyword.
+"""
+import re
+from functools import lru_cache
+
+
+class Hits:
+    __slots__ = ('text', '_matcher', '_has', '_first')
+
+    def __init__(self, text, matcher):
+        self.text = text  # lowercased
+        self._matcher = matcher
+        self._has = {}
+        self._first = {}
+
+    def has(self, category):
+        """True if any keyword/pattern of `category` occurs."""
+        found = self._has.get(category)
+        if found is None:
+            found = self._has[category] = bool(self.text) and self._matcher._res[category].search(self.text) is not None
+        return found
+
+    def first(self, category):
+        """(keyword, offset) of the earliest-listed keyword of `category` present, or None."""
+        if category not in self._first:
+            hit = None
+            if self.has(category):
+                for k in self._matcher.keywords[category]:
+                    idx = self.text.find(k)
+                    if idx != -1:
+                        hit = (k, idx)
+                        break
+            self._first[category] = hit
+        return self._first[category]
+
+    def categories(self):
+        return {c for c in self._matcher._res if self.has(c)}
+
+
+class KeywordMatcher:
+    """keywords: {category: [substring, ...]} in priority order; patterns: {category: [regex, ...]}"""
+
+    def __init__(self, keywords, patterns=None):
+        self.keywords = {c: list(ws) for c, ws in keywords.items()}
+        self.patterns = {c: list(ps) for c, ps in (patterns or {}).items()}
+        # longest-first so a shorter keyword never hides a longer one
+        self._res = {c: re.compile('|'.join(re.escape(w) for w in sorted(ws, key=len, reverse=True)) or '(?!)')
+                     for c, ws in self.keywords.items()}
+        self._res.update({c: re.compile('|'.join(f'(?:{p})' for p in ps) or '(?!)') for c, ps in self.patterns.items()})
+
+    def pattern(self, category):
+        """Regex source matching any keyword/pattern of `category` (in lowercased text)."""
+        return self._res[category].pattern
+
+    def scan(self, text):
+        return Hits(text.lower() if text else '', self)
+
+
+@lru_cache(maxsize=None)
+def get_matcher():
+    """The matcher over every screening and bias keyword list, built once."""
+    from screeners import title_abstract_screener as ta, full_text_screener as ft
+    from utils.bias import BIAS_INDICATORS
+    return KeywordMatcher(
+        {
+            'dl': ta.DL_KEYWORDS,
+            'eeg': ta.EEG_KEYWORDS,
+            'classification': ta.CLASSIFICATION_KEYWORDS,
+            'review': ta.REVIEW_KEYWORDS,
+            'ft_dl': ft.DL_KEYWORDS,
+            'metric': ft.METRIC_KEYWORDS,
+        },
+        {'bias:' + name: pats for name, pats in BIAS_INDICATORS.items()},
+    )
@@ -1,17 +1,45 @@
 """LLM abstraction layer — supports Google Gemini (via google-generativeai).
 
-This module provides a minimal `generate_text` wrapper. It will use the
-`GEMINI_API_KEY` environment variable (recommended) and the
-`google-generativeai` package when available. If the package isn't
-installed or the key is missing, the functions raise informative errors.
+`LLMClient` wraps a pluggable backend with a persistent prompt-hash
+response cache (`utils.cache.DiskCache`, LRU-bounded) for deterministic
+(temperature 0) calls, a token-bucket rate limiter, bounded concurrency
+for `generate_many` and exponential backoff on transient failures (rate
+limits, server errors, timeouts). Backends are registered in `BACKENDS`: 'gemini' uses the
+`GEMINI_API_KEY` environment variable and the `google-generativeai`
+package, configured once per client; 'stub' is a local deterministic
+backend for tests and benchmarks that runs offline.
 
-Note: This is a small scaffold for integration. For production use add
-error handling, retries/backoff, token limits and cost controls.
+`generate_text` keeps the original one-call interface on top of a shared
+default client, built from the `llm` section passed to `configure` or
+else from config.yaml.
 """
+import hashlib
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+from utils import env
+from utils.cache import DiskCache, make_key
+from utils.logger import get_logger
+from utils.ratelimit import RateLimiter
+
+DEFAULT_MODEL = 'models/text-bison-001'
+# HTTP statuses (the `code` of google.api_core errors) and error types worth retrying
+TRANSIENT_CODES = (408, 429, 500, 502, 503, 504)
+TRANSIENT_ERRORS = ('ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+                    'DeadlineExceeded', 'Aborted', 'Timeout', 'ConnectionError')
+
+logger = get_logger('llm')
+
+
+def __getattr__(name):
+    # GEMINI_API_KEY used to be read (and .env loaded) at import; it is now looked up when asked for
+    if name == 'GEMINI_API_KEY':
+        return env.getenv('GEMINI_API_KEY')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def _import_genai():
@@ -22,7 +50,174 @@ def _import_genai():
         raise ImportError('google-generativeai package is required for Gemini support. Install via `pip install google-generativeai`.') from e
 
 
-def generate_text(prompt: str, model: str = 'models/text-bison-001', max_output_tokens: int = 512, temperature: float = 0.0) -> str:
+def _response_text(response):
+    # the client has returned several shapes across versions
+    if hasattr(response, 'text'):
+        return response.text
+    if hasattr(response, 'content'):
+        return response.content
+    if isinstance(response, dict):
+        msg = response.get('candidates') or response.get('output') or response.get('choices')
+        if isinstance(msg, list) and len(msg) > 0:
+            cand = msg[0]
+            return cand.get('content') or cand.get('text') or str(cand)
+    return str(response)
+
+
+def is_transient(exc):
+    """Whether a failed call may succeed if retried (not bad keys, arguments or missing packages)."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(exc, 'code', None) in TRANSIENT_CODES:
+        return True
+    return any(t.__name__ in TRANSIENT_ERRORS for t in type(exc).__mro__)
+
+
+class GeminiBackend:
+    name = 'gemini'
+
+    def __init__(self, api_key=None):
+        api_key = api_key or env.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise RuntimeError('GEMINI_API_KEY not set in environment; set GEMINI_API_KEY in your .env or environment variables')
+        self.genai = _import_genai()
+        try:
+            self.genai.configure(api_key=api_key)
+        except Exception:
+            # some versions use genai.client or different config
+            self.genai.client.configure(api_key=api_key)
+
+    def complete(self, prompt, model, max_output_tokens, temperature):
+        if hasattr(self.genai, 'GenerativeModel'):
+            response = self.genai.GenerativeModel(model).generate_content(
+                prompt, generation_config={'max_output_tokens': max_output_tokens, 'temperature': temperature})
+        else:
+            response = self.genai.generate(model=model, prompt=prompt, max_output_tokens=max_output_tokens, temperature=temperature)
+        return _response_text(response)
+
+
+class StubBackend:
+    """Deterministic offline backend: canned `responses` or a hash of the prompt."""
+    name = 'stub'
+
+    def __init__(self, responses=None, latency=0.0):
+        self.responses = responses or {}
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, prompt, model, max_output_tokens, temperature):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if prompt in self.responses:
+            return self.responses[prompt]
+        return 'stub:' + hashlib.sha256(f'{model}\0{prompt}'.encode('utf-8')).hexdigest()[:16]
+
+
+BACKENDS = {'gemini': GeminiBackend, 'stub': StubBackend}
+
+
+class LLMClient:
+    def __init__(self, backend, model=DEFAULT_MODEL, max_output_tokens=512, temperature=0.0, cache=None,
+                 requests_per_second=1.0, burst=None, max_workers=4, max_retries=4, backoff=1.0):
+        self.backend = backend
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.cache = cache
+        self.limiter = RateLimiter(requests_per_second, burst)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Build a client from the `llm` config section."""
+        lcfg = cfg.get('llm', {})
+        backend = BACKENDS[lcfg.get('backend', 'gemini')](**(lcfg.get('backend_options') or {}))
+        cache = None
+        if lcfg.get('cache', True):
+            cache = DiskCache(lcfg.get('cache_dir', '.cache/llm'), max_bytes=lcfg.get('cache_max_bytes', 256 * 1024 * 1024))
+        return cls(backend, model=lcfg.get('model') or DEFAULT_MODEL, max_output_tokens=lcfg.get('max_output_tokens', 512),
+                   temperature=lcfg.get('temperature', 0.0), cache=cache,
+                   requests_per_second=lcfg.get('requests_per_second', 1.0), burst=lcfg.get('burst'),
+                   max_workers=lcfg.get('max_workers', 4), max_retries=lcfg.get('max_retries', 4),
+                   backoff=lcfg.get('backoff_seconds', 1.0))
+
+    def _key(self, prompt, model, max_output_tokens, temperature):
+        return make_key('llm', self.backend.name, model, max_output_tokens, temperature, prompt)
+
+    def _call(self, prompt, model, max_output_tokens, temperature):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                return self.backend.complete(prompt, model, max_output_tokens, temperature)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise RuntimeError(f'{self.backend.name} generation failed: {e}') from e
+                wait = self.backoff * 2 ** attempt * (0.5 + random.random() / 2)
+                logger.warning(f'{self.backend.name} call failed ({e}); retrying in {wait:.1f}s')
+                time.sleep(wait)
+
+    def generate(self, prompt, model=None, max_output_tokens=None, temperature=None):
+        """Return the completion for `prompt`.
+
+        A deterministic request (temperature 0) made before is answered from
+        the cache; sampled completions are never cached.
+        """
+        model = model or self.model
+        max_output_tokens = max_output_tokens or self.max_output_tokens
+        temperature = self.temperature if temperature is None else temperature
+        cache = self.cache if not temperature else None
+        key = self._key(prompt, model, max_output_tokens, temperature)
+        if cache is not None:
+            hit = cache.get(key)
+            if hit is not None:
+                return hit[0].decode('utf-8')
+        text = self._call(prompt, model, max_output_tokens, temperature)
+        if cache is not None:
+            cache.set(key, text.encode('utf-8'), {'model': model}, ttl=0)
+        return text
+
+    def generate_many(self, prompts, **kwargs):
+        """Completions for `prompts` in order; distinct prompts run up to max_workers at a time."""
+        unique = list(dict.fromkeys(prompts))
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='llm') as pool:
+            texts = dict(zip(unique, pool.map(lambda p: self.generate(p, **kwargs), unique)))
+        return [texts[p] for p in prompts]
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def configure(cfg):
+    """Build the shared client used by `generate_text` from the config's `llm` section."""
+    global _default_client
+    client = LLMClient.from_config(cfg)
+    with _default_lock:
+        _default_client = client
+    return client
+
+
+def get_client(config_path='config.yaml') -> LLMClient:
+    """Shared client used by `generate_text`; unless `configure` was called, built from `config_path` on first use."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            cfg = {}
+            if os.path.exists(config_path):
+                import yaml
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    cfg = yaml.safe_load(f) or {}
+            _default_client = LLMClient.from_config(cfg)
+        return _default_client
+
+
+def generate_text(prompt: str, model: str = DEFAULT_MODEL, max_output_tokens: int = 512, temperature: float = 0.0,
+                  client: Optional[LLMClient] = None) -> str:
     """Generate text using Gemini (Google Generative AI).
 
     Args:
@@ -30,43 +225,9 @@ def generate_text(prompt: str, model: str = 'models/text-bison-001', max_output_
         model: model resource name (default is `models/text-bison-001`)
         max_output_tokens: maximum tokens to generate
         temperature: sampling temperature
+        client: client to use instead of the shared default one
 
     Returns:
         generated text (string)
     """
-    if not GEMINI_API_KEY:
-        raise RuntimeError('GEMINI_API_KEY not set in environment; set GEMINI_API_KEY in your .env or environment variables')
-
-    genai = _import_genai()
-    # configure client
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-    except Exception:
-        # some versions use genai.client or different config; attempt both
-        try:
-            genai.client.configure(api_key=GEMINI_API_KEY)
-        except Exception:
-            pass
-
-    # Call the generate endpoint
-    # The google-generativeai client exposes `genai.generate()` in recent versions.
-    try:
-        response = genai.generate(model=model, prompt=prompt, max_output_tokens=max_output_tokens, temperature=temperature)
-        # response may be a dict-like object; attempt to extract text
-        if hasattr(response, 'content'):
-            # some clients return an object with .content
-            return response.content
-        # fallback common shapes
-        if isinstance(response, dict):
-            # message -> content
-            msg = response.get('candidates') or response.get('output') or response.get('choices')
-            if msg:
-                # attempt to find text
-                if isinstance(msg, list) and len(msg) > 0:
-                    cand = msg[0]
-                    # candidate may be dict with 'content' or 'output'
-                    return cand.get('content') or cand.get('text') or str(cand)
-            return str(response)
-        return str(response)
-    except Exception as e:
-        raise RuntimeError(f'Gemini generation failed: {e}') from e
+    return (client or get_client()).generate(prompt, model=model, max_output_tokens=max_output_tokens, temperature=temperature)
@@ -0,0 +1,227 @@
+# utils/metrics.py
+"""Run metrics: stage timings, record counts, HTTP latency and memory.
+
+One process-wide `Metrics` registry (`get_metrics()`) collects
+
+- stages: wall and CPU time, records in/out and the RSS high-water mark
+  at the end of each `stage(...)` block (run_pipeline's stages and each
+  harvest source; sources use their thread's CPU time since they run
+  concurrently). The high-water mark is the process's peak so far, not
+  the stage's own. Other stages also get the CPU time of the child
+  processes (worker pools) that finished during the block and the
+  largest child's peak RSS so far,
+- counters, e.g. HTTP requests per source and status, cache hits and
+  reused checkpoints,
+- histograms, e.g. HTTP request latency per source, in fixed buckets.
+
+Recording costs a lock and a few additions, so it is always on.
+`write_json` and `write_openmetrics` dump the registry at the end of a run
+(see `output.metrics_json` / `output.openmetrics`).
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def children_cpu_s():
+    """User + system CPU time of this process's finished child processes, in seconds."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb(children=False):
+    """Peak resident set size of this process (or of its finished child processes), in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return usage.ru_maxrss / (1024 * 1024 if os.uname().sysname == 'Darwin' else 1024)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Stage:
+    """Measurements of one `Metrics.stage` block; set `records_out` (and `records_in`) inside it."""
+    __slots__ = ('name', 'records_in', 'records_out', 'wall_s', 'cpu_s', 'children_cpu_s', 'rss_high_water_mb',
+                 'children_rss_high_water_mb', 'error')
+
+    def __init__(self, name, records_in=None):
+        self.name = name
+        self.records_in = records_in
+        self.records_out = None
+        self.wall_s = self.cpu_s = self.children_cpu_s = self.error = None
+        self.rss_high_water_mb = self.children_rss_high_water_mb = None
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k != 'name'}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for le, n in zip(list(self.buckets) + [float('inf')], self.counts):
+            total += n
+            yield le, total
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum,
+                'buckets': {('+Inf' if le == float('inf') else str(le)): n for le, n in self.cumulative()}}
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}
+            self.counters = {}
+            self.histograms = {}
+            self.info = {}
+
+    @contextmanager
+    def stage(self, name, records_in=None, thread=False):
+        """Time the block as stage `name`; `thread` measures only this thread's CPU time (and no children's)."""
+        st = Stage(name, records_in)
+        cpu = time.thread_time if thread else time.process_time
+        wall0, cpu0 = time.perf_counter(), cpu()
+        children0 = None if thread else children_cpu_s()
+        try:
+            yield st
+        except BaseException as e:
+            st.error = type(e).__name__
+            raise
+        finally:
+            st.wall_s = time.perf_counter() - wall0
+            st.cpu_s = cpu() - cpu0
+            st.rss_high_water_mb = peak_rss_mb()
+            if children0 is not None:
+                st.children_cpu_s = children_cpu_s() - children0
+                st.children_rss_high_water_mb = peak_rss_mb(children=True)
+            with self._lock:
+                self.stages[name] = st
+
+    def count(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def observe_http(self, source, seconds, status):
+        """One HTTP request of `source` that took `seconds` and ended with `status` (a code or 'error')."""
+        source = source or 'other'
+        self.count('http_requests', source=source, status=str(status))
+        self.observe('http_request_duration_seconds', seconds, source=source)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started)),
+                'duration_s': time.time() - self.started,
+                'peak_rss_mb': peak_rss_mb(),
+                'children_peak_rss_mb': peak_rss_mb(children=True),
+                'info': dict(self.info),
+                'stages': {name: st.to_dict() for name, st in self.stages.items()},
+                'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in self.counters.items()],
+                'histograms': [{'name': n, 'labels': dict(l), **h.to_dict()} for (n, l), h in self.histograms.items()],
+            }
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def openmetrics(self, prefix='pipeline'):
+        """The registry in the OpenMetrics text format."""
+        data = self.to_dict()
+        lines = []
+
+        def family(name, kind, samples):
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{prefix}_{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+
+        for field, name in (('wall_s', 'stage_wall_seconds'), ('cpu_s', 'stage_cpu_seconds'),
+                            ('children_cpu_s', 'stage_children_cpu_seconds'),
+                            ('records_in', 'stage_records_in'), ('records_out', 'stage_records_out'),
+                            ('rss_high_water_mb', 'stage_rss_high_water_megabytes'),
+                            ('children_rss_high_water_mb', 'stage_children_rss_high_water_megabytes')):
+            samples = [('', {'stage': s}, st[field]) for s, st in data['stages'].items() if st[field] is not None]
+            if samples:
+                family(name, 'gauge', samples)
+        for name, value in (('peak_rss_megabytes', data['peak_rss_mb']), ('duration_seconds', data['duration_s'])):
+            if value is not None:
+                family(name, 'gauge', [('', {}, value)])
+        by_name = {}
+        for c in data['counters']:
+            by_name.setdefault(c['name'], []).append(('_total', c['labels'], c['value']))
+        for name, samples in by_name.items():
+            family(name, 'counter', samples)
+        by_name = {}
+        for h in data['histograms']:
+            samples = by_name.setdefault(h['name'], [])
+            samples += [('_bucket', {**h['labels'], 'le': le}, n) for le, n in h['buckets'].items()]
+            samples += [('_count', h['labels'], h['count']), ('_sum', h['labels'], h['sum'])]
+        for name, samples in by_name.items():
+            family(name, 'histogram', samples)
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write_openmetrics(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.openmetrics())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
@@ -0,0 +1,257 @@
+# utils/minhash.py
+"""MinHash/LSH near-duplicate engine (`dedupe.fuzzy_strategy: minhash`).
+
+Unlike the blocked strategy, this compares all records, DOI-bearing or
+not, so a DOI-less Scholar copy joins the DOI group of its paper. Each
+record gets two MinHash signatures, computed in worker processes:
+
+- over character shingles of its normalized title, which is robust to
+  typos and word order;
+- over word shingles of its normalized title + abstract, which catches
+  retitled versions of the same abstract.
+
+LSH banding on each signature set yields candidate pairs. A pair is
+merged when its titles pass the usual `pair_decision` rule
+(token_set_ratio thresholds plus the author/year check), or when the
+estimated title+abstract Jaccard similarity reaches
+`minhash.jaccard_threshold`. Merges are applied with union-find, best
+scores first. Two groups with different DOIs are never joined.
+
+The result has the same (canonical_records, duplicate_report) shape as
+`dedupe_records`.
+"""
+import os
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from utils.dedupe import _score_cutoff, normalize_title, pair_decision, prepare_record
+from utils.logger import get_logger
+
+logger = get_logger('minhash')
+
+# shingles hashed per numpy step (x num_perm uint64 values)
+_BATCH = 1 << 15
+
+
+def _permutations(num_perm, seed):
+    rng = np.random.default_rng(seed)
+    top = np.iinfo(np.uint64).max
+    return (rng.integers(1, top, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1),
+            rng.integers(0, top, num_perm, dtype=np.uint64, endpoint=True))
+
+
+def char_shingles(text, k):
+    if len(text) <= k:
+        return {text} if text else set()
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def word_shingles(text, k):
+    words = text.split()
+    if len(words) <= k:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def signatures(shingle_sets, num_perm=128, seed=1):
+    """MinHash signatures, one uint32 row of num_perm values per set; empty sets get all-0xFFFFFFFF rows."""
+    a, b = _permutations(num_perm, seed)
+    out = np.full((len(shingle_sets), num_perm), 0xFFFFFFFF, dtype=np.uint32)
+    start = 0
+    while start < len(shingle_sets):
+        end, total = start, 0
+        while end < len(shingle_sets) and (end == start or total + len(shingle_sets[end]) <= _BATCH):
+            total += len(shingle_sets[end])
+            end += 1
+        lengths = np.array([len(s) for s in shingle_sets[start:end]])
+        if total:
+            x = np.fromiter((zlib.crc32(s.encode('utf-8')) for sset in shingle_sets[start:end] for s in sset),
+                            dtype=np.uint64, count=total)[:, None]
+            # multiply-shift hashing: the high 32 bits of a*x + b mod 2**64 (wrap-around is intended)
+            hashed = ((x * a + b) >> np.uint64(32)).astype(np.uint32)
+            nonempty = lengths > 0
+            offsets = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+            block = out[start:end]
+            block[nonempty] = np.minimum.reduceat(hashed, offsets, axis=0)
+        start = end
+    return out
+
+
+def _chunk_signatures(titles, texts, params):
+    title_sets = [char_shingles(t, params['shingle_size']) for t in titles]
+    text_sets = [word_shingles(t, params['text_shingle_size']) if t else set() for t in texts]
+    return (signatures(title_sets, params['num_perm'], params['seed']),
+            signatures(text_sets, params['num_perm'], params['seed']))
+
+
+def _band_keys(sigs, bands):
+    # one uint64 per (row, band); a collision only adds a candidate, which verification rejects
+    rows = sigs.shape[1] // bands
+    mult = _permutations(rows, 7)[0]
+    cols = sigs[:, :bands * rows].astype(np.uint64).reshape(len(sigs), bands, rows)
+    return (cols * mult).sum(axis=2)
+
+
+def lsh_candidates(sigs, valid, bands, max_bucket):
+    """Index pairs (i, j), i < j, among rows `valid` that agree on all rows of some band.
+
+    Returns (pairs as an (n, 2) int64 array, number of skipped oversized buckets).
+    """
+    valid = np.asarray(valid, dtype=np.int64)
+    if len(valid) < 2:
+        return np.empty((0, 2), dtype=np.int64), 0
+    keys = _band_keys(sigs[valid], bands)
+    found, oversized = [], 0
+    for band in range(bands):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        # buckets of two are the common case
+        two = starts[sizes == 2]
+        found.append(np.stack([valid[order[two]], valid[order[two + 1]]], axis=1))
+        for s, k in zip(starts[sizes > 2].tolist(), sizes[sizes > 2].tolist()):
+            if k > max_bucket:
+                oversized += 1
+                continue
+            members = valid[order[s:s + k]]
+            found.append(np.array(list(combinations(members.tolist(), 2)), dtype=np.int64))
+    return _unique_pairs(found, len(sigs)), oversized
+
+
+def _unique_pairs(arrays, n):
+    pairs = np.concatenate(arrays) if arrays else np.empty((0, 2), dtype=np.int64)
+    codes = np.unique(pairs.min(axis=1) * n + pairs.max(axis=1))
+    return np.stack([codes // n, codes % n], axis=1)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 that refuse to join sets with different DOIs."""
+
+    def __init__(self, dois):
+        self.parent = list(range(len(dois)))
+        self.doi = {i: d for i, d in enumerate(dois) if d}
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri == rj:
+            return True
+        di, dj = self.doi.get(ri), self.doi.get(rj)
+        if di and dj and di != dj:
+            return False
+        root, child = min(ri, rj), max(ri, rj)
+        self.parent[child] = root
+        if di or dj:
+            self.doi[root] = di or dj
+        return True
+
+
+def _params(cfg):
+    mcfg = cfg.get('minhash') or {}
+    params = {'num_perm': mcfg.get('num_perm', 128), 'bands': mcfg.get('bands', 32), 'text_bands': mcfg.get('text_bands', 16),
+              'shingle_size': mcfg.get('shingle_size', 4), 'text_shingle_size': mcfg.get('text_shingle_size', 3),
+              'jaccard_threshold': mcfg.get('jaccard_threshold', 0.7), 'max_bucket': mcfg.get('max_bucket', 500),
+              'workers': mcfg.get('workers'), 'chunk_size': mcfg.get('chunk_size', 5000), 'seed': mcfg.get('seed', 1)}
+    if params['num_perm'] % params['bands'] or params['num_perm'] % params['text_bands']:
+        raise ValueError('dedupe.minhash.num_perm must be a multiple of dedupe.minhash.bands and text_bands')
+    return params
+
+
+def compute_signatures(records, params):
+    """(title signatures, title+abstract signatures) for `records`, computed in chunks across worker processes."""
+    titles = [r['_norm_title'] for r in records]
+    texts = [(r['_norm_title'] + ' ' + normalize_title(r['abstract'])) if r.get('abstract') else '' for r in records]
+    size = params['chunk_size']
+    chunks = [(titles[i:i + size], texts[i:i + size]) for i in range(0, len(records), size)]
+    workers = params['workers'] or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        results = [_chunk_signatures(t, x, params) for t, x in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_chunk_signatures, *zip(*chunks), [params] * len(chunks)))
+    if not results:
+        empty = np.empty((0, params['num_perm']), dtype=np.uint32)
+        return empty, empty
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def minhash_dedupe(records, cfg):
+    """Group near-duplicate records across DOI and DOI-less records; returns (canonical_records, duplicate_report)."""
+    params = _params(cfg)
+    for r in records:
+        if '_norm_title' not in r:
+            prepare_record(r)
+    title_sigs, text_sigs = compute_signatures(records, params)
+    has_title = [i for i, r in enumerate(records) if r['_norm_title']]
+    has_text = [i for i, r in enumerate(records) if r.get('abstract') and r['_norm_title']]
+    title_pairs, over_t = lsh_candidates(title_sigs, has_title, params['bands'], params['max_bucket'])
+    text_pairs, over_x = lsh_candidates(text_sigs, has_text, params['text_bands'], params['max_bucket'])
+    pairs = _unique_pairs([title_pairs, text_pairs], len(records))
+    if over_t or over_x:
+        logger.warning(f'Skipped {over_t + over_x} LSH buckets with more than {params["max_bucket"]} records')
+
+    # verify candidates: the title rule of the other strategies, or near-identical title+abstract
+    with_text = np.zeros(len(records), dtype=bool)
+    with_text[has_text] = True
+    dois = np.array([bool(r.get('doi')) for r in records])
+    # two DOI records are the same paper exactly when their DOIs are equal, which is already known
+    pairs = pairs[~(dois[pairs[:, 0]] & dois[pairs[:, 1]])]
+    left, right = pairs[:, 0], pairs[:, 1]
+    jaccard = np.where(with_text[left] & with_text[right], (text_sigs[left] == text_sigs[right]).mean(axis=1), 0.0)
+    titles = [r['_norm_title'] for r in records]
+    scores = process.cpdist([titles[i] for i in left.tolist()], [titles[j] for j in right.tolist()],
+                            scorer=fuzz.token_set_ratio, processor=None, dtype=np.float64,
+                            workers=params['workers'] or -1) / 100.0 if len(pairs) else np.empty(0)
+    keep = (scores >= _score_cutoff(cfg)) | (jaccard >= params['jaccard_threshold'])
+    merges, reviews = [], []
+    for i, j, score, jac in zip(left[keep].tolist(), right[keep].tolist(), scores[keep].tolist(), jaccard[keep].tolist()):
+        decision = pair_decision(records[i], records[j], score, cfg)
+        if decision == 'merge' or jac >= params['jaccard_threshold']:
+            merges.append((max(score, jac), i, j))
+        elif decision == 'review':
+            reviews.append((score, i, j))
+
+    uf = UnionFind([r.get('doi') for r in records])
+    doi_first = {}
+    for i, r in enumerate(records):
+        if r.get('doi'):
+            uf.union(doi_first.setdefault(r['doi'], i), i)
+    for _, i, j in sorted(merges, key=lambda m: (-m[0], m[1], m[2])):
+        uf.union(i, j)
+
+    clusters = defaultdict(list)
+    for i in range(len(records)):
+        clusters[uf.find(i)].append(records[i])
+    duplicate_report = {'same_doi': [], 'fuzzy_groups': [], 'human_review': [],
+                        'minhash': {'candidate_pairs': len(pairs), 'merged_pairs': len(merges), 'oversized_buckets': over_t + over_x}}
+    canonical_records = []
+    for members in clusters.values():
+        with_doi = [m for m in members if m.get('doi')]
+        # as in dedupe_records: a DOI record, journals first, else the first record
+        canon = sorted(with_doi, key=lambda x: 0 if 'journal' in (x.get('source') or '').lower() else 1)[0] if with_doi else members[0]
+        if with_doi or len(members) > 1:
+            canon['member_ids'] = [m['id'] for m in members]
+        canonical_records.append(canon)
+        if with_doi and len(with_doi) == len(members):
+            duplicate_report['same_doi'].append({'canonical': canon['id'], 'members': canon['member_ids']})
+        elif len(members) > 1:
+            duplicate_report['fuzzy_groups'].append({'canonical': canon['id'], 'members': canon['member_ids']})
+    for score, i, j in reviews:
+        if uf.find(i) != uf.find(j):
+            r, s = records[i], records[j]
+            duplicate_report['human_review'].append({'pair': (r['id'], s['id']), 'score': score, 'titles': (r.get('title'), s.get('title'))})
+    logger.info(f'MinHash dedupe: {len(records)} records, {len(pairs)} candidate pairs, {len(merges)} merged, '
+                f'{len(canonical_records)} canonical records')
+    return canonical_records, duplicate_report
@@ -2,13 +2,17 @@
 import fitz  # PyMuPDF
 
 
-def extract_text_from_pdf(path_or_bytes):
-    """Return extracted text. path_or_bytes: filepath or bytes."""
+def iter_pages(path_or_bytes):
+    """Yield the text of each page; pages not consumed are never extracted."""
     if isinstance(path_or_bytes, bytes):
         doc = fitz.open(stream=path_or_bytes, filetype='pdf')
     else:
         doc = fitz.open(path_or_bytes)
-    text = []
-    for page in doc:
-        text.append(page.get_text())
-    return '\n'.join(text)
+    with doc:
+        for page in doc:
+            yield page.get_text()
+
+
+def extract_text_from_pdf(path_or_bytes):
+    """Return extracted text. path_or_bytes: filepath or bytes."""
+    return '\n'.join(iter_pages(path_or_bytes))
@@ -0,0 +1,207 @@
+# utils/records.py
+"""Compact record and screening-decision types.
+
+Records used to be plain dicts that every stage added keys to. `Record`
+keeps the same keys in `__slots__` (well under half the size of the
+equivalent dict) and still behaves like a mutable mapping, so stage code
+keeps using `r.get(...)`, `r['x'] = ...` and `r.update(...)`. A slot that
+was never set is a missing key, exactly like an absent dict key, so
+`r.get('language', 'English')` keeps its meaning. Keys outside the known
+fields go to a small per-record overflow dict.
+
+Screening decisions use `ScreeningDecision` with `Decision` and
+`ExclusionLabel` str enums (one shared object per label, and they compare
+equal to the old strings). The 16 possible bias assessments are shared,
+read-only `BiasAssessment` instances (see `utils.bias`).
+"""
+import sys
+from collections.abc import MutableMapping
+from enum import Enum
+from types import MappingProxyType
+
+
+class _StrEnum(str, Enum):
+    # format/str as the plain value, so CSV/JSON output is unchanged
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+
+class Decision(_StrEnum):
+    INCLUDE = 'Include'
+    EXCLUDE = 'Exclude'
+    # full text never screened (prioritize: recall target reached first)
+    DEFERRED = 'Deferred'
+
+
+class ExclusionLabel(_StrEnum):
+    OUTSIDE_DATE_RANGE = 'Outside date range'
+    REVIEW = 'Review/survey papers'
+    NOT_EEG = 'Not EEG-BCI focused'
+    NOT_CLASSIFICATION = 'Not classification-focused'
+    NON_ENGLISH = 'Non-English'
+    DUPLICATE = 'Duplicate study'
+    INSUFFICIENT_METHODS = 'Insufficient methodological detail'
+    NO_METRICS = 'No performance metrics reported'
+
+
+_MISSING = object()
+
+
+def _interned(value):
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is list:
+        return [sys.intern(v) if type(v) is str else v for v in value]
+    return value
+
+
+class SlotMapping:
+    """Mapping access to `FIELDS` slots; unset slots are missing keys."""
+    __slots__ = ('_extra',)
+    FIELDS = ()
+    _fieldset = frozenset()
+    # str values (or lists of str) of these keys are interned: sources,
+    # years, languages and author names repeat a lot across records
+    _intern = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fieldset = frozenset(cls.FIELDS)
+
+    def __init__(self, data=(), **kwargs):
+        self.update(data, **kwargs)
+
+    @classmethod
+    def from_dict(cls, d):
+        return d if isinstance(d, cls) else cls(d)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self._fieldset:
+            return getattr(self, key, default)
+        extra = getattr(self, '_extra', None)
+        return extra.get(key, default) if extra else default
+
+    def __setitem__(self, key, value):
+        if key in self._fieldset:
+            if key in self._intern:
+                value = _interned(value)
+            setattr(self, key, value)
+            return
+        try:
+            self._extra[key] = value
+        except AttributeError:
+            self._extra = {key: value}
+
+    def __delitem__(self, key):
+        if key in self._fieldset:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return
+        extra = getattr(self, '_extra', None)
+        if not extra or key not in extra:
+            raise KeyError(key)
+        del extra[key]
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        keys = [f for f in self.FIELDS if hasattr(self, f)]
+        return keys + list(getattr(self, '_extra', None) or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def update(self, data=(), **kwargs):
+        for k, v in (data.items() if hasattr(data, 'items') else data):
+            self[k] = v
+        for k, v in kwargs.items():
+            self[k] = v
+
+    def setdefault(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            self[key] = value = default
+        return value
+
+    def pop(self, key, default=_MISSING):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        del self[key]
+        return value
+
+    def copy(self):
+        return type(self)(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (SlotMapping, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self.items())!r})'
+
+    def to_dict(self):
+        """Plain (JSON-serializable) dict, nested mappings included."""
+        return {k: v.to_dict() if isinstance(v, SlotMapping) else v for k, v in self.items()}
+
+
+MutableMapping.register(SlotMapping)
+
+
+class Record(SlotMapping):
+    FIELDS = ('id', 'title', 'authors', 'year', 'doi', 'pmcid', 'abstract', 'url', 'pdf_url', 'source', 'language',
+              '_norm_title', 'member_ids', 'ta_decision', 'ft_decision', 'full_text', 'task_category', 'priority')
+    __slots__ = FIELDS
+    _intern = frozenset({'year', 'source', 'language', 'authors'})
+
+
+class ScreeningDecision(SlotMapping):
+    FIELDS = ('decision', 'stage', 'exclusion_label', 'evidence_snippet', 'confidence', 'bias')
+    __slots__ = FIELDS
+
+
+class BiasAssessment(SlotMapping):
+    """Shared and read-only (`flags` is a read-only view); one instance per combination of flags."""
+    FIELDS = ('bias_score', 'flags')
+    __slots__ = FIELDS
+
+    def __init__(self, bias_score, flags):
+        object.__setattr__(self, 'bias_score', bias_score)
+        object.__setattr__(self, 'flags', MappingProxyType(dict(flags)))
+
+    def __setitem__(self, key, value):
+        raise TypeError('BiasAssessment is shared and read-only')
+
+    __delitem__ = __setitem__
+
+    def copy(self):
+        return self
+
+    def to_dict(self):
+        return {'bias_score': self.bias_score, 'flags': dict(self.flags)}
+
+    def __reduce__(self):
+        return BiasAssessment, (self.bias_score, dict(self.flags))
@@ -0,0 +1,371 @@
+# utils/search_index.py
+"""Local BM25 retrieval over screened records and their full texts.
+
+An index directory holds `index.sqlite` (documents, stored text for
+snippets and the term dictionary) and immutable postings segments
+(`seg-N.docs` uint32 document numbers and `seg-N.tfs` uint16 term
+frequencies, grouped by term), which queries read through np.memmap.
+
+`add(records)` is incremental. Each record is keyed on its ID and a hash
+of its title, abstract and full text: unchanged records are skipped, and
+changed ones are re-indexed with the old version marked deleted. New
+documents form a new segment; `compact()` merges the segments and drops
+deleted postings, and runs by itself once there are more than
+max_segments of them. Title tokens count `title_boost` times.
+
+    python -m utils.search_index query "motor imagery transformer" [-k 10] [--json]
+    python -m utils.search_index add artifacts/records_deduped.parquet
+    python -m utils.search_index stats | compact
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import zlib
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger('search_index')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS docs (
+    doc INTEGER PRIMARY KEY,
+    record_id TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    live INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    text BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_record ON docs (record_id, live);
+CREATE TABLE IF NOT EXISTS terms (term TEXT NOT NULL, segment INTEGER NOT NULL, start INTEGER NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS terms_term ON terms (term);
+CREATE TABLE IF NOT EXISTS segments (segment INTEGER PRIMARY KEY, postings INTEGER NOT NULL);
+'''
+TOKEN_RE = re.compile(r'[^\W_]+')
+STOPWORDS = frozenset('a an and are as at be by for from has in is it of on or that the this to was were which with we our'.split())
+# record fields returned with each hit
+META_FIELDS = ('title', 'year', 'doi', 'url', 'source')
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def record_text(r):
+    """(title, body) indexed for a record: the abstract plus any extracted full text."""
+    full = (r.get('full_text') or {}).get('pdf_text') or ''
+    return r.get('title') or '', '\n'.join(t for t in (r.get('abstract') or '', full) if t)
+
+
+def _decision(d):
+    return str(d['decision']) if d and d.get('decision') is not None else None
+
+
+class SearchIndex:
+    def __init__(self, directory, title_boost=2, k1=1.2, b=0.75, segment_docs=50000, max_segments=8):
+        self.directory = directory
+        self.title_boost = title_boost
+        self.k1 = k1
+        self.b = b
+        self.segment_docs = segment_docs
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'))
+        self._db.executescript(SCHEMA)
+        self._load()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return int(self._live.sum())
+
+    def _load(self):
+        # document lengths and liveness, indexed by document number
+        n = self._db.execute('SELECT COALESCE(MAX(doc), -1) + 1 FROM docs').fetchone()[0]
+        self._lengths = np.zeros(n, dtype=np.float32)
+        self._live = np.zeros(n, dtype=bool)
+        for doc, length, live in self._db.execute('SELECT doc, length, live FROM docs'):
+            self._lengths[doc] = length
+            self._live[doc] = live
+        live_lengths = self._lengths[self._live]
+        self._avgdl = float(live_lengths.mean()) if len(live_lengths) else 0.0
+        self._segments = {}
+        for seg, postings in self._db.execute('SELECT segment, postings FROM segments'):
+            self._segments[seg] = (np.memmap(self._path(seg, 'docs'), dtype=np.uint32, mode='r', shape=(postings,)),
+                                   np.memmap(self._path(seg, 'tfs'), dtype=np.uint16, mode='r', shape=(postings,)))
+
+    def _path(self, seg, kind):
+        return os.path.join(self.directory, f'seg-{seg}.{kind}')
+
+    # -- indexing
+
+    def _digest(self, title, body):
+        return hashlib.sha1(f'{title}\0{body}'.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def add(self, records):
+        """Index new and changed records; returns counts of added, updated and unchanged records.
+
+        A record ID repeated in `records` is indexed once, from its last record.
+        """
+        records = {str(r.get('id')): r for r in records}.values()
+        current = dict(self._db.execute('SELECT record_id, digest FROM docs WHERE live = 1'))
+        next_doc = len(self._lengths)
+        counts = Counter()
+        pending = []
+        for r in records:
+            title, body = record_text(r)
+            rid = str(r.get('id'))
+            digest = self._digest(title, body)
+            old = current.get(rid)
+            if old == digest:
+                counts['unchanged'] += 1
+                continue
+            if old is not None:
+                self._db.execute('UPDATE docs SET live = 0 WHERE record_id = ? AND live = 1', (rid,))
+                counts['updated'] += 1
+            else:
+                counts['added'] += 1
+            current[rid] = digest
+            meta = {k: r.get(k) for k in META_FIELDS}
+            meta['ta_decision'] = _decision(r.get('ta_decision'))
+            meta['ft_decision'] = _decision(r.get('ft_decision'))
+            pending.append((next_doc, rid, digest, title, body, meta))
+            next_doc += 1
+            if len(pending) >= self.segment_docs:
+                self._write_segment(pending)
+                pending = []
+        if pending:
+            self._write_segment(pending)
+        self._db.commit()
+        self._load()
+        if len(self._segments) > self.max_segments:
+            self.compact()
+        logger.info(f"Search index: {counts['added']} added, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged; {len(self)} documents")
+        return dict(counts)
+
+    def remove(self, record_ids):
+        self._db.executemany('UPDATE docs SET live = 0 WHERE record_id = ? AND live = 1', [(str(i),) for i in record_ids])
+        self._db.commit()
+        self._load()
+
+    def _write_segment(self, pending):
+        term_ids = {}
+        post_terms, post_docs, post_tfs = array('I'), array('I'), array('H')
+        rows = []
+        for doc, rid, digest, title, body, meta in pending:
+            tf = Counter(tokenize(body))
+            for tok in tokenize(title):
+                tf[tok] += self.title_boost
+            for tok, n in tf.items():
+                post_terms.append(term_ids.setdefault(tok, len(term_ids)))
+                post_docs.append(doc)
+                post_tfs.append(min(n, 65535))
+            rows.append((doc, rid, digest, sum(tf.values()), 1, json.dumps(meta, default=str),
+                         zlib.compress(f'{title}\n{body}'.encode('utf-8', 'surrogatepass'))))
+        self._db.executemany('INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        terms = np.frombuffer(post_terms, dtype=np.uint32)
+        self._store_segment(list(term_ids), terms, np.frombuffer(post_docs, dtype=np.uint32),
+                            np.frombuffer(post_tfs, dtype=np.uint16))
+
+    def _store_segment(self, vocabulary, terms, docs, tfs, seg=None):
+        # postings grouped by term; a stable sort keeps each term's documents in order
+        order = np.argsort(terms, kind='stable')
+        counts = np.bincount(terms, minlength=len(vocabulary))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        if seg is None:
+            seg = self._db.execute('SELECT COALESCE(MAX(segment), 0) + 1 FROM segments').fetchone()[0]
+        for kind, values in (('docs', docs[order]), ('tfs', tfs[order])):
+            values.tofile(self._path(seg, kind))
+        self._db.executemany('INSERT INTO terms VALUES (?, ?, ?, ?)',
+                             [(t, seg, int(s), int(c)) for t, s, c in zip(vocabulary, starts.tolist(), counts.tolist()) if c])
+        self._db.execute('INSERT INTO segments VALUES (?, ?)', (seg, len(docs)))
+        return seg
+
+    def compact(self):
+        """Merge all segments into one without deleted postings."""
+        old = list(self._segments)
+        if not old:
+            return
+        vocabulary, term_index = [], {}
+        terms, docs, tfs = [], [], []
+        for term, seg, start, count in self._db.execute('SELECT term, segment, start, count FROM terms ORDER BY segment, start'):
+            seg_docs, seg_tfs = self._segments[seg]
+            d = np.asarray(seg_docs[start:start + count])
+            keep = self._live[d]
+            if not keep.any():
+                continue
+            tid = term_index.setdefault(term, len(vocabulary))
+            if tid == len(vocabulary):
+                vocabulary.append(term)
+            terms.append(np.full(int(keep.sum()), tid, dtype=np.uint32))
+            docs.append(d[keep])
+            tfs.append(np.asarray(seg_tfs[start:start + count])[keep])
+        self._segments = {}
+        self._db.execute('DELETE FROM terms')
+        self._db.execute('DELETE FROM segments')
+        self._db.execute('DELETE FROM docs WHERE live = 0')
+        if terms:
+            self._store_segment(vocabulary, np.concatenate(terms), np.concatenate(docs), np.concatenate(tfs), seg=max(old) + 1)
+        self._db.commit()
+        for seg in old:
+            for kind in ('docs', 'tfs'):
+                os.remove(self._path(seg, kind))
+        self._db.execute('VACUUM')
+        self._load()
+        logger.info(f'Search index compacted {len(old)} segments')
+
+    # -- querying
+
+    def _postings(self, term):
+        found = [(seg, start, count) for seg, start, count in
+                 self._db.execute('SELECT segment, start, count FROM terms WHERE term = ?', (term,))]
+        if not found:
+            return None, None
+        docs = np.concatenate([self._segments[s][0][a:a + c] for s, a, c in found])
+        tfs = np.concatenate([self._segments[s][1][a:a + c] for s, a, c in found])
+        keep = self._live[docs]
+        return docs[keep], tfs[keep].astype(np.float32)
+
+    def search(self, query, k=10, snippet_chars=200):
+        """The k best records for `query` by BM25: dicts of record_id, score, snippet and stored metadata."""
+        n_live = len(self)
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not n_live:
+            return []
+        scores = np.zeros(len(self._lengths), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self._lengths / max(self._avgdl, 1e-9))
+        for term in terms:
+            docs, tfs = self._postings(term)
+            if docs is None or not len(docs):
+                continue
+            idf = math.log(1 + (n_live - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind='stable')].tolist()
+        rows = {doc: (rid, meta, text) for doc, rid, meta, text in self._db.execute(
+            f'SELECT doc, record_id, meta, text FROM docs WHERE doc IN ({",".join("?" * len(hits))})', hits)}
+        results = []
+        for doc in hits:
+            rid, meta, text = rows[doc]
+            text = zlib.decompress(text).decode('utf-8', 'surrogatepass')
+            results.append({'record_id': rid, 'score': round(float(scores[doc]), 4), **json.loads(meta),
+                            'snippet': snippet(text, terms, snippet_chars)})
+        return results
+
+    def texts(self, record_ids):
+        """{record_id: stored text (title, abstract and full text)} for the live documents of `record_ids`."""
+        ids = [str(i) for i in record_ids]
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            found.update((rid, zlib.decompress(text).decode('utf-8', 'surrogatepass')) for rid, text in self._db.execute(
+                f'SELECT record_id, text FROM docs WHERE live = 1 AND record_id IN ({",".join("?" * len(chunk))})', chunk))
+        return found
+
+    def stats(self):
+        return {'documents': len(self), 'deleted': self._db.execute('SELECT COUNT(*) FROM docs WHERE live = 0').fetchone()[0],
+                'segments': len(self._segments),
+                'terms': self._db.execute('SELECT COUNT(DISTINCT term) FROM terms').fetchone()[0],
+                'postings': sum(len(d) for d, _ in self._segments.values()), 'avg_length': round(self._avgdl, 1)}
+
+
+def snippet(text, terms, width=200):
+    """The `width`-character window of `text` holding the most distinct query terms."""
+    lower = text.lower()
+    pattern = re.compile(r'(?<![^\W_])(?:' + '|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r')(?![^\W_])')
+    matches = [(m.start(), m.group()) for _, m in zip(range(500), pattern.finditer(lower))]
+    if not matches:
+        return ' '.join(text[:width].split())
+    best, best_count = matches[0][0], 0
+    for i, (pos, _) in enumerate(matches):
+        distinct = {t for p, t in matches[i:] if p < pos + width}
+        if len(distinct) > best_count:
+            best, best_count = pos, len(distinct)
+    start = max(0, best - width // 4)
+    return ('…' if start else '') + ' '.join(text[start:start + width].split()) + ('…' if start + width < len(text) else '')
+
+
+def index_from_config(cfg):
+    scfg = cfg.get('search_index', {})
+    return SearchIndex(scfg.get('dir', 'artifacts/search_index'), title_boost=scfg.get('title_boost', 2),
+                       k1=scfg.get('k1', 1.2), b=scfg.get('b', 0.75), segment_docs=scfg.get('segment_docs', 50000),
+                       max_segments=scfg.get('max_segments', 8))
+
+
+def _export_rows(path):
+    if path.endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+    import csv
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+def _export_records(path):
+    # export rows (exporters.csv_exporter.COLUMNS) back into record-shaped dicts
+    for row in _export_rows(path):
+        yield {'id': row['canonical_id'], 'title': row.get('title'), 'abstract': row.get('abstract'),
+               'year': row.get('year'), 'doi': row.get('doi'), 'url': row.get('url'), 'source': row.get('source'),
+               'ta_decision': {'decision': row.get('stage_title_abstract_decision') or None},
+               'ft_decision': {'decision': row.get('stage_full_text_decision') or None}}
+
+
+if __name__ == '__main__':
+    import time
+    import yaml
+    parser = argparse.ArgumentParser(description='Query or maintain the BM25 search index')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--dir', help='index directory (default: search_index.dir)')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    q = sub.add_parser('query')
+    q.add_argument('text')
+    q.add_argument('-k', type=int, default=10)
+    q.add_argument('--json', action='store_true')
+    a = sub.add_parser('add', help='index the records of a CSV/Parquet export (titles and abstracts)')
+    a.add_argument('export')
+    sub.add_parser('stats')
+    sub.add_parser('compact')
+    args = parser.parse_args()
+    with open(args.config, 'r', encoding='utf-8') as f:
+        cfg = yaml.safe_load(f)
+    if args.dir:
+        cfg.setdefault('search_index', {})['dir'] = args.dir
+    with index_from_config(cfg) as index:
+        if args.cmd == 'query':
+            start = time.perf_counter()
+            hits = index.search(args.text, k=args.k)
+            elapsed = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(hits, indent=2, ensure_ascii=False))
+            else:
+                for rank, h in enumerate(hits, 1):
+                    print(f"{rank:>2}. [{h['score']:.2f}] {h['title']} ({h.get('year') or 'n.d.'}) {h['record_id']}")
+                    print(f"    {h['snippet']}")
+                print(f'{len(hits)} results in {elapsed:.1f} ms')
+        elif args.cmd == 'add':
+            print(json.dumps(index.add(_export_records(args.export))))
+        elif args.cmd == 'compact':
+            index.compact()
+            print(json.dumps(index.stats(), indent=2))
+        else:
+            print(json.dumps(index.stats(), indent=2))